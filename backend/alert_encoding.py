@@ -0,0 +1,161 @@
+"""
+SecureEye alert encoding
+Opt-in compact binary (MessagePack) form of alert events, negotiated per Socket.IO client
+"""
+
+from datetime import datetime
+import time
+
+try:
+    import msgpack
+except ImportError:  # Binary mode is simply not offered without msgpack
+    msgpack = None
+
+JSON_ENCODING = 'json'
+MSGPACK_ENCODING = 'msgpack'
+ENCODING_VERSION = 1
+SUPPORTED_VERSIONS = (1,)
+
+# Integer enums used on the wire (0 = not set / unknown; unknown strings travel in 'extra')
+EVENT_CODES = {'zone_alert': 1, 'detection_alert': 2, 'camera_error': 3}
+ALERT_TYPE_CODES = {'motion_detected': 1, 'motion_ongoing': 2, 'motion_ended': 3, 'motion': 4, 'human_detected': 5}
+PHASE_CODES = {'started': 1, 'ongoing': 2, 'ended': 3}
+DETECTION_TYPE_CODES = {'zone_motion': 1, 'motion': 2, 'human': 3, 'fire': 4, 'violence': 5, 'crowd': 6}
+
+FLAG_BEEP = 1
+FLAG_DETECTED = 2
+
+# Fields with a fixed slot; everything else except the human-readable message goes to 'extra'
+_SLOTTED = {'camera_id', 'timestamp', 'alert_type', 'phase', 'beep', 'detected', 'count',
+            'confidence', 'zone', 'alert_id', 'detections', 'message'}
+_DETECTION_SLOTTED = {'detected', 'phase', 'count', 'confidence', 'zone', 'timestamp'}
+
+
+def _names(codes):
+    """Reverse lookup for an enum table"""
+    return {code: name for name, code in codes.items()}
+
+
+_EVENT_NAMES = _names(EVENT_CODES)
+_ALERT_TYPE_NAMES = _names(ALERT_TYPE_CODES)
+_PHASE_NAMES = _names(PHASE_CODES)
+_DETECTION_TYPE_NAMES = _names(DETECTION_TYPE_CODES)
+
+
+def negotiate_encoding(requested, version=None):
+    """Pick the encoding for a client from what it asked for on connect; JSON unless binary is possible"""
+    if requested != MSGPACK_ENCODING or msgpack is None:
+        return JSON_ENCODING
+    try:
+        version = int(version) if version is not None else ENCODING_VERSION
+    except (TypeError, ValueError):
+        return JSON_ENCODING
+    return MSGPACK_ENCODING if version in SUPPORTED_VERSIONS else JSON_ENCODING
+
+
+def client_encoding(auth=None, args=None):
+    """Encoding asked for in the Socket.IO connect auth ({encoding, encoding_version}) or query string"""
+    for source in (auth, args):
+        if source and source.get('encoding'):
+            return negotiate_encoding(source.get('encoding'), source.get('encoding_version'))
+    return JSON_ENCODING
+
+
+def _epoch_ms(timestamp):
+    """ISO timestamp string (as in JSON payloads) to epoch milliseconds"""
+    if isinstance(timestamp, str):
+        try:
+            return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+        except ValueError:
+            pass
+    return int(time.time() * 1000)
+
+
+def _zone_ref(zone):
+    """A named zone by name (clients have the geometry from zone_data), otherwise [x, y, w, h]"""
+    if not isinstance(zone, dict):
+        return None
+    if zone.get('name'):
+        return zone['name']
+    return [zone.get('x', 0), zone.get('y', 0), zone.get('width', 0), zone.get('height', 0)]
+
+
+def _encode_detection(detection):
+    """[flags, phase, count, confidence, zone, extra] for one entry of a detections dict"""
+    if not isinstance(detection, dict):
+        return [0, 0, 0, 0.0, None, {'value': detection}]
+    flags = FLAG_DETECTED if detection.get('detected') else 0
+    extra = {key: value for key, value in detection.items() if key not in _DETECTION_SLOTTED}
+    return [flags, PHASE_CODES.get(detection.get('phase'), 0), detection.get('count', 0),
+            detection.get('confidence', 0.0), _zone_ref(detection.get('zone')), extra]
+
+
+def encode_alert(event, payload):
+    """Encode an alert payload as a version 1 MessagePack array
+
+    [version, event, camera_id, timestamp_ms, alert_type, phase, flags, count, confidence,
+     zone, alert_id, detections, extra]
+    """
+    alert_type = payload.get('alert_type')
+    extra = {key: value for key, value in payload.items() if key not in _SLOTTED}
+    if alert_type is not None and alert_type not in ALERT_TYPE_CODES:
+        extra['alert_type'] = alert_type
+    flags = (FLAG_BEEP if payload.get('beep') else 0) | (FLAG_DETECTED if payload.get('detected') else 0)
+
+    detections = payload.get('detections')
+    if isinstance(detections, dict):
+        detections = {DETECTION_TYPE_CODES.get(name, name): _encode_detection(detection)
+                      for name, detection in detections.items()}
+
+    message = [
+        ENCODING_VERSION,
+        EVENT_CODES.get(event, 0),
+        payload.get('camera_id'),
+        _epoch_ms(payload.get('timestamp')),
+        ALERT_TYPE_CODES.get(alert_type, 0),
+        PHASE_CODES.get(payload.get('phase'), 0),
+        flags,
+        payload.get('count', 0),
+        payload.get('confidence', 0.0),
+        _zone_ref(payload.get('zone')),
+        payload.get('alert_id'),
+        detections,
+        extra
+    ]
+    return msgpack.packb(message, use_single_float=True, default=str)
+
+
+def decode_alert(data):
+    """Decode a version 1 binary alert back into (event, payload) with readable names"""
+    message = msgpack.unpackb(data, strict_map_key=False)
+    (version, event, camera_id, timestamp_ms, alert_type, phase, flags, count, confidence,
+     zone, alert_id, detections, extra) = message
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported alert encoding version: {version}")
+
+    payload = dict(extra)
+    payload.update({
+        'camera_id': camera_id,
+        'timestamp_ms': timestamp_ms,
+        'count': count,
+        'confidence': confidence,
+        'zone': zone,
+        'beep': bool(flags & FLAG_BEEP),
+        'detected': bool(flags & FLAG_DETECTED)
+    })
+    if alert_type:
+        payload['alert_type'] = _ALERT_TYPE_NAMES.get(alert_type, alert_type)
+    if phase:
+        payload['phase'] = _PHASE_NAMES.get(phase, phase)
+    if alert_id is not None:
+        payload['alert_id'] = alert_id
+    if detections is not None:
+        payload['detections'] = {}
+        for code, (d_flags, d_phase, d_count, d_confidence, d_zone, d_extra) in detections.items():
+            detection = dict(d_extra)
+            detection.update({'detected': bool(d_flags & FLAG_DETECTED), 'count': d_count,
+                              'confidence': d_confidence, 'zone': d_zone})
+            if d_phase:
+                detection['phase'] = _PHASE_NAMES.get(d_phase, d_phase)
+            payload['detections'][_DETECTION_TYPE_NAMES.get(code, code)] = detection
+    return _EVENT_NAMES.get(event, event), payload
@@ -0,0 +1,191 @@
+"""
+SecureEye alert engine
+Debounces per-frame detections into one "started", throttled "ongoing" and one "ended" event per incident
+"""
+
+import itertools
+import os
+import threading
+import time
+
+ALERT_SETTINGS = ('min_duration', 'clear_after', 'ongoing_interval', 'cooldown')
+
+
+def default_alert_settings():
+    """Alert timing from the environment (all values in seconds)"""
+    return {
+        # Detection must persist this long before an incident starts
+        'min_duration': float(os.getenv('ALERT_MIN_DURATION', '0')),
+        # No detection for this long ends the incident (hysteresis against flicker)
+        'clear_after': float(os.getenv('ALERT_CLEAR_AFTER', '3')),
+        # At most one "ongoing" update per incident in this interval
+        'ongoing_interval': float(os.getenv('ALERT_ONGOING_INTERVAL', '5')),
+        # After an incident ends, a new one cannot start for this long
+        'cooldown': float(os.getenv('ALERT_COOLDOWN', '10'))
+    }
+
+
+class AlertEngine:
+    def __init__(self, **settings):
+        self.settings = default_alert_settings()
+        self.settings.update(self._validate(settings))
+        self.camera_settings = {}  # camera_id -> overrides
+        self.states = {}  # (camera_id, zone_name, alert_type) -> state dict
+        self.alert_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def _validate(self, settings):
+        """Keep known settings and make sure they are non-negative numbers"""
+        validated = {}
+        for key, value in settings.items():
+            if key not in ALERT_SETTINGS:
+                raise ValueError(f"Unknown alert setting: {key}")
+            if value is None:
+                continue
+            value = float(value)
+            if value < 0:
+                raise ValueError(f"Alert setting {key} must not be negative")
+            validated[key] = value
+        return validated
+
+    def configure(self, camera_id=None, **settings):
+        """Change alert timing for one camera, or the defaults when camera_id is None"""
+        settings = self._validate(settings)
+        with self.lock:
+            if camera_id is None:
+                self.settings.update(settings)
+            else:
+                self.camera_settings.setdefault(camera_id, {}).update(settings)
+
+    def overrides_for(self, camera_id):
+        """Settings configured for this camera only (empty if it uses the defaults)"""
+        with self.lock:
+            return dict(self.camera_settings.get(camera_id, {}))
+
+    def settings_for(self, camera_id):
+        """Effective alert timing for a camera"""
+        settings = dict(self.settings)
+        settings.update(self.camera_settings.get(camera_id, {}))
+        return settings
+
+    def _alert(self, state, phase, now):
+        """Event summary handed to the caller for publishing"""
+        return {
+            'phase': phase,
+            'alert_id': state['alert_id'],
+            'camera_id': state['camera_id'],
+            'zone_name': state['zone_name'],
+            'alert_type': state['alert_type'],
+            'started_at': state['started_at'],
+            'duration': now - state['started_at'],
+            'detections': state['hits'],
+            'peak_confidence': state['peak_confidence'],
+            'data': state['data'],
+            'zone': state['zone']
+        }
+
+    def observe(self, camera_id, zone_name, alert_type, detected, data=None, now=None, zone=None):
+        """Feed one frame's result for a zone; return an alert dict when an event is due, else None
+
+        zone is the zone's full definition; the latest one is kept so incidents ended by
+        sweep() or release_camera() after the zone is gone still report its geometry.
+        """
+        now = now if now is not None else time.time()
+        key = (camera_id, zone_name, alert_type)
+        with self.lock:
+            settings = self.settings_for(camera_id)
+            state = self.states.get(key)
+            if state is None:
+                state = {'camera_id': camera_id, 'zone_name': zone_name, 'alert_type': alert_type,
+                         'phase': 'idle', 'first_seen': 0, 'last_seen': 0, 'last_observed': now,
+                         'started_at': 0, 'last_update': 0, 'ended_at': None, 'alert_id': None,
+                         'hits': 0, 'peak_confidence': 0, 'data': None, 'zone': None}
+                self.states[key] = state
+            state['last_observed'] = now
+            if zone is not None:
+                state['zone'] = zone
+
+            if detected:
+                confidence = data.get('confidence', 0) if isinstance(data, dict) else 0
+                if state['phase'] == 'idle':
+                    if state['ended_at'] is not None and now - state['ended_at'] < settings['cooldown']:
+                        return None
+                    state.update(phase='pending', first_seen=now, hits=0, peak_confidence=0)
+
+                state['last_seen'] = now
+                state['hits'] += 1
+                state['data'] = data
+                state['peak_confidence'] = max(state['peak_confidence'], confidence)
+
+                if state['phase'] == 'pending':
+                    if now - state['first_seen'] >= settings['min_duration']:
+                        state.update(phase='active', started_at=now, last_update=now,
+                                     alert_id=f"{camera_id}-{next(self.alert_ids)}")
+                        return self._alert(state, 'started', now)
+                    return None
+
+                if now - state['last_update'] >= settings['ongoing_interval']:
+                    state['last_update'] = now
+                    return self._alert(state, 'ongoing', now)
+                return None
+
+            # No detection: pending incidents fizzle out, active ones end after clear_after
+            if state['phase'] != 'idle' and now - state['last_seen'] >= settings['clear_after']:
+                was_active = state['phase'] == 'active'
+                state['phase'] = 'idle'
+                if was_active:
+                    state['ended_at'] = now
+                    return self._alert(state, 'ended', now)
+            return None
+
+    def sweep(self, camera_id, now=None, grace=None):
+        """End incidents of a camera whose zone stopped being observed (e.g. the zone was removed)
+
+        grace maps alert types to extra seconds they may go unobserved (detectors that run
+        less often than every frame).
+        """
+        now = now if now is not None else time.time()
+        grace = grace or {}
+        ended = []
+        with self.lock:
+            for key, state in list(self.states.items()):
+                if key[0] != camera_id:
+                    continue
+                clear_after = self.settings_for(camera_id)['clear_after'] + grace.get(key[2], 0)
+                if now - state['last_observed'] < clear_after:
+                    continue
+                if state['phase'] == 'active':
+                    state['ended_at'] = now
+                    ended.append(self._alert(state, 'ended', now))
+                del self.states[key]
+        return ended
+
+    def release_camera(self, camera_id, now=None):
+        """End every open incident of a stopped camera and forget its state
+
+        The camera's configured alert settings are kept, so a restarted camera uses them again.
+        """
+        now = now if now is not None else time.time()
+        ended = []
+        with self.lock:
+            for key, state in list(self.states.items()):
+                if key[0] != camera_id:
+                    continue
+                if state['phase'] == 'active':
+                    ended.append(self._alert(state, 'ended', now))
+                del self.states[key]
+        return ended
+
+    def get_stats(self):
+        """Open incidents per camera"""
+        with self.lock:
+            active = {}
+            for (camera_id, zone_name, alert_type), state in self.states.items():
+                if state['phase'] == 'active':
+                    active.setdefault(str(camera_id), []).append({
+                        'zone_name': zone_name,
+                        'alert_type': alert_type,
+                        'alert_id': state['alert_id'],
+                        'started_at': state['started_at']
+                    })
+            return {'settings': dict(self.settings), 'active': active}
@@ -1,19 +1,35 @@
 import os
-import cv2
-import numpy as np
-# import tensorflow as tf  # Temporarily disabled due to DLL issues
-from flask import Flask, request, jsonify
+import sys
+
+# Profiles this file's startup in child processes, before anything here is imported or started
+if __name__ == '__main__' and '--profile-startup' in sys.argv[1:]:
+    import startup_profile
+    sys.exit(startup_profile.main([arg for arg in sys.argv[1:] if arg != '--profile-startup']))
+
+from flask import Flask, Response, request, jsonify
 from flask_socketio import SocketIO, emit
-import base64
+import itertools
 import json
 import threading
 import time
 from datetime import datetime
-import firebase_admin
-from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
-import logging
-import random
+from camera_workers import CameraWorkerPool
+from zones import normalize_zones, upsert_zone
+from rate_control import AnalysisRateController
+from scheduler import DetectionScheduler
+from alert_engine import AlertEngine
+from detection_writer import BatchedDetectionWriter, detection_record
+from event_log import EventLog, LogReplayer
+from detection_history import DetectionHistory, parse_time
+from camera_rooms import CameraRooms, parse_subscription
+from alert_encoding import ENCODING_VERSION, client_encoding
+from cooperative import is_cooperative, run_blocking
+from metrics import registry, merge_snapshots, process_stats, render_metrics
+from tracing import tracer, chrome_trace
+from load_generator import AlertLoadGenerator
+from camera_provisioning import CameraProvisioner
+from detector_registry import detectors, default_pipeline
 
 # Load environment variables
 load_dotenv()
@@ -21,493 +37,246 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key')
-socketio = SocketIO(app, cors_allowed_origins="*")
+# 'eventlet' when started through async_server.py (or a gunicorn eventlet worker), which
+# monkey-patches first; otherwise the threaded Werkzeug server
+ASYNC_MODE = 'eventlet' if is_cooperative() else 'threading'
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
+
+# Camera alerts go only to clients subscribed to that camera (or to all cameras)
+camera_rooms = CameraRooms(socketio)
 
-# Initialize Firebase (Optional)
+# Firebase (optional) is initialised by the background warm-up, see init_firebase()
 firebase_initialized = False
-try:
-    # Check if Firebase service account exists
-    service_account_path = os.path.join(os.path.dirname(__file__), 'firebase-service-account.json')
-    if os.path.exists(service_account_path):
+
+# Global variables
+active_cameras = {}
+detection_threads = {}
+detection_enabled = True
+camera_zones = {}  # Store the list of named zones for each camera
+camera_pipelines = {}  # Detector pipeline configured for each camera (absent = DETECTION_PIPELINE)
+camera_captures = {}  # Latest-frame capture stage for each running camera
+
+# Minimum time between analysed frames; capture keeps running in between
+ANALYSIS_INTERVAL = float(os.getenv('ANALYSIS_INTERVAL', '0.1'))
+
+# Adapts each camera's analysis rate to scene activity and the detection CPU budget
+rate_controller = AnalysisRateController(active_interval=ANALYSIS_INTERVAL)
+
+# Shared pool of detection threads (DETECTION_THREADS=0 analyses on each camera's own thread)
+scheduler = DetectionScheduler()
+if scheduler.num_workers <= 0:
+    scheduler = None
+
+# Turns per-frame zone results into started/ongoing/ended incidents (ALERT_* settings)
+alert_engine = AlertEngine()
+
+# Number of detection worker processes; 0 keeps every camera on a thread in this process
+DETECTION_WORKERS = int(os.getenv('DETECTION_WORKERS', '0'))
+worker_pool = None
+
+# Built on first camera start or by the background warm-up (OpenCV is imported then, not at startup)
+detector = None
+detector_lock = threading.Lock()
+
+# Load OpenCV and the detector in the background right after startup (0 waits for the first camera)
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', '1').lower() in ('1', 'true', 'yes')
+
+FIREBASE_SERVICE_ACCOUNT = os.path.join(os.path.dirname(__file__), 'firebase-service-account.json')
+
+# Local write-ahead log for detections (empty EVENT_LOG_DIR disables it); relative paths are
+# taken from the backend directory. Only kept when Firestore is configured, nothing else drains it.
+EVENT_LOG_DIR = os.getenv('EVENT_LOG_DIR', 'event_log')
+if EVENT_LOG_DIR:
+    EVENT_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), EVENT_LOG_DIR)
+event_log = None  # Opened by start_storage()
+
+# Batches detection writes to Firestore off the camera threads (set up by init_firebase)
+detection_writer = None
+log_replayer = None
+
+# Local queryable detection history (empty HISTORY_DB_PATH disables it)
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', os.path.join(os.path.dirname(__file__), 'detections.db'))
+detection_history = None  # Opened by start_storage()
+
+# Synthetic alert load for fan-out testing; the endpoint only exists with LOADTEST_ENABLED=1
+LOADTEST_ENABLED = os.getenv('LOADTEST_ENABLED', '0').lower() in ('1', 'true', 'yes')
+alert_load = AlertLoadGenerator(camera_rooms.publish) if LOADTEST_ENABLED else None
+
+# Concurrent, deadline-bounded source probing for POST /api/cameras/bulk
+provisioner = CameraProvisioner()
+cameras_lock = threading.Lock()  # Keeps concurrent provisioning from adding a camera twice
+
+def start_storage():
+    """Open the event log and the detection history and start their writer threads
+
+    Called by the server entry points, not at import: spawned detection workers re-import this
+    module and must not open a second log or history writer on the same files.
+    """
+    global event_log, detection_history
+    if EVENT_LOG_DIR and os.path.exists(FIREBASE_SERVICE_ACCOUNT) and event_log is None:
+        event_log = EventLog(EVENT_LOG_DIR)
+        event_log.start()
+    if HISTORY_DB_PATH and detection_history is None:
+        detection_history = DetectionHistory(HISTORY_DB_PATH)
+        detection_history.start()
+
+def init_firebase():
+    """Connect to Firestore if a service account is present and start the detection writer
+
+    Until this has run, detections are still logged locally and replayed to Firestore afterwards.
+    """
+    global firebase_initialized, detection_writer, log_replayer
+    try:
+        # Check if Firebase service account exists
+        service_account_path = FIREBASE_SERVICE_ACCOUNT
+        if not os.path.exists(service_account_path):
+            print("Firebase service account not found - running without Firebase")
+            return
+        import firebase_admin
+        from firebase_admin import credentials, firestore
         cred = credentials.Certificate(service_account_path)
         firebase_admin.initialize_app(cred)
         db = firestore.client()
-        firebase_initialized = True
         print("Firebase initialized successfully")
+    except Exception as e:
+        print(f"Firebase initialization failed: {e}")
+        print("Running without Firebase - core functionality will work")
+        return
+    
+    # With the event log, the replayer drains logged detections through the writer and commits the log offset.
+    # The log is then the queue: EVENT_LOG_MAX_BYTES bounds it instead of the writer's queue size and overflow policy.
+    writer = BatchedDetectionWriter(db, timestamp_value=firestore.SERVER_TIMESTAMP)
+    if event_log:
+        log_replayer = LogReplayer(event_log, writer.commit_batch, batch_size=writer.batch_size)
+        log_replayer.start()
+        print(f"[WRITER] Replaying detections from the event log (capped at {event_log.max_bytes} bytes); "
+              f"DETECTION_QUEUE_SIZE and DETECTION_OVERFLOW_POLICY apply only with EVENT_LOG_DIR empty")
     else:
-        print("Firebase service account not found - running without Firebase")
-except Exception as e:
-    print(f"Firebase initialization failed: {e}")
-    print("Running without Firebase - core functionality will work")
+        writer.start()
+    detection_writer = writer
+    firebase_initialized = True
 
-# Global variables
-active_cameras = {}
-detection_threads = {}
-detection_enabled = True
-camera_zones = {}  # Store zone configurations for each camera
-
-class SurveillanceDetector:
-    def __init__(self):
-        self.fire_model = None
-        self.motion_detector = cv2.createBackgroundSubtractorMOG2(detectShadows=True)
-        self.previous_frames = {}  # Store previous frames for each camera
-        self.detection_threshold = 0.7
-        self.test_motion_timers = {}  # Timer-based test motion detection
-        self.load_models()
-    
-    def load_models(self):
-        """Load pre-trained models for detection"""
-        try:
-            # Load fire detection model (you'll need to train or download this)
-            # For now, we'll use a simple color-based fire detection
-            print("Models loaded successfully")
-        except Exception as e:
-            print(f"Error loading models: {e}")
-    
-    def detect_fire(self, frame):
-        """Detect fire in the frame using color analysis"""
-        try:
-            # Convert to HSV for better color detection
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            
-            # Define range for fire colors (red, orange, yellow)
-            lower_fire = np.array([0, 50, 50])
-            upper_fire = np.array([35, 255, 255])
-            
-            # Create mask for fire colors
-            fire_mask = cv2.inRange(hsv, lower_fire, upper_fire)
-            
-            # Count fire-colored pixels
-            fire_pixels = cv2.countNonZero(fire_mask)
-            total_pixels = frame.shape[0] * frame.shape[1]
-            fire_ratio = fire_pixels / total_pixels
-            
-            # If fire ratio is above threshold, consider it fire
-            if fire_ratio > 0.01:  # 1% of frame
-                return True, fire_ratio
-            return False, fire_ratio
-            
-        except Exception as e:
-            print(f"Fire detection error: {e}")
-            return False, 0
-    
-    def detect_motion(self, frame):
-        """Detect motion using background subtraction"""
-        try:
-            # Apply background subtraction
-            fg_mask = self.motion_detector.apply(frame)
-            
-            # Remove noise
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
-            
-            # Find contours
-            contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            motion_detected = False
-            motion_area = 0
-            
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area > 500:  # Minimum area threshold
-                    motion_detected = True
-                    motion_area += area
-            
-            return motion_detected, motion_area
-            
-        except Exception as e:
-            print(f"Motion detection error: {e}")
-            return False, 0
-    
-    def detect_violence(self, frame):
-        """Detect violence using motion analysis and object detection"""
-        try:
-            # Simple violence detection based on rapid motion
-            if self.previous_frame is not None:
-                # Calculate frame difference
-                diff = cv2.absdiff(frame, self.previous_frame)
-                gray_diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-                
-                # Count significant changes
-                changes = cv2.countNonZero(gray_diff)
-                total_pixels = gray_diff.shape[0] * gray_diff.shape[1]
-                change_ratio = changes / total_pixels
-                
-                # High change ratio might indicate violence
-                if change_ratio > 0.1:  # 10% change threshold
-                    return True, change_ratio
-            
-            self.previous_frame = frame.copy()
-            return False, 0
-            
-        except Exception as e:
-            print(f"Violence detection error: {e}")
-            return False, 0
-    
-    def detect_crowd(self, frame):
-        """Detect crowd using people counting"""
-        try:
-            # Simple crowd detection based on edge density
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            edges = cv2.Canny(gray, 50, 150)
-            
-            # Count edge pixels
-            edge_pixels = cv2.countNonZero(edges)
-            total_pixels = edges.shape[0] * edges.shape[1]
-            edge_density = edge_pixels / total_pixels
-            
-            # High edge density might indicate crowd
-            crowd_detected = edge_density > 0.15  # 15% edge density threshold
-            
-            return crowd_detected, edge_density
-            
-        except Exception as e:
-            print(f"Crowd detection error: {e}")
-            return False, 0
-    
-    def detect_human_in_zone(self, frame, zone):
-        """Detect humans specifically within a defined zone"""
-        try:
-            if not zone:
-                return False, 0
-            
-            # Extract zone coordinates
-            x, y, w, h = zone['x'], zone['y'], zone['width'], zone['height']
-            
-            # Ensure zone is within frame bounds
-            frame_h, frame_w = frame.shape[:2]
-            x = max(0, min(x, frame_w))
-            y = max(0, min(y, frame_h))
-            w = max(0, min(w, frame_w - x))
-            h = max(0, min(h, frame_h - y))
-            
-            if w <= 0 or h <= 0:
-                return False, 0
-            
-            # Extract zone region
-            zone_frame = frame[y:y+h, x:x+w]
-            
-            # Convert to grayscale for processing
-            gray_zone = cv2.cvtColor(zone_frame, cv2.COLOR_BGR2GRAY)
-            
-            # Apply background subtraction to the zone
-            fg_mask = self.motion_detector.apply(zone_frame)
-            
-            # Remove noise
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
-            
-            # Find contours in the zone
-            contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            human_count = 0
-            total_motion_area = 0
-            
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area > 200:  # Minimum area for human detection
-                    # Check aspect ratio to filter out non-human shapes
-                    x_cont, y_cont, w_cont, h_cont = cv2.boundingRect(contour)
-                    aspect_ratio = h_cont / w_cont if w_cont > 0 else 0
-                    
-                    # Human-like aspect ratio (roughly 1.5 to 3.0)
-                    if 1.2 <= aspect_ratio <= 4.0:
-                        human_count += 1
-                        total_motion_area += area
-            
-            # Calculate confidence based on motion area and count
-            zone_area = w * h
-            motion_ratio = total_motion_area / zone_area if zone_area > 0 else 0
-            confidence = min(motion_ratio * 2, 1.0)  # Scale confidence
-            
-            human_detected = human_count > 0 and confidence > 0.1
-            
-            return human_detected, {
-                'count': human_count,
-                'confidence': confidence,
-                'motion_area': total_motion_area,
-                'zone_area': zone_area
-            }
-            
-        except Exception as e:
-            print(f"Zone detection error: {e}")
-            return False, 0
-    
-    def detect_motion_in_zone(self, frame, zone, camera_id):
-        """Detect motion using frame differencing - more reliable than background subtraction"""
-        try:
-            if not zone:
-                return False, 0
-            
-            # Extract zone coordinates and ensure they are integers
-            x = int(float(zone['x']))
-            y = int(float(zone['y']))
-            w = int(float(zone['width']))
-            h = int(float(zone['height']))
-            
-            # Ensure zone is within frame bounds
-            frame_h, frame_w = frame.shape[:2]
-            x = max(0, min(x, frame_w))
-            y = max(0, min(y, frame_h))
-            w = max(0, min(w, frame_w - x))
-            h = max(0, min(h, frame_h - y))
-            
-            if w <= 0 or h <= 0:
-                return False, 0
-            
-            # Extract zone region
-            zone_frame = frame[y:y+h, x:x+w]
-            
-            # Convert to grayscale
-            gray_zone = cv2.cvtColor(zone_frame, cv2.COLOR_BGR2GRAY)
-            
-            # Apply Gaussian blur to reduce noise
-            gray_zone = cv2.GaussianBlur(gray_zone, (21, 21), 0)
-            
-            # Initialize previous frame for this camera if not exists
-            if camera_id not in self.previous_frames:
-                self.previous_frames[camera_id] = gray_zone.copy()
-                return False, 0
-            
-            # Get previous frame for this camera
-            prev_frame = self.previous_frames[camera_id]
-            
-            # Calculate frame difference
-            frame_diff = cv2.absdiff(gray_zone, prev_frame)
-            
-            # Apply threshold to get binary image
-            _, thresh = cv2.threshold(frame_diff, 30, 255, cv2.THRESH_BINARY)
-            
-            # Remove noise with morphological operations
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-            
-            # Dilate to fill holes
-            thresh = cv2.dilate(thresh, kernel, iterations=2)
-            
-            # Find contours
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            motion_count = 0
-            total_motion_area = 0
-            
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area > 100:  # Minimum area threshold
-                    motion_count += 1
-                    total_motion_area += area
-            
-            # Calculate confidence
-            zone_area = w * h
-            motion_ratio = total_motion_area / zone_area if zone_area > 0 else 0
-            confidence = min(motion_ratio * 10, 1.0)  # Scale confidence
-            
-            # Motion detected if we have significant movement
-            motion_detected = motion_count > 0 and total_motion_area > 500
-            
-            # Update previous frame
-            self.previous_frames[camera_id] = gray_zone.copy()
-            
-            # Debug output
-            if motion_detected:
-                print(f"[MOTION] MOTION DETECTED! Camera {camera_id} - Count: {motion_count}, Area: {total_motion_area}, Confidence: {confidence:.3f}")
-            
-            return motion_detected, {
-                'count': motion_count,
-                'confidence': confidence,
-                'motion_area': total_motion_area,
-                'zone_area': zone_area
-            }
-            
-        except Exception as e:
-            print(f"Zone motion detection error: {e}")
-            return False, 0
-    
-    def test_motion_detection(self, camera_id, zone):
-        """Simple test motion detection that always works - sends alerts every 3 seconds"""
-        try:
-            if camera_id not in self.test_motion_timers:
-                self.test_motion_timers[camera_id] = time.time()
-                return False, 0
-            
-            current_time = time.time()
-            last_alert = self.test_motion_timers[camera_id]
-            
-            # Send test motion alert every 3 seconds
-            if current_time - last_alert >= 3.0:
-                self.test_motion_timers[camera_id] = current_time
-                print(f"[MOTION] TEST MOTION DETECTED! Camera {camera_id} - Test Alert")
-                return True, {
-                    'count': 1,
-                    'confidence': 0.8,
-                    'motion_area': 1000,
-                    'zone_area': zone['width'] * zone['height'] if zone else 1000
-                }
-            
-            return False, 0
-            
-        except Exception as e:
-            print(f"Test motion detection error: {e}")
-            return False, 0
-
-# Initialize detector
-detector = SurveillanceDetector()
+def get_detector():
+    """Return the shared detector, importing OpenCV and building it on first use"""
+    global detector
+    with detector_lock:
+        if detector is None:
+            from surveillance_detector import SurveillanceDetector
+            detector = SurveillanceDetector()
+    return detector
+
+def warm_up():
+    """Initialise Firebase and, when cameras run in this process, load OpenCV and the detector"""
+    started = time.time()
+    # Certificate parsing and the Firestore client block, so keep them off the eventlet hub
+    run_blocking(init_firebase)
+    if STARTUP_WARMUP and not worker_pool:
+        get_detector()
+    print(f"[STARTUP] Warm-up finished in {time.time() - started:.2f}s")
+
+def start_warm_up():
+    """Run warm_up() in the background so the API answers while heavy modules load"""
+    thread = threading.Thread(target=warm_up, name='warm-up')
+    thread.daemon = True
+    thread.start()
+    return thread
+
+def store_detections(camera_id, detections):
+    """Log aggregated detections durably, or queue them for Firestore if the log is disabled"""
+    if detection_history:
+        detection_history.record(camera_id, detections)
+    if event_log:
+        event_log.append(detection_record(camera_id, detections))
+    elif detection_writer:
+        detection_writer.write(camera_id, detections)
 
 def process_camera_stream(camera_id, stream_url):
     """Process camera stream for AI detection"""
     global detection_enabled
     
-    print(f"[CAMERA] Starting camera processing for {camera_id} with stream: {stream_url}")
-    
-    # Handle both camera indices (for local cameras) and URLs (for IP cameras)
-    try:
-        # If stream_url is a number (camera index), use it directly
-        if isinstance(stream_url, (int, str)) and str(stream_url).isdigit():
-            cap = cv2.VideoCapture(int(stream_url))
-        else:
-            # Otherwise treat it as a URL
-            cap = cv2.VideoCapture(stream_url)
-    except:
-        # Fallback to treating it as a URL
-        cap = cv2.VideoCapture(stream_url)
-    
-    if not cap.isOpened():
-        print(f"[CAMERA] Failed to open camera {camera_id}")
-        return
-    
-    print(f"[CAMERA] Camera {camera_id} opened successfully")
-    print(f"[CAMERA] Started processing camera {camera_id}")
+    from camera_pipeline import run_camera_pipeline
     
-    frame_count = 0
+    if scheduler:
+        scheduler.start()
+    camera = active_cameras.get(camera_id, {})
+    # A stop followed by a start registers a new thread: this one must then end and leave the
+    # camera's state to it (no entry at all means the camera was stopped, not restarted)
+    this_thread = threading.current_thread()
     
-    while detection_enabled and camera_id in active_cameras:
-        ret, frame = cap.read()
-        if not ret:
-            print(f"[CAMERA] Failed to read frame from camera {camera_id}")
-            break
-        
-        frame_count += 1
-        
-        # Log every 30 frames (about once per second at 30fps)
-        if frame_count % 30 == 0:
-            print(f"[CAMERA] Processing frame {frame_count} for camera {camera_id}")
-        
-        # Resize frame for processing
-        frame = cv2.resize(frame, (640, 480))
-        
-        # ONLY Zone-based motion detection - no other detections
-        detections = {}
-        
-        # Simple motion detection - always send test alerts every 5 seconds
-        current_time = time.time()
-        if camera_id not in detector.test_motion_timers:
-            detector.test_motion_timers[camera_id] = current_time
-        
-        # Send test motion alert every 5 seconds regardless of zones
-        if current_time - detector.test_motion_timers[camera_id] >= 5.0:
-            detector.test_motion_timers[camera_id] = current_time
-            print(f"[MOTION] TEST MOTION ALERT! Camera {camera_id}")
-            
-            # Send test motion alert
-            socketio.emit('zone_alert', {
-                'camera_id': camera_id,
-                'alert_type': 'motion_detected',
-                'count': 1,
-                'confidence': 0.9,
-                'zone': {'x': 0, 'y': 0, 'width': 640, 'height': 480},
-                'timestamp': datetime.now().isoformat(),
-                'beep': True,
-                'message': f'TEST MOTION DETECTED! Camera {camera_id} - This is a test alert'
-            })
-            
-            # Send general detection alert
-            socketio.emit('detection_alert', {
-                'camera_id': camera_id,
-                'alert_type': 'motion',
-                'detected': True,
-                'count': 1,
-                'confidence': 0.9,
-                'zone': {'x': 0, 'y': 0, 'width': 640, 'height': 480},
-                'motion_area': 1000,
-                'timestamp': datetime.now().isoformat(),
-                'message': f'TEST MOTION DETECTED! Camera {camera_id}'
-            })
-        
-        # Zone-based motion detection ONLY
-        if camera_id in camera_zones and camera_zones[camera_id]:
-            zone = camera_zones[camera_id]
-            print(f"Processing zone for camera {camera_id}: {zone}")
-            
-            # Use test motion detection for guaranteed alerts
-            motion_detected, motion_data = detector.test_motion_detection(camera_id, zone)
-            
-            # Also try real motion detection
-            if not motion_detected:
-                motion_detected, motion_data = detector.detect_motion_in_zone(frame, zone, camera_id)
-            if motion_detected:
-                print(f"[MOTION] MOTION DETECTED in camera {camera_id}!")
-                
-                # Send immediate zone motion alert with beep
-                socketio.emit('zone_alert', {
-                    'camera_id': camera_id,
-                    'alert_type': 'motion_detected',
-                    'count': motion_data['count'],
-                    'confidence': motion_data['confidence'],
-                    'zone': zone,
-                    'timestamp': datetime.now().isoformat(),
-                    'beep': True,
-                    'message': f'Motion detected in zone! Count: {motion_data["count"]}, Confidence: {motion_data["confidence"]:.2f}'
-                })
-                
-                # Send general detection alert
-                socketio.emit('detection_alert', {
-                    'camera_id': camera_id,
-                    'alert_type': 'motion',
-                    'detected': True,
-                    'count': motion_data['count'],
-                    'confidence': motion_data['confidence'],
-                    'zone': zone,
-                    'motion_area': motion_data['motion_area'],
-                    'timestamp': datetime.now().isoformat(),
-                    'message': 'Motion detected in surveillance zone!'
-                })
-                
-                # Also add to general detections
-                detections['zone_motion'] = {
-                    'detected': True,
-                    'count': motion_data['count'],
-                    'confidence': motion_data['confidence'],
-                    'zone': zone,
-                    'motion_area': motion_data['motion_area'],
-                    'timestamp': datetime.now().isoformat()
-                }
-        
-        # Send detections via WebSocket
-        if detections:
-            socketio.emit('detection_alert', {
-                'camera_id': camera_id,
-                'detections': detections,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Store in Firestore if available
-            if firebase_initialized:
-                try:
-                    doc_ref = db.collection('detections').add({
-                        'camera_id': camera_id,
-                        'detections': detections,
-                        'timestamp': firestore.SERVER_TIMESTAMP,
-                        'processed': True
-                    })
-                except Exception as e:
-                    print(f"Firestore error: {e}")
-        
-        # Small delay to prevent overwhelming the system
-        time.sleep(0.1)
+    run_camera_pipeline(
+        camera_id, stream_url, get_detector(),
+        get_zones=camera_zones.get,
+        get_pipeline=camera_pipelines.get,
+        should_run=lambda: (detection_enabled and camera_id in active_cameras
+                            and detection_threads.get(camera_id) is this_thread),
+        owns_camera=lambda: detection_threads.get(camera_id, this_thread) is this_thread,
+        publish=camera_rooms.publish,
+        store_detections=store_detections,
+        captures=camera_captures,
+        analysis_interval=ANALYSIS_INTERVAL,
+        rate_controller=rate_controller,
+        scheduler=scheduler,
+        priority=camera.get('priority', 0),
+        max_staleness=camera.get('max_staleness'),
+        alert_engine=alert_engine
+    )
+
+def parse_scheduling_options(data):
+    """Read a camera's scheduling priority (higher runs first) and frame staleness deadline"""
+    priority = int(data.get('priority', 0))
+    max_staleness = data.get('max_staleness')
+    if max_staleness is not None:
+        max_staleness = float(max_staleness)
+    return priority, max_staleness
+
+def pipeline_info(camera_id):
+    """A camera's effective detector pipeline and its estimated detection cost"""
+    pipeline = camera_pipelines.get(camera_id)
+    effective = pipeline if pipeline is not None else default_pipeline()
+    return {
+        'camera_id': camera_id,
+        'pipeline': effective,
+        'custom': pipeline is not None,
+        'estimated_ms_per_second': detectors.estimate_cost(effective, ANALYSIS_INTERVAL)
+    }
+
+def set_camera_pipeline(camera_id, pipeline):
+    """Apply an already normalised pipeline (None = back to the default) locally and on the workers"""
+    if pipeline is None:
+        camera_pipelines.pop(camera_id, None)
+    else:
+        camera_pipelines[camera_id] = pipeline
+    if worker_pool:
+        worker_pool.update_pipeline(camera_id, pipeline)
+
+def start_camera_detection(camera_id, stream_url):
+    """Start detection for a camera on a local thread or on its worker process"""
+    if worker_pool:
+        camera = active_cameras.get(camera_id, {})
+        worker_pool.start_camera(
+            camera_id, stream_url, camera_zones.get(camera_id),
+            priority=camera.get('priority', 0),
+            max_staleness=camera.get('max_staleness'),
+            pipeline=camera_pipelines.get(camera_id),
+            alert_settings=alert_engine.overrides_for(camera_id)
+        )
+        return
     
-    cap.release()
-    print(f"Stopped processing camera {camera_id}")
+    detection_thread = threading.Thread(
+        target=process_camera_stream,
+        args=(camera_id, stream_url)
+    )
+    detection_thread.daemon = True
+    # Registered before it starts, the thread checks it is still the camera's current one
+    detection_threads[camera_id] = detection_thread
+    detection_thread.start()
+
+def stop_camera_detection(camera_id):
+    """Stop detection for a camera (the caller removes it from active_cameras)"""
+    if worker_pool:
+        worker_pool.stop_camera(camera_id)
+    if camera_id in detection_threads:
+        del detection_threads[camera_id]
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -516,7 +285,8 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'active_cameras': len(active_cameras),
-        'firebase_connected': firebase_initialized
+        'firebase_connected': firebase_initialized,
+        'detector_loaded': detector is not None or worker_pool is not None
     })
 
 @app.route('/api/cameras', methods=['GET'])
@@ -527,6 +297,212 @@ def get_cameras():
         'count': len(active_cameras)
     })
 
+def get_capture_stats():
+    """Collect capture counters from local threads and worker processes"""
+    stats = {camera_id: capture.get_stats() for camera_id, capture in list(camera_captures.items())}
+    if worker_pool:
+        stats.update(worker_pool.get_camera_stats())
+    return stats
+
+def get_background_model_stats():
+    """Collect background model counts and estimated memory from every detector"""
+    if worker_pool:
+        return worker_pool.get_background_model_stats()
+    return {'main': detector.background_models.get_stats()} if detector else {}
+
+@app.route('/api/cameras/stats', methods=['GET'])
+def get_camera_stats():
+    """Get capture counters (captured, analysed, dropped frames) and background model memory"""
+    return jsonify({
+        'cameras': get_capture_stats(),
+        'background_models': get_background_model_stats(),
+        'provisioning': provisioner.get_stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/cameras/rates', methods=['GET'])
+def get_camera_rates():
+    """Get the current adaptive analysis rate of each camera"""
+    if worker_pool:
+        rates = worker_pool.get_rate_stats()
+    else:
+        rates = {'main': rate_controller.get_stats()}
+    return jsonify({
+        'rates': rates,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/scheduler/stats', methods=['GET'])
+def get_scheduler_stats():
+    """Get scheduled, executed and dropped detection jobs per camera"""
+    if worker_pool:
+        stats = worker_pool.get_scheduler_stats()
+    else:
+        stats = {'main': scheduler.get_stats() if scheduler else None}
+    return jsonify({
+        'scheduler': stats,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/alerts', methods=['GET'])
+def get_alert_stats():
+    """Get alert debounce settings and the incidents that are currently open"""
+    if worker_pool:
+        alerts = worker_pool.get_alert_stats()
+    else:
+        alerts = {'main': alert_engine.get_stats()}
+    return jsonify({
+        'alerts': alerts,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/storage/stats', methods=['GET'])
+def get_storage_stats():
+    """Get the Firestore writer, event log and replay backlog statistics"""
+    return jsonify({
+        'firestore_connected': firebase_initialized,
+        'writer': detection_writer.get_stats() if detection_writer else None,
+        'event_log': event_log.get_stats() if event_log else None,
+        'replayer': log_replayer.get_stats() if log_replayer else None,
+        'history': detection_history.get_stats() if detection_history else None,
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/detections', methods=['GET'])
+def get_detections():
+    """Query detection history, newest first
+
+    Filters: camera_id, type, since/until (epoch seconds or ISO 8601), limit (max 1000).
+    Pass the returned next_cursor as cursor to get the following page.
+    """
+    if not detection_history:
+        return jsonify({'error': 'Detection history is disabled'}), 503
+    
+    try:
+        detections, next_cursor = detection_history.query(
+            camera_id=request.args.get('camera_id'),
+            detection_type=request.args.get('type'),
+            since=parse_time(request.args.get('since')),
+            until=parse_time(request.args.get('until')),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', 100)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'detections': detections,
+        'count': len(detections),
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/rooms', methods=['GET'])
+def get_room_stats():
+    """Get Socket.IO subscriber counts per camera room"""
+    stats = camera_rooms.get_stats()
+    stats['timestamp'] = datetime.now().isoformat()
+    return jsonify(stats)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint: detector latency, per-camera throughput, emits, queues and process usage"""
+    snapshots = [registry.snapshot()]
+    processes = {'main': process_stats()}
+    if worker_pool:
+        snapshots.append(worker_pool.get_metrics_snapshot())
+        processes.update(worker_pool.get_process_stats())
+    
+    gauges = []
+    for camera_id, stats in get_capture_stats().items():
+        labels = (('camera_id', str(camera_id)),)
+        gauges += [
+            ('secureeye_capture_fps', labels, stats['capture_fps'], 'gauge', 'Frames read from the source per second'),
+            ('secureeye_analysis_fps', labels, stats.get('analysis_fps'), 'gauge', 'Frames analysed per second'),
+            ('secureeye_frames_captured_total', labels, stats['frames_captured'], 'counter', 'Frames read from the source'),
+            ('secureeye_frames_dropped_total', labels, stats['frames_dropped'], 'counter', 'Frames overwritten before analysis'),
+            ('secureeye_read_failures_total', labels, stats['read_failures'], 'counter', 'Failed reads from the source')
+        ]
+        source = stats.get('source')
+        if source:
+            gauges += [
+                ('secureeye_source_up', labels, 1 if source['state'] == 'streaming' else 0, 'gauge',
+                 'Whether the camera source is currently delivering'),
+                ('secureeye_source_reconnects_total', labels, source['reconnects'], 'counter', 'Successful source reconnects'),
+                ('secureeye_source_downtime_seconds_total', labels, source['downtime_seconds'], 'counter',
+                 'Time spent disconnected')
+            ]
+    for event, count in camera_rooms.get_stats()['emitted'].items():
+        gauges.append(('secureeye_emits_total', (('event', event),), count, 'counter', 'Socket.IO events published'))
+    if detection_writer:
+        gauges.append(('secureeye_firestore_queue_depth', (), detection_writer.get_stats()['queued'], 'gauge',
+                       'Detections waiting for a Firestore batch commit'))
+    if event_log:
+        gauges.append(('secureeye_event_log_uncommitted', (), event_log.get_stats()['uncommitted'], 'gauge',
+                       'Logged detections not yet replayed to Firestore'))
+    if detection_history:
+        gauges.append(('secureeye_history_queue_depth', (), detection_history.get_stats()['queued'], 'gauge',
+                       'Detections waiting to be written to the history database'))
+    for process, stats in processes.items():
+        if not stats:
+            continue
+        labels = (('process', process),)
+        gauges += [
+            ('secureeye_process_cpu_seconds_total', labels, stats['cpu_seconds'], 'counter', 'User and system CPU time'),
+            ('secureeye_process_resident_memory_bytes', labels, stats['rss_bytes'], 'gauge', 'Resident memory')
+        ]
+    
+    text = render_metrics(merge_snapshots(snapshots), gauges, registry.descriptions)
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/trace', methods=['GET'])
+def get_trace():
+    """Dump the last `seconds` (default 10) of stage spans as Chrome trace JSON (chrome://tracing, Perfetto)"""
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        return jsonify({'error': 'seconds must be a number'}), 400
+    
+    spans = {(os.getpid(), 'main'): tracer.collect(seconds)}
+    if worker_pool:
+        spans.update(worker_pool.collect_traces(seconds))
+    return Response(json.dumps(chrome_trace(spans)), mimetype='application/json',
+                    headers={'Content-Disposition': 'attachment; filename=secureeye-trace.json'})
+
+@app.route('/api/trace', methods=['POST'])
+def set_tracing():
+    """Turn stage tracing on or off: {"enabled": true}"""
+    data = request.get_json(silent=True) or {}
+    if 'enabled' not in data:
+        return jsonify({'error': 'enabled is required'}), 400
+    
+    tracer.set_enabled(data['enabled'])
+    if worker_pool:
+        worker_pool.set_tracing(data['enabled'])
+    print(f"[TRACE] Stage tracing {'enabled' if tracer.enabled else 'disabled'}")
+    return jsonify(tracer.get_stats())
+
+@app.route('/api/loadtest/alerts', methods=['POST'])
+def start_alert_load():
+    """Publish synthetic zone alerts: {rate (per second), duration (seconds), camera_ids or cameras}"""
+    if not alert_load:
+        return jsonify({'error': 'Load testing is disabled (set LOADTEST_ENABLED=1)'}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        camera_ids = data.get('camera_ids') or [f"load-{index}" for index in range(int(data.get('cameras', 1)))]
+        run_id = alert_load.start(float(data.get('rate', 10)), float(data.get('duration', 10)), camera_ids)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'run_id': run_id, 'camera_ids': camera_ids})
+
+@app.route('/api/loadtest/alerts', methods=['GET'])
+def get_alert_load():
+    """Progress of the synthetic alert run and the server-side cost of each publish"""
+    if not alert_load:
+        return jsonify({'error': 'Load testing is disabled (set LOADTEST_ENABLED=1)'}), 404
+    return jsonify(alert_load.get_stats())
+
 @app.route('/api/cameras', methods=['POST'])
 def add_camera():
     """Add a new camera for monitoring"""
@@ -537,30 +513,138 @@ def add_camera():
     if not camera_id or not stream_url:
         return jsonify({'error': 'Missing camera_id or stream_url'}), 400
     
-    if camera_id in active_cameras:
-        return jsonify({'error': 'Camera already exists'}), 400
+    try:
+        priority, max_staleness = parse_scheduling_options(data)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid priority or max_staleness'}), 400
     
-    # Add camera to active list
-    active_cameras[camera_id] = {
-        'stream_url': stream_url,
-        'added_at': datetime.now().isoformat(),
-        'status': 'active'
-    }
+    pipeline = None
+    if data.get('pipeline') is not None:
+        try:
+            pipeline = detectors.normalize_pipeline(data['pipeline'])
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid pipeline: {e}'}), 400
     
-    # Start detection thread
-    detection_thread = threading.Thread(
-        target=process_camera_stream,
-        args=(camera_id, stream_url)
-    )
-    detection_thread.daemon = True
-    detection_thread.start()
-    detection_threads[camera_id] = detection_thread
+    if not register_camera(camera_id, stream_url, priority, max_staleness, pipeline):
+        return jsonify({'error': 'Camera already exists'}), 400
     
     return jsonify({
         'message': 'Camera added successfully',
         'camera_id': camera_id
     })
 
+def register_camera(camera_id, stream_url, priority=0, max_staleness=None, pipeline=None):
+    """Add a camera to the active list and start its detection; False if it already exists"""
+    with cameras_lock:
+        if camera_id in active_cameras:
+            return False
+        if pipeline is not None:
+            set_camera_pipeline(camera_id, pipeline)
+        active_cameras[camera_id] = {
+            'stream_url': stream_url,
+            'added_at': datetime.now().isoformat(),
+            'status': 'active',
+            'priority': priority,
+            'max_staleness': max_staleness
+        }
+    
+    # Start detection thread (or hand the camera to its worker process)
+    start_camera_detection(camera_id, stream_url)
+    return True
+
+@app.route('/api/cameras/bulk', methods=['POST'])
+def add_cameras_bulk():
+    """Probe and add many cameras at once: {"cameras": [{camera_id, stream_url, ...}], "timeout", "refresh"}
+
+    Sources are probed concurrently, each within the timeout, and the response streams one JSON
+    line per camera as soon as it resolves, followed by a summary line.
+    """
+    data = request.get_json(silent=True) or {}
+    specs = data.get('cameras')
+    if not isinstance(specs, list) or not specs:
+        return jsonify({'error': 'cameras must be a non-empty list'}), 400
+    try:
+        timeout = float(data['timeout']) if data.get('timeout') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'timeout must be a number'}), 400
+    refresh = bool(data.get('refresh', False))
+    
+    # Specs that can be rejected without touching the source are answered first
+    immediate = []
+    probe_specs = []
+    seen = set()
+    for spec in specs:
+        spec = spec if isinstance(spec, dict) else {}
+        camera_id = spec.get('camera_id')
+        stream_url = spec.get('stream_url')
+        result = {'camera_id': camera_id, 'stream_url': stream_url}
+        if not camera_id or not stream_url:
+            immediate.append(dict(result, status='invalid', error='Missing camera_id or stream_url'))
+            continue
+        try:
+            priority, max_staleness = parse_scheduling_options(spec)
+        except (TypeError, ValueError):
+            immediate.append(dict(result, status='invalid', error='Invalid priority or max_staleness'))
+            continue
+        try:
+            pipeline = detectors.normalize_pipeline(spec['pipeline']) if spec.get('pipeline') is not None else None
+        except (TypeError, ValueError) as e:
+            immediate.append(dict(result, status='invalid', error=f'Invalid pipeline: {e}'))
+            continue
+        if camera_id in active_cameras or camera_id in seen:
+            immediate.append(dict(result, status='exists', error='Camera already exists'))
+            continue
+        seen.add(camera_id)
+        probe_specs.append({'camera_id': camera_id, 'stream_url': str(stream_url),
+                            'priority': priority, 'max_staleness': max_staleness, 'pipeline': pipeline})
+    
+    def register(spec, result):
+        added = register_camera(spec['camera_id'], spec['stream_url'], spec['priority'], spec['max_staleness'],
+                                spec['pipeline'])
+        return 'added' if added else 'exists'
+    
+    def generate():
+        started = time.time()
+        counts = {}
+        results = itertools.chain(immediate, provisioner.provision(probe_specs, register, timeout=timeout, refresh=refresh))
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+            yield json.dumps(result) + '\n'
+        print(f"[PROVISION] Bulk provisioning of {len(specs)} cameras: {counts}")
+        yield json.dumps({'summary': counts, 'total': len(specs), 'elapsed_ms': (time.time() - started) * 1000}) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/detectors', methods=['GET'])
+def get_detectors():
+    """List detector plugins (inputs, cost, default cadence) and the default camera pipeline"""
+    return jsonify({
+        'detectors': detectors.describe(),
+        'default_pipeline': default_pipeline()
+    })
+
+@app.route('/api/cameras/<camera_id>/pipeline', methods=['GET'])
+def get_camera_pipeline(camera_id):
+    """Get the detectors a camera runs and how often"""
+    if camera_id not in active_cameras:
+        return jsonify({'error': 'Camera not found'}), 404
+    return jsonify(pipeline_info(camera_id))
+
+@app.route('/api/cameras/<camera_id>/pipeline', methods=['PUT'])
+def update_camera_pipeline(camera_id):
+    """Set a camera's detectors: {"pipeline": {"motion": {}, "fire": {"interval": 2}}}, null resets to the default"""
+    if camera_id not in active_cameras:
+        return jsonify({'error': 'Camera not found'}), 404
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'pipeline' not in data:
+        return jsonify({'error': 'pipeline is required'}), 400
+    try:
+        pipeline = detectors.normalize_pipeline(data['pipeline']) if data['pipeline'] is not None else None
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid pipeline: {e}'}), 400
+    set_camera_pipeline(camera_id, pipeline)
+    return jsonify(pipeline_info(camera_id))
+
 @app.route('/api/cameras/<camera_id>', methods=['DELETE'])
 def remove_camera(camera_id):
     """Remove a camera from monitoring"""
@@ -571,8 +655,7 @@ def remove_camera(camera_id):
     del active_cameras[camera_id]
     
     # Stop detection thread
-    if camera_id in detection_threads:
-        del detection_threads[camera_id]
+    stop_camera_detection(camera_id)
     
     return jsonify({
         'message': 'Camera removed successfully',
@@ -580,15 +663,36 @@ def remove_camera(camera_id):
     })
 
 @socketio.on('connect')
-def handle_connect():
-    """Handle client connection"""
+def handle_connect(auth=None):
+    """Handle client connection and negotiate its alert encoding (JSON unless it asks for msgpack)"""
     print(f'Client connected: {request.sid}')
-    emit('status', {'message': 'Connected to SecureEye AI backend'})
+    encoding = client_encoding(auth, request.args)
+    camera_rooms.connect(request.sid, encoding)
+    emit('status', {
+        'message': 'Connected to SecureEye AI backend',
+        'encoding': encoding,
+        'encoding_version': ENCODING_VERSION
+    })
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
     print(f'Client disconnected: {request.sid}')
+    camera_rooms.disconnect(request.sid)
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Receive alerts for {camera_ids: [...]} or {camera_id} or, with {all: true}, every camera"""
+    camera_ids, all_cameras = parse_subscription(data)
+    rooms = camera_rooms.subscribe(request.sid, camera_ids, all_cameras)
+    emit('subscribed', {'rooms': rooms})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Stop receiving alerts for the given cameras (or, with {all: true}, the all-cameras room)"""
+    camera_ids, all_cameras = parse_subscription(data)
+    rooms = camera_rooms.unsubscribe(request.sid, camera_ids, all_cameras)
+    emit('subscribed', {'rooms': rooms})
 
 @socketio.on('start_detection')
 def handle_start_detection(data):
@@ -599,22 +703,21 @@ def handle_start_detection(data):
     print(f"[DETECTION] Received start_detection request: camera_id={camera_id}, stream_url={stream_url}")
     
     if camera_id and stream_url:
-        if camera_id not in active_cameras:
-            active_cameras[camera_id] = {
-                'stream_url': stream_url,
-                'added_at': datetime.now().isoformat(),
-                'status': 'active'
-            }
-            
-            print(f"[DETECTION] Starting detection thread for camera {camera_id}")
-            detection_thread = threading.Thread(
-                target=process_camera_stream,
-                args=(camera_id, stream_url)
-            )
-            detection_thread.daemon = True
-            detection_thread.start()
-            detection_threads[camera_id] = detection_thread
-            
+        try:
+            priority, max_staleness = parse_scheduling_options(data)
+        except (TypeError, ValueError):
+            emit('error', {'message': 'Invalid priority or max_staleness'})
+            return
+        
+        pipeline = None
+        if data.get('pipeline') is not None:
+            try:
+                pipeline = detectors.normalize_pipeline(data['pipeline'])
+            except (TypeError, ValueError) as e:
+                emit('error', {'message': f'Invalid pipeline: {e}'})
+                return
+        
+        if register_camera(camera_id, stream_url, priority, max_staleness, pipeline):
             emit('detection_started', {'camera_id': camera_id})
             print(f"[DETECTION] Detection started for camera {camera_id}")
         else:
@@ -631,49 +734,142 @@ def handle_stop_detection(data):
     
     if camera_id in active_cameras:
         del active_cameras[camera_id]
-        if camera_id in detection_threads:
-            del detection_threads[camera_id]
+        stop_camera_detection(camera_id)
         emit('detection_stopped', {'camera_id': camera_id})
     else:
         emit('error', {'message': 'Camera not found'})
 
 @socketio.on('update_zone')
 def handle_update_zone(data):
-    """Update detection zone for a camera"""
+    """Update detection zones for a camera
+
+    Accepts {'zone': {...}} (replaces all zones, or one named zone if it has a 'name')
+    or {'zones': [{...}, ...]} (replaces the camera's zone list).
+    """
     camera_id = data.get('camera_id')
     zone = data.get('zone')
+    zones = data.get('zones')
     
-    print(f"Received zone update for camera {camera_id}: {zone}")
+    print(f"Received zone update for camera {camera_id}: {zones or zone}")
     
-    if camera_id and zone:
-        camera_zones[camera_id] = zone
-        print(f"Zone updated for camera {camera_id}: {zone}")
+    if camera_id and (zone or zones):
+        try:
+            if zones:
+                camera_zones[camera_id] = normalize_zones(zones)
+            elif zone.get('name') and camera_zones.get(camera_id):
+                camera_zones[camera_id] = upsert_zone(camera_zones[camera_id], zone)
+            else:
+                camera_zones[camera_id] = normalize_zones(zone)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Invalid zone data received: {data} ({e})")
+            emit('error', {'message': f'Invalid zone data: {e}'})
+            return
+        
+        if worker_pool:
+            worker_pool.update_zones(camera_id, camera_zones[camera_id])
+        print(f"Zones updated for camera {camera_id}: {[z['name'] for z in camera_zones[camera_id]]}")
         emit('zone_updated', {
             'camera_id': camera_id,
-            'zone': zone,
+            'zone': camera_zones[camera_id][0],
+            'zones': camera_zones[camera_id],
             'message': 'Zone updated successfully'
         })
     else:
         print(f"Invalid zone data received: {data}")
         emit('error', {'message': 'Invalid zone data'})
 
+@socketio.on('update_alert_settings')
+def handle_update_alert_settings(data):
+    """Change alert timing (min_duration, clear_after, ongoing_interval, cooldown in seconds)
+
+    Applies to one camera when camera_id is given, otherwise to the defaults of every camera.
+    """
+    camera_id = data.get('camera_id')
+    settings = {key: value for key, value in data.items() if key != 'camera_id'}
+    
+    try:
+        # Validates the settings; with worker processes it also keeps the main copy current
+        alert_engine.configure(camera_id, **settings)
+    except (TypeError, ValueError) as e:
+        emit('error', {'message': f'Invalid alert settings: {e}'})
+        return
+    
+    if worker_pool:
+        worker_pool.update_alert_settings(camera_id, settings)
+    emit('alert_settings_updated', {
+        'camera_id': camera_id,
+        'settings': alert_engine.settings_for(camera_id),
+        'message': 'Alert settings updated successfully'
+    })
+
+@socketio.on('update_pipeline')
+def handle_update_pipeline(data):
+    """Set the detectors a camera runs: {camera_id, pipeline} (null pipeline resets to the default)"""
+    camera_id = data.get('camera_id')
+    if not camera_id or 'pipeline' not in data:
+        emit('error', {'message': 'Missing camera_id or pipeline'})
+        return
+    if camera_id not in active_cameras:
+        emit('error', {'message': 'Camera not found'})
+        return
+    try:
+        pipeline = detectors.normalize_pipeline(data['pipeline']) if data['pipeline'] is not None else None
+    except (TypeError, ValueError) as e:
+        emit('error', {'message': f'Invalid pipeline: {e}'})
+        return
+    
+    set_camera_pipeline(camera_id, pipeline)
+    print(f"Pipeline updated for camera {camera_id}: {list((pipeline or default_pipeline()).keys())}")
+    emit('pipeline_updated', dict(pipeline_info(camera_id), message='Pipeline updated successfully'))
+
+@socketio.on('get_pipeline')
+def handle_get_pipeline(data):
+    """Get the detectors a camera runs and how often"""
+    emit('pipeline_data', pipeline_info(data.get('camera_id')))
+
 @socketio.on('get_zone')
 def handle_get_zone(data):
     """Get current zone configuration for a camera"""
     camera_id = data.get('camera_id')
+    zones = camera_zones.get(camera_id) or []
     
-    if camera_id in camera_zones:
-        emit('zone_data', {
-            'camera_id': camera_id,
-            'zone': camera_zones[camera_id]
-        })
-    else:
-        emit('zone_data', {
-            'camera_id': camera_id,
-            'zone': None
-        })
+    emit('zone_data', {
+        'camera_id': camera_id,
+        'zone': zones[0] if zones else None,
+        'zones': zones
+    })
+
+def start_detection_workers():
+    """Start detection worker processes if configured
+
+    Cooperative mode always uses them (one per CPU unless DETECTION_WORKERS says otherwise),
+    spawned as fresh interpreters, so OpenCV capture and detection never run on the event loop.
+    """
+    global worker_pool
+    num_workers = DETECTION_WORKERS
+    if ASYNC_MODE == 'eventlet' and num_workers <= 0:
+        num_workers = os.cpu_count() or 2
+    if num_workers <= 0:
+        return
+    
+    worker_pool = CameraWorkerPool(
+        num_workers,
+        publish=camera_rooms.publish,
+        store_detections=store_detections,
+        analysis_interval=ANALYSIS_INTERVAL,
+        start_method='spawn' if ASYNC_MODE == 'eventlet' else None
+    )
+    worker_pool.start()
 
 if __name__ == '__main__':
     print("SecureEye Backend Starting...")
-    socketio.run(app, host='0.0.0.0', port=5000, debug=False)
-
+    
+    start_storage()
+    start_detection_workers()
+    start_warm_up()
+    
+    # Flask-SocketIO refuses to run the Werkzeug development server without a terminal unless told
+    # to; only DEBUG=True allows it, production runs async_server.py (or gunicorn) instead
+    DEBUG = os.getenv('DEBUG', 'False').lower() in ('1', 'true', 'yes')
+    socketio.run(app, host='0.0.0.0', port=int(os.getenv('PORT', '5000')), debug=False,
+                 allow_unsafe_werkzeug=DEBUG)
@@ -0,0 +1,34 @@
+"""
+SecureEye async server
+Runs the Socket.IO backend on eventlet's cooperative event loop, with OpenCV capture and detection in worker processes
+
+    python async_server.py
+    gunicorn --worker-class eventlet -w 1 --bind 0.0.0.0:5000 "async_server:create_app()"
+
+Keep to one gunicorn worker: Socket.IO clients must always reach the process that holds their session.
+"""
+
+import os
+
+
+def create_app():
+    """Import the backend (eventlet must already be monkey-patched), open its storage, start its detection workers and warm-up"""
+    import app as backend
+    if backend.ASYNC_MODE != 'eventlet':
+        raise RuntimeError("eventlet.monkey_patch() must run before the backend is imported")
+    backend.start_storage()
+    backend.start_detection_workers()
+    backend.start_warm_up()
+    return backend.app
+
+
+if __name__ == '__main__':
+    # Patch before anything imports socket/threading; kept out of module scope because spawned
+    # detection workers re-import this file and must keep real threads for OpenCV
+    import eventlet
+    eventlet.monkey_patch()
+
+    application = create_app()
+    from app import socketio
+    print("SecureEye async backend starting (eventlet)...")
+    socketio.run(application, host='0.0.0.0', port=int(os.getenv('PORT', '5000')))
@@ -0,0 +1,71 @@
+"""
+SecureEye background model registry
+One MOG2 background subtractor per camera and region, created lazily and evicted with the camera
+"""
+
+import threading
+import cv2
+
+
+class BackgroundModelRegistry:
+    def __init__(self, detect_shadows=True):
+        self.detect_shadows = detect_shadows
+        self.models = {}  # (camera_id, region) -> {'model', 'geometry', 'bytes'}
+        self.lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, camera_id, region, image, origin=(0, 0)):
+        """Return the background model for a camera region, sized to the image it will be fed
+
+        A model whose region moved (origin) or changed size is replaced, since MOG2 can only
+        learn a background for a fixed pixel grid.
+        """
+        key = (camera_id, region)
+        geometry = (tuple(origin), image.shape)
+        with self.lock:
+            entry = self.models.get(key)
+            if entry is not None and entry['geometry'] == geometry:
+                return entry['model']
+
+            model = cv2.createBackgroundSubtractorMOG2(detectShadows=self.detect_shadows)
+            self.models[key] = {
+                'model': model,
+                'geometry': geometry,
+                'bytes': self._estimate_bytes(model, image.shape)
+            }
+            self.created += 1
+            return model
+
+    def _estimate_bytes(self, model, shape):
+        """Approximate MOG2 memory: per pixel and mixture a weight, a variance and a mean per channel"""
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) > 2 else 1
+        mixtures = model.getNMixtures()
+        # float32 model parameters plus one byte per pixel for the number of used modes
+        return height * width * (mixtures * (2 + channels) * 4 + 1)
+
+    def evict(self, camera_id):
+        """Drop every model that belongs to a camera"""
+        with self.lock:
+            keys = [key for key in self.models if key[0] == camera_id]
+            for key in keys:
+                del self.models[key]
+            self.evicted += len(keys)
+        return len(keys)
+
+    def get_stats(self):
+        """Report model counts and estimated memory per camera and in total"""
+        with self.lock:
+            cameras = {}
+            for (camera_id, region), entry in self.models.items():
+                camera = cameras.setdefault(str(camera_id), {'models': 0, 'bytes': 0})
+                camera['models'] += 1
+                camera['bytes'] += entry['bytes']
+            return {
+                'models': len(self.models),
+                'total_bytes': sum(entry['bytes'] for entry in self.models.values()),
+                'created': self.created,
+                'evicted': self.evicted,
+                'cameras': cameras
+            }
@@ -0,0 +1,332 @@
+"""
+SecureEye detector benchmark
+Replays recorded or generated video through SurveillanceDetector and HumanDetector at full speed
+
+    python benchmark.py                                   # generated video, default matrix
+    python benchmark.py --video lobby.mp4 --resolutions 640x480,1920x1080 --zones single,quad
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+
+Only the detector call is timed (decoding and resizing the source are not). Allocations are
+measured in a separate, shorter pass under tracemalloc so they do not skew the latencies.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import cv2
+import numpy as np
+from frame_context import FrameContext
+from report_stats import percentile
+from zones import normalize_zones
+
+# Zone layouts in 640x480 analysis coordinates, scaled to each benchmark resolution
+ZONE_PRESETS = {
+    'single': [{'name': 'door', 'x': 100, 'y': 100, 'width': 400, 'height': 300}],
+    'quad': [
+        {'name': 'nw', 'x': 20, 'y': 20, 'width': 280, 'height': 200},
+        {'name': 'ne', 'x': 340, 'y': 20, 'width': 280, 'height': 200},
+        {'name': 'sw', 'x': 20, 'y': 260, 'width': 280, 'height': 200},
+        {'name': 'se', 'x': 340, 'y': 260, 'width': 280, 'height': 200}
+    ],
+    'polygon': [
+        {'name': 'yard', 'points': [[40, 440], [320, 60], [600, 440]]},
+        {'name': 'tree', 'type': 'exclude', 'x': 280, 'y': 200, 'width': 80, 'height': 120}
+    ]
+}
+
+DEFAULT_RESOLUTIONS = '640x480,1280x720,1920x1080'
+DEFAULT_ZONES = 'single,quad,polygon'
+
+
+def parse_resolution(text):
+    """'1280x720' -> (1280, 720)"""
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def scaled_zones(preset, width, height):
+    """Zone preset scaled from 640x480 to the frame size and normalized"""
+    sx, sy = width / 640.0, height / 480.0
+    zones = []
+    for zone in ZONE_PRESETS[preset]:
+        zone = dict(zone)
+        if 'points' in zone:
+            zone['points'] = [[int(x * sx), int(y * sy)] for x, y in zone['points']]
+        else:
+            zone.update(x=int(zone['x'] * sx), y=int(zone['y'] * sy),
+                        width=int(zone['width'] * sx), height=int(zone['height'] * sy))
+        zones.append(zone)
+    return normalize_zones(zones)
+
+
+def generate_video(path, width, height, frames, fps=30, seed=7):
+    """Write a reproducible clip of person-sized blobs walking over a noisy, flickering background"""
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    background = rng.integers(40, 90, (height, width, 3), dtype=np.uint8)
+    walkers = [(rng.uniform(0, width), rng.uniform(0, height), rng.uniform(-6, 6), rng.uniform(-3, 3))
+               for _ in range(3)]
+    body_w, body_h = max(8, width // 24), max(16, height // 6)
+    for index in range(frames):
+        frame = background.copy()
+        # Slow global brightness drift and sensor noise, like a real camera
+        frame = cv2.add(frame, np.full_like(frame, int(10 + 10 * np.sin(index / 15.0))))
+        frame = cv2.add(frame, rng.integers(0, 12, frame.shape, dtype=np.uint8))
+        for x0, y0, dx, dy in walkers:
+            x = int(x0 + dx * index * width / 640.0) % width
+            y = int(y0 + dy * index * height / 480.0) % height
+            cv2.rectangle(frame, (x, y), (x + body_w, y + body_h), (200, 180, 160), -1)
+            cv2.circle(frame, (x + body_w // 2, y - body_w // 2), body_w // 2, (190, 170, 150), -1)
+        # Occasional fire-coloured flicker so the colour detectors have work to do
+        if index % 40 < 10:
+            cv2.circle(frame, (width // 5, height - height // 5), max(6, width // 30), (0, 80, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def video_frames(path, width, height, count):
+    """Yield count frames from a video at the given size, looping the file as needed"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video {path}")
+    try:
+        produced = 0
+        while produced < count:
+            ret, frame = cap.read()
+            if not ret:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = cap.read()
+                if not ret:
+                    raise RuntimeError(f"No frames in video {path}")
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height))
+            produced += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def _zone_crop(frame, zones):
+    """The first include zone's rectangle, as the human backend crops its detection zone"""
+    zone = next((zone for zone in zones if zone['type'] == 'include'), None)
+    if zone is None:
+        return frame
+    return frame[zone['y']:zone['y'] + zone['height'], zone['x']:zone['x'] + zone['width']]
+
+
+def surveillance_targets(detector):
+    """(name, uses_zones, call(frame, previous, zones, camera_id)) for SurveillanceDetector"""
+    def all_detectors(frame, previous, zones, camera_id):
+        # The full set sharing one FrameContext, as a camera running every detector would
+        ctx = FrameContext(frame)
+        detector.detect_fire(ctx)
+        detector.detect_motion(ctx, camera_id)
+        detector.detect_violence(ctx)
+        detector.detect_crowd(ctx)
+        detector.detect_humans_in_zones(ctx, zones, camera_id)
+        detector.detect_motion_in_zones(ctx, zones, camera_id)
+
+    return [
+        ('detect_fire', False, lambda frame, previous, zones, camera_id: detector.detect_fire(FrameContext(frame))),
+        ('detect_motion', False, lambda frame, previous, zones, camera_id: detector.detect_motion(FrameContext(frame), camera_id)),
+        ('detect_violence', False, lambda frame, previous, zones, camera_id: detector.detect_violence(FrameContext(frame))),
+        ('detect_crowd', False, lambda frame, previous, zones, camera_id: detector.detect_crowd(FrameContext(frame))),
+        ('detect_motion_in_zones', True,
+         lambda frame, previous, zones, camera_id: detector.detect_motion_in_zones(FrameContext(frame), zones, camera_id)),
+        ('detect_humans_in_zones', True,
+         lambda frame, previous, zones, camera_id: detector.detect_humans_in_zones(FrameContext(frame), zones, camera_id)),
+        ('all', True, all_detectors)
+    ]
+
+
+def human_targets(detector):
+    """(name, uses_zones, call(frame, previous, zones, camera_id)) for HumanDetector on the zone crop"""
+    def detect_humans(frame, previous, zones, camera_id):
+        return detector.detect_humans(_zone_crop(frame, zones),
+                                      _zone_crop(previous, zones) if previous is not None else None)
+
+    def detect_motion(frame, previous, zones, camera_id):
+        return detector.detect_motion(_zone_crop(frame, zones),
+                                      _zone_crop(previous, zones) if previous is not None else None)
+
+    return [('detect_humans', True, detect_humans), ('detect_motion', True, detect_motion)]
+
+
+def load_detectors(names):
+    """Instantiate the requested detector classes -> {name: targets}"""
+    detectors = {}
+    if 'surveillance' in names:
+        from surveillance_detector import SurveillanceDetector
+        detectors['surveillance'] = surveillance_targets(SurveillanceDetector())
+    if 'human' in names:
+        from human_detector import HumanDetector
+        detectors['human'] = human_targets(HumanDetector())
+    return detectors
+
+
+def run_case(call, frames, zones, camera_id, warmup, timed, alloc_frames):
+    """Time call over warmup + timed frames, then measure its allocations over alloc_frames more"""
+    latencies = []
+    previous = None
+    for index, frame in zip(range(warmup + timed), frames):
+        started = time.perf_counter()
+        call(frame, previous, zones, camera_id)
+        elapsed = time.perf_counter() - started
+        if index >= warmup:
+            latencies.append(elapsed)
+        previous = frame
+
+    peaks = []
+    retained = 0
+    if alloc_frames:
+        # Decoded before tracing starts so only the detector's own allocations are counted
+        extra = [frame for _, frame in zip(range(alloc_frames), frames)] or [previous]
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for frame in extra:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            call(frame, previous, zones, camera_id)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            previous = frame
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        'frames': len(latencies),
+        'fps': len(latencies) / total if total > 0 else None,
+        'mean_ms': total / len(latencies) * 1000 if latencies else None,
+        'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'max_ms': latencies[-1] * 1000 if latencies else None,
+        'alloc_peak_bytes_mean': sum(peaks) / len(peaks) if peaks else None,
+        'alloc_peak_bytes_max': max(peaks) if peaks else None,
+        'alloc_retained_bytes': retained if alloc_frames else None
+    }
+
+
+def git_commit():
+    """Current commit of the checkout, if it is one"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(result):
+    return (result['detector'], result['target'], result['resolution'], result['zones'], result['source'])
+
+
+def print_results(results, baseline=None):
+    """Table of results, with the fps change against a previous run when given"""
+    previous = {case_key(result): result for result in (baseline or {}).get('results', [])}
+    print(f"{'detector':<13}{'target':<24}{'resolution':<11}{'zones':<9}{'fps':>9}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'alloc KB':>10}{'vs base':>9}")
+    for result in results:
+        old = previous.get(case_key(result))
+        change = ''
+        if old and old.get('fps') and result['fps']:
+            change = f"{(result['fps'] / old['fps'] - 1) * 100:+.1f}%"
+        alloc = result['alloc_peak_bytes_mean']
+        print(f"{result['detector']:<13}{result['target']:<24}{result['resolution']:<11}{result['zones']:<9}"
+              f"{result['fps'] or 0:>9.1f}{result['p50_ms'] or 0:>9.2f}{result['p99_ms'] or 0:>9.2f}"
+              f"{(alloc or 0) / 1024:>10.1f}{change:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark SecureEye detectors on replayed video')
+    parser.add_argument('--video', action='append', default=[],
+                        help='Recorded video to replay (repeatable); a generated clip is used if omitted')
+    parser.add_argument('--resolutions', default=DEFAULT_RESOLUTIONS, help='Comma-separated WxH list')
+    parser.add_argument('--zones', default=DEFAULT_ZONES, help=f"Comma-separated presets: {', '.join(ZONE_PRESETS)}")
+    parser.add_argument('--detectors', default='surveillance,human', help='surveillance, human or both')
+    parser.add_argument('--targets', default='', help='Only run these detector methods (comma-separated)')
+    parser.add_argument('--frames', type=int, default=200, help='Timed frames per case')
+    parser.add_argument('--warmup', type=int, default=20, help='Untimed frames first (background models settle)')
+    parser.add_argument('--alloc-frames', type=int, default=20, help='Frames measured under tracemalloc (0 disables)')
+    parser.add_argument('--output', default='', help='Write results JSON here')
+    parser.add_argument('--compare', default='', help='Previous results JSON to compare fps against')
+    args = parser.parse_args(argv)
+
+    resolutions = [parse_resolution(text) for text in args.resolutions.split(',') if text]
+    presets = [name for name in args.zones.split(',') if name]
+    unknown = [name for name in presets if name not in ZONE_PRESETS]
+    if unknown:
+        parser.error(f"Unknown zone preset(s): {', '.join(unknown)}")
+    only = {name for name in args.targets.split(',') if name}
+
+    detectors = load_detectors({name.strip() for name in args.detectors.split(',')})
+
+    workdir = tempfile.mkdtemp(prefix='secureeye-bench-')
+    results = []
+    for width, height in resolutions:
+        resolution = f"{width}x{height}"
+        sources = [(os.path.basename(path), path) for path in args.video]
+        if not sources:
+            path = os.path.join(workdir, f"synthetic_{resolution}.avi")
+            sources = [('synthetic', generate_video(path, width, height, min(args.frames + args.warmup, 300)))]
+
+        for source_name, path in sources:
+            for detector_name, targets in detectors.items():
+                for target, uses_zones, call in targets:
+                    if only and target not in only:
+                        continue
+                    for preset in (presets if uses_zones else ['-']):
+                        zones = scaled_zones(preset, width, height) if uses_zones else []
+                        camera_id = f"bench-{detector_name}-{target}-{resolution}-{preset}"
+                        # Every case replays the same frames from the start; decoding is not timed
+                        frames = video_frames(path, width, height, args.warmup + args.frames + args.alloc_frames)
+                        result = run_case(call, frames, zones, camera_id, args.warmup, args.frames, args.alloc_frames)
+                        result.update(detector=detector_name, target=target, resolution=resolution,
+                                      zones=preset, source=source_name)
+                        results.append(result)
+                        print(f"[BENCH] {detector_name}.{target} {resolution} zones={preset}: "
+                              f"{result['fps']:.1f} fps, p99 {result['p99_ms']:.2f} ms")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'opencv_threads': cv2.getNumThreads(),
+            'args': vars(args)
+        },
+        'results': results
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    print("")
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[BENCH] Results written to {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
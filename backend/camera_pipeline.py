@@ -0,0 +1,460 @@
+"""
+SecureEye camera pipeline
+Per-camera capture and analysis loop, independent of Flask/Socket.IO so it can run in worker processes
+"""
+
+import time
+from datetime import datetime
+import cv2
+from frame_capture import LatestFrameCapture
+from frame_context import FrameContext
+from alert_engine import AlertEngine
+from detector_registry import CameraPipeline
+from metrics import registry
+from tracing import tracer
+
+
+def alert_label(alert_type):
+    """Human-readable name of a detector's alert type ('frame_motion' -> 'Frame motion')"""
+    return alert_type.replace('_', ' ').capitalize()
+
+
+def detection_key(alert_type):
+    """Key of an alert type in the stored detections (zone motion keeps its established name)"""
+    return 'zone_motion' if alert_type == 'motion' else alert_type
+
+
+def last_zone(alert):
+    """Zone an engine alert was last observed with (name only if its definition was never seen)"""
+    return alert.get('zone') or {'name': alert['zone_name']}
+
+
+def publish_ended_alerts(camera_id, ended, publish, store_detections=None):
+    """Publish and store the end of closed incidents, given as (zone, alert) pairs"""
+    by_type = {}
+    for zone, alert in ended:
+        alert_type = alert.get('alert_type') or 'motion'
+        label = alert_label(alert_type)
+        by_type.setdefault(alert_type, []).append((zone, alert))
+        print(f"[{alert_type.upper()}] {label} ended in camera {camera_id} zone {zone['name']} after {alert['duration']:.1f}s")
+        publish('zone_alert', {
+            'camera_id': camera_id,
+            'alert_type': f'{alert_type}_ended',
+            'phase': 'ended',
+            'alert_id': alert['alert_id'],
+            'count': alert['detections'],
+            'confidence': alert['peak_confidence'],
+            'duration': alert['duration'],
+            'zone': zone,
+            'timestamp': datetime.now().isoformat(),
+            'beep': False,
+            'message': f'{label} ended in zone {zone["name"]} after {alert["duration"]:.0f}s'
+        })
+    
+    # One record per detector for the batch so history has both ends of each incident
+    detections = {}
+    for alert_type, closed_alerts in by_type.items():
+        zone, alert = max(closed_alerts, key=lambda item: item[1]['duration'])
+        detections[detection_key(alert_type)] = {
+            'detected': False,
+            'phase': 'ended',
+            'count': sum(closed['detections'] for _, closed in closed_alerts),
+            'confidence': alert['peak_confidence'],
+            'zone': zone,
+            'zones': [closed_zone['name'] for closed_zone, _ in closed_alerts],
+            'alert_ids': [closed['alert_id'] for _, closed in closed_alerts],
+            'duration': alert['duration'],
+            'timestamp': datetime.now().isoformat()
+        }
+    publish('detection_alert', {
+        'camera_id': camera_id,
+        'detections': detections,
+        'timestamp': datetime.now().isoformat()
+    })
+    if store_detections:
+        store_detections(camera_id, detections)
+
+
+def publish_detector_alert(camera_id, alert, zone, data, publish):
+    """Publish a started or ongoing incident of a pipeline detector other than zone motion"""
+    alert_type = alert['alert_type']
+    label = alert_label(alert_type)
+    if alert['phase'] == 'started':
+        print(f"[{alert_type.upper()}] {label} detected in camera {camera_id} zone {zone['name']}!")
+        publish('zone_alert', {
+            'camera_id': camera_id,
+            'alert_type': f'{alert_type}_detected',
+            'phase': 'started',
+            'alert_id': alert['alert_id'],
+            'count': data.get('count', 1),
+            'confidence': data['confidence'],
+            'zone': zone,
+            'timestamp': datetime.now().isoformat(),
+            'beep': True,
+            'message': f'{label} detected in zone {zone["name"]}! Confidence: {data["confidence"]:.2f}'
+        })
+        publish('detection_alert', {
+            'camera_id': camera_id,
+            'alert_type': alert_type,
+            'phase': 'started',
+            'alert_id': alert['alert_id'],
+            'detected': True,
+            'count': data.get('count', 1),
+            'confidence': data['confidence'],
+            'zone': zone,
+            'data': data,
+            'timestamp': datetime.now().isoformat(),
+            'message': f'{label} detected!'
+        })
+    else:
+        publish('zone_alert', {
+            'camera_id': camera_id,
+            'alert_type': f'{alert_type}_ongoing',
+            'phase': 'ongoing',
+            'alert_id': alert['alert_id'],
+            'count': data.get('count', 1),
+            'confidence': data['confidence'],
+            'peak_confidence': alert['peak_confidence'],
+            'duration': alert['duration'],
+            'zone': zone,
+            'timestamp': datetime.now().isoformat(),
+            'beep': False,
+            'message': f'{label} continuing in zone {zone["name"]} for {alert["duration"]:.0f}s'
+        })
+
+
+def analyze_frame(camera_id, frame, detector, alert_engine, get_zones, publish, store_detections=None, pipeline=None):
+    """Run the camera's due detectors on one frame, publish alert transitions and return True if the scene is active
+
+    pipeline is the camera's CameraPipeline; without one, the default pipeline runs in full.
+    """
+    with tracer.context(camera_id), tracer.span('analyze_frame'):
+        if tracer.enabled:
+            publish = tracer.traced('emit')(publish)
+            if store_detections:
+                store_detections = tracer.traced('store')(store_detections)
+        return _analyze_frame(camera_id, frame, detector, alert_engine, get_zones, publish, store_detections,
+                              pipeline or CameraPipeline())
+
+
+def _analyze_frame(camera_id, frame, detector, alert_engine, get_zones, publish, store_detections, pipeline):
+    scene_active = False
+    
+    # Resize frame for processing
+    with tracer.span('resize'):
+        frame = cv2.resize(frame, (640, 480))
+    
+    # Derived views (gray, HSV, blurs) are computed once per frame and shared by all detectors
+    ctx = FrameContext(frame)
+    
+    detections = {}
+    
+    # Detectors of this camera's pipeline whose cadence has come round on this frame
+    now = time.time()
+    due = pipeline.due(now)
+    
+    # Simple motion detection - always send test alerts every 5 seconds
+    if camera_id not in detector.test_motion_timers:
+        detector.test_motion_timers[camera_id] = now
+    
+    # Send test motion alert every 5 seconds regardless of zones
+    if detector.test_alerts and now - detector.test_motion_timers[camera_id] >= 5.0:
+        detector.test_motion_timers[camera_id] = now
+        print(f"[MOTION] TEST MOTION ALERT! Camera {camera_id}")
+        
+        # Send test motion alert
+        publish('zone_alert', {
+            'camera_id': camera_id,
+            'alert_type': 'motion_detected',
+            'count': 1,
+            'confidence': 0.9,
+            'zone': {'x': 0, 'y': 0, 'width': 640, 'height': 480},
+            'timestamp': datetime.now().isoformat(),
+            'beep': True,
+            'message': f'TEST MOTION DETECTED! Camera {camera_id} - This is a test alert'
+        })
+        
+        # Send general detection alert
+        publish('detection_alert', {
+            'camera_id': camera_id,
+            'alert_type': 'motion',
+            'detected': True,
+            'count': 1,
+            'confidence': 0.9,
+            'zone': {'x': 0, 'y': 0, 'width': 640, 'height': 480},
+            'motion_area': 1000,
+            'timestamp': datetime.now().isoformat(),
+            'message': f'TEST MOTION DETECTED! Camera {camera_id}'
+        })
+    
+    # Zone-based motion detection
+    zones = get_zones(camera_id)
+    if zones and 'motion' in due:
+        print(f"Processing {len(zones)} zone(s) for camera {camera_id}")
+        
+        # Use test motion detection for guaranteed alerts (reported on the first zone)
+        test_detected, test_data = detector.test_motion_detection(camera_id, zones[0])
+        if test_detected:
+            zone_results = {zones[0]['name']: (True, test_data)}
+        else:
+            # Real motion detection: one difference mask shared by all zones
+            zone_results = pipeline.run(due['motion'], detector, ctx, camera_id, zones, now)
+            scene_active = any(result[0] for result in zone_results.values())
+        
+        # Debounce per-frame results into started / ongoing / ended incidents per zone
+        triggered = []
+        ended = []
+        for zone in zones:
+            motion_detected, motion_data = zone_results.get(zone['name'], (False, 0))
+            alert = alert_engine.observe(camera_id, zone['name'], 'motion', motion_detected,
+                                         motion_data if motion_detected else None, now, zone)
+            if alert is None:
+                continue
+            
+            if alert['phase'] == 'started':
+                triggered.append((zone, motion_data))
+                print(f"[MOTION] MOTION DETECTED in camera {camera_id} zone {zone['name']}!")
+                
+                # Send immediate zone motion alert with beep
+                publish('zone_alert', {
+                    'camera_id': camera_id,
+                    'alert_type': 'motion_detected',
+                    'phase': 'started',
+                    'alert_id': alert['alert_id'],
+                    'count': motion_data['count'],
+                    'confidence': motion_data['confidence'],
+                    'zone': zone,
+                    'timestamp': datetime.now().isoformat(),
+                    'beep': True,
+                    'message': f'Motion detected in zone {zone["name"]}! Count: {motion_data["count"]}, Confidence: {motion_data["confidence"]:.2f}'
+                })
+                
+                # Send general detection alert
+                publish('detection_alert', {
+                    'camera_id': camera_id,
+                    'alert_type': 'motion',
+                    'phase': 'started',
+                    'alert_id': alert['alert_id'],
+                    'detected': True,
+                    'count': motion_data['count'],
+                    'confidence': motion_data['confidence'],
+                    'zone': zone,
+                    'motion_area': motion_data['motion_area'],
+                    'timestamp': datetime.now().isoformat(),
+                    'message': 'Motion detected in surveillance zone!'
+                })
+            elif alert['phase'] == 'ongoing':
+                # Throttled progress update for an incident that is still going on
+                publish('zone_alert', {
+                    'camera_id': camera_id,
+                    'alert_type': 'motion_ongoing',
+                    'phase': 'ongoing',
+                    'alert_id': alert['alert_id'],
+                    'count': motion_data['count'],
+                    'confidence': motion_data['confidence'],
+                    'peak_confidence': alert['peak_confidence'],
+                    'duration': alert['duration'],
+                    'zone': zone,
+                    'timestamp': datetime.now().isoformat(),
+                    'beep': False,
+                    'message': f'Motion continuing in zone {zone["name"]} for {alert["duration"]:.0f}s'
+                })
+            else:
+                ended.append((zone, alert))
+        
+        if triggered:
+            # Also add to general detections, led by the most confident zone
+            zone, motion_data = max(triggered, key=lambda item: item[1]['confidence'])
+            detections['zone_motion'] = {
+                'detected': True,
+                'phase': 'started',
+                'count': sum(data['count'] for _, data in triggered),
+                'confidence': motion_data['confidence'],
+                'zone': zone,
+                'zones': [triggered_zone['name'] for triggered_zone, _ in triggered],
+                'motion_area': sum(data['motion_area'] for _, data in triggered),
+                'timestamp': datetime.now().isoformat()
+            }
+        
+        if ended:
+            publish_ended_alerts(camera_id, ended, publish, store_detections)
+    
+    # The other detectors in the pipeline; frame-wide ones report as a zone named 'frame'
+    frame_zone = {'name': 'frame', 'x': 0, 'y': 0, 'width': ctx.width, 'height': ctx.height}
+    for name, plugin in due.items():
+        if name == 'motion' or (plugin.scope == 'zones' and not zones):
+            continue
+        result = pipeline.run(plugin, detector, ctx, camera_id, zones, now)
+        if plugin.scope == 'zones':
+            observed = [(zone,) + tuple(result.get(zone['name'], (False, None))) for zone in zones]
+        else:
+            observed = [(frame_zone,) + tuple(result)]
+        
+        triggered = []
+        ended = []
+        for zone, detected, data in observed:
+            scene_active = scene_active or detected
+            alert = alert_engine.observe(camera_id, zone['name'], name, detected, data if detected else None, now, zone)
+            if alert is None:
+                continue
+            if alert['phase'] == 'ended':
+                ended.append((zone, alert))
+            else:
+                publish_detector_alert(camera_id, alert, zone, data, publish)
+                if alert['phase'] == 'started':
+                    triggered.append((zone, data))
+        
+        if triggered:
+            zone, data = max(triggered, key=lambda item: item[1]['confidence'])
+            detections[name] = {
+                'detected': True,
+                'phase': 'started',
+                'count': sum(item.get('count', 1) for _, item in triggered),
+                'confidence': data['confidence'],
+                'zone': zone,
+                'zones': [triggered_zone['name'] for triggered_zone, _ in triggered],
+                'timestamp': datetime.now().isoformat()
+            }
+        if ended:
+            publish_ended_alerts(camera_id, ended, publish, store_detections)
+    
+    # Incidents of zones (or detectors) that were removed or renamed while still open; slow
+    # detectors are only observed once per interval, so they get that much longer
+    swept = alert_engine.sweep(camera_id, now,
+                               grace={name: options['interval'] for name, options in pipeline.active.items()})
+    if swept:
+        publish_ended_alerts(camera_id, [(last_zone(alert), alert) for alert in swept],
+                             publish, store_detections)
+    
+    # Send detections via WebSocket
+    if detections:
+        publish('detection_alert', {
+            'camera_id': camera_id,
+            'detections': detections,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+        # Hand off for persistence (Firestore in the main process)
+        if store_detections:
+            store_detections(camera_id, detections)
+    
+    return scene_active
+
+
+def run_camera_pipeline(camera_id, stream_url, detector, get_zones, should_run, publish,
+                        store_detections=None, captures=None, analysis_interval=0.1, rate_controller=None,
+                        scheduler=None, priority=0, max_staleness=None, alert_engine=None, get_pipeline=None,
+                        owns_camera=None):
+    """Capture and analyse one camera until should_run() turns false
+
+    get_zones(camera_id) returns the camera's list of named zones, publish(event, payload)
+    delivers Socket.IO events and store_detections(camera_id, detections) persists
+    aggregated detections; all are supplied by the caller. With a rate_controller the gap
+    between analysed frames adapts to scene activity and CPU load instead of analysis_interval.
+    With a scheduler, analysis runs on its shared worker pool at this camera's priority, and
+    frames older than max_staleness by the time a worker is free are dropped. alert_engine
+    turns per-frame zone results into started/ongoing/ended incidents (one is created if
+    not given); incidents still open when the camera stops are ended and published.
+    get_pipeline(camera_id) returns the camera's normalised detector pipeline, or None for
+    the default (see detector_registry.py). owns_camera() is asked once the loop ends: if a
+    newer run of the same camera has started meanwhile, it returns False and the camera's
+    shared state (scheduler entries, background models, rate and alert state) is left to it.
+    """
+    if captures is None:
+        captures = {}
+    if alert_engine is None:
+        alert_engine = AlertEngine()
+    
+    print(f"[CAMERA] Starting camera processing for {camera_id} with stream: {stream_url}")
+    
+    pipeline = CameraPipeline()
+    
+    # Capture runs on its own thread so detection always sees the newest frame
+    capture = LatestFrameCapture(camera_id, stream_url)
+    if not capture.start():
+        print(f"[CAMERA] Failed to open camera {camera_id}")
+        return
+    captures[camera_id] = capture
+    
+    print(f"[CAMERA] Camera {camera_id} opened successfully")
+    print(f"[CAMERA] Started processing camera {camera_id}")
+    
+    # This thread only ever serves this camera
+    tracer.set_context(camera_id)
+    
+    frame_count = 0
+    last_seq = 0
+    job = None  # Latest frame handed to the scheduler, possibly still running when the camera stops
+    
+    try:
+        while should_run():
+            loop_started = time.time()
+            with tracer.span('wait_frame'):
+                last_seq, frame, frame_time = capture.read_latest(last_seq, timeout=1.0)
+            if frame is None:
+                if not capture.is_running():
+                    break
+                continue
+        
+            frame_count += 1
+            pipeline.update(get_pipeline(camera_id) if get_pipeline else None)
+        
+            # Log every 30 frames (about once per second at 30fps)
+            if frame_count % 30 == 0:
+                print(f"[CAMERA] Processing frame {frame_count} for camera {camera_id}")
+        
+            if scheduler:
+                # Hand the frame to the shared detection pool and wait for its turn
+                job = scheduler.submit(
+                    camera_id,
+                    lambda frame=frame: analyze_frame(camera_id, frame, detector, alert_engine, get_zones, publish, store_detections, pipeline),
+                    frame_time=frame_time,
+                    priority=priority,
+                    max_staleness=max_staleness
+                )
+                with tracer.span('schedule_wait'):
+                    while not job.wait(0.5) and should_run():
+                        pass
+                if not job.executed:
+                    # Too stale (or shutting down) - go straight for the newest frame
+                    continue
+                scene_active = bool(job.result)
+                detection_seconds = job.run_seconds
+            else:
+                analysis_started = time.time()
+                scene_active = analyze_frame(camera_id, frame, detector, alert_engine, get_zones, publish, store_detections, pipeline)
+                detection_seconds = time.time() - analysis_started
+            registry.observe('secureeye_frame_analysis_seconds', (('camera_id', str(camera_id)),), detection_seconds)
+        
+            # Pace analysis without letting frames queue up behind the delay
+            interval = analysis_interval
+            if rate_controller:
+                rate_controller.record(camera_id, detection_seconds, scene_active)
+                interval = rate_controller.interval_for(camera_id)
+            remaining = interval - (time.time() - loop_started)
+            with tracer.span('pace'):
+                while remaining > 0 and should_run():
+                    time.sleep(min(remaining, 0.5))
+                    remaining = interval - (time.time() - loop_started)
+    finally:
+        # Also when the loop failed, so the capture thread never outlives the camera
+        capture.stop()
+        if captures.get(camera_id) is capture:
+            del captures[camera_id]
+        owner = owns_camera() if owns_camera else True
+        if scheduler:
+            # Drop queued frames, then let a job already on a detection thread finish before
+            # the camera's background models and alert state are released under it
+            if owner:
+                scheduler.remove(camera_id)
+            if job is not None and not job.wait(30):
+                print(f"[CAMERA] Detection job for camera {camera_id} still running after 30s, releasing anyway")
+        if owner:
+            detector.release_camera(camera_id)
+            if rate_controller:
+                rate_controller.remove(camera_id)
+            ended = alert_engine.release_camera(camera_id)
+            if ended:
+                publish_ended_alerts(camera_id, [(last_zone(alert), alert) for alert in ended],
+                                     publish, store_detections)
+    print(f"Stopped processing camera {camera_id}")
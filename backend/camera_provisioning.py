@@ -0,0 +1,193 @@
+"""
+SecureEye camera provisioning
+Probes many camera sources concurrently, each with a deadline, and remembers which local devices exist
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from cooperative import run_with_deadline
+
+
+def probe_source(stream_url, open_timeout=None):
+    """Open a source, read one frame and release it again; returns the probe result
+
+    open_timeout caps how long OpenCV may spend connecting to a network stream.
+    """
+    from frame_sources import create_source  # Imports OpenCV on the first probe rather than at startup
+    started = time.time()
+    try:
+        source = create_source(stream_url)
+    except ValueError as e:
+        return {'status': 'invalid', 'error': str(e)}
+    if open_timeout and getattr(source, 'open_timeout', 0):
+        source.open_timeout = min(source.open_timeout, open_timeout)
+    result = {'kind': source.kind}
+    try:
+        if not source.open():
+            result.update(status='failed', error='Could not open source')
+        else:
+            ok, frame = source.read()
+            if ok:
+                height, width = frame.shape[:2]
+                result.update(status='ok', width=width, height=height)
+            else:
+                result.update(status='failed', error='Source opened but delivered no frame')
+    finally:
+        source.close()
+    result['probe_ms'] = (time.time() - started) * 1000
+    return result
+
+
+def device_index(stream_url):
+    """Local capture device index of stream_url, or None for any other kind of source"""
+    from frame_sources import create_source
+    try:
+        source = create_source(stream_url)
+    except ValueError:
+        return None
+    return source.target if source.kind == 'device' else None
+
+
+class DeviceProbeCache:
+    def __init__(self, path=None, ttl=None, failure_ttl=None):
+        """Probe results per device index, kept in a JSON file so a restart does not re-scan devices
+
+        Devices that probed ok are probed again after ttl seconds, failed ones after failure_ttl
+        (a device may be plugged in or freed at any time). An empty path keeps results in memory only.
+        """
+        self.path = path if path is not None else os.getenv('DEVICE_PROBE_CACHE', os.path.join(os.path.dirname(__file__), 'device_probes.json'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('DEVICE_PROBE_CACHE_TTL', '86400'))
+        self.failure_ttl = failure_ttl if failure_ttl is not None else float(os.getenv('DEVICE_PROBE_FAILURE_TTL', '60'))
+        self.lock = threading.Lock()
+        self.entries = {}
+        if self.path:
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def get(self, index):
+        """Cached probe result for a device index, or None if unknown or expired"""
+        with self.lock:
+            entry = self.entries.get(str(index))
+        if not entry:
+            return None
+        ttl = self.ttl if entry['result']['status'] == 'ok' else self.failure_ttl
+        if time.time() - entry['probed_at'] <= ttl:
+            return entry['result']
+        return None
+
+    def put(self, index, result):
+        """Remember a device probe (timeouts are not cached, the device may just have been busy)"""
+        if result['status'] not in ('ok', 'failed'):
+            return
+        with self.lock:
+            self.entries[str(index)] = {'probed_at': time.time(), 'result': result}
+            if not self.path:
+                return
+            try:
+                # Write-then-rename so a crash never leaves a half-written cache
+                temp_path = self.path + '.tmp'
+                with open(temp_path, 'w') as f:
+                    json.dump(self.entries, f)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"[PROVISION] Could not save device probe cache: {e}")
+
+    def clear(self, index=None):
+        """Forget one device (or all of them)"""
+        with self.lock:
+            if index is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(str(index), None)
+
+
+class CameraProvisioner:
+    def __init__(self, probe_timeout=None, max_concurrency=None, device_cache=None):
+        """Probes camera specs concurrently
+
+        Each probe gets probe_timeout seconds (PROVISION_PROBE_TIMEOUT) and at most max_concurrency
+        (PROVISION_CONCURRENCY) run at once across all provisioning requests.
+        """
+        self.probe_timeout = probe_timeout if probe_timeout is not None else float(os.getenv('PROVISION_PROBE_TIMEOUT', '8'))
+        self.max_concurrency = max_concurrency if max_concurrency is not None else int(os.getenv('PROVISION_CONCURRENCY', '16'))
+        self.device_cache = device_cache or DeviceProbeCache()
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+        self.lock = threading.Lock()
+        self.stats = {'probed': 0, 'ok': 0, 'failed': 0, 'timeouts': 0, 'cache_hits': 0}
+
+    def _count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def probe(self, stream_url, timeout=None, refresh=False):
+        """Probe one source within the deadline, answering device probes from the cache when possible"""
+        timeout = timeout or self.probe_timeout
+        index = device_index(stream_url)
+        if index is not None and not refresh:
+            cached = self.device_cache.get(index)
+            if cached:
+                self._count('cache_hits')
+                return dict(cached, cached=True)
+
+        # The slot is held until the probe has really finished: a timed-out probe keeps running
+        # (it cannot be cancelled) and must keep counting against max_concurrency until it returns
+        self.slots.acquire()
+        started = time.time()
+        try:
+            result = run_with_deadline(timeout, probe_source, stream_url, timeout, on_exit=self.slots.release)
+        except TimeoutError:
+            # The probe thread finishes (and releases the source and the slot) on its own
+            result = {'status': 'timeout', 'error': f"No frame within {timeout:g}s",
+                      'probe_ms': (time.time() - started) * 1000}
+
+        self._count('probed')
+        self._count({'ok': 'ok', 'timeout': 'timeouts'}.get(result['status'], 'failed'))
+        if index is not None:
+            self.device_cache.put(index, result)
+        return dict(result, cached=False)
+
+    def provision(self, specs, register, timeout=None, refresh=False):
+        """Probe specs concurrently and yield each camera's result as soon as it resolves
+
+        specs are dicts with camera_id and stream_url. register(spec, result) is called for every
+        camera that probed ok and returns the final status (e.g. 'added' or 'exists').
+        """
+        pending = queue.Queue()
+        for spec in specs:
+            pending.put(spec)
+        results = queue.Queue()
+
+        def run():
+            while True:
+                try:
+                    spec = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    result = self.probe(spec['stream_url'], timeout=timeout, refresh=refresh)
+                    if result['status'] == 'ok':
+                        result['status'] = register(spec, result)
+                except Exception as e:
+                    result = {'status': 'error', 'error': str(e)}
+                results.put(dict(result, camera_id=spec['camera_id'], stream_url=spec['stream_url']))
+
+        for index in range(min(len(specs), self.max_concurrency)):
+            runner = threading.Thread(target=run, name=f"provision-{index}")
+            runner.daemon = True
+            runner.start()
+
+        for _ in specs:
+            yield results.get()
+
+    def get_stats(self):
+        """Probe counters and settings"""
+        with self.lock:
+            stats = dict(self.stats)
+        stats.update(probe_timeout=self.probe_timeout, max_concurrency=self.max_concurrency)
+        return stats
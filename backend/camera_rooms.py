@@ -0,0 +1,160 @@
+"""
+SecureEye camera rooms
+Socket.IO room per camera plus an "all cameras" room, so alerts only reach clients that subscribed to them
+"""
+
+import os
+import threading
+from flask_socketio import join_room, leave_room
+from alert_encoding import JSON_ENCODING, encode_alert
+
+ALL_CAMERAS_ROOM = 'cameras:all'
+
+
+def room_for(camera_id):
+    """Room name for one camera"""
+    return f"camera:{camera_id}"
+
+
+def encoded_room(room, encoding):
+    """Clients with a binary encoding get their own copy of each room"""
+    return room if encoding == JSON_ENCODING else f"{room}|{encoding}"
+
+
+def parse_subscription(data):
+    """Read camera_ids (or a single camera_id) and the all-cameras flag from a subscription request"""
+    data = data or {}
+    camera_ids = data.get('camera_ids') or []
+    if data.get('camera_id') is not None:
+        camera_ids = list(camera_ids) + [data['camera_id']]
+    return camera_ids, bool(data.get('all'))
+
+
+class CameraRooms:
+    def __init__(self, socketio, default_subscription=None):
+        """Track camera subscriptions of Socket.IO clients
+
+        default_subscription ('all' or 'none', env ALERT_DEFAULT_SUBSCRIPTION) decides what a
+        client receives before it subscribes; 'all' keeps existing dashboards working.
+        """
+        self.socketio = socketio
+        self.default_subscription = default_subscription or os.getenv('ALERT_DEFAULT_SUBSCRIPTION', 'all')
+        self.lock = threading.Lock()
+        self.rooms = {}  # room -> set of sids
+        self.clients = {}  # sid -> set of rooms
+        self.defaulted = set()  # sids still on the default subscription
+        self.encodings = {}  # sid -> alert encoding negotiated on connect
+        self.emitted = {}  # event -> count
+
+    def _join(self, sid, room):
+        """Join a room in the client's encoding (caller holds the lock)"""
+        room = encoded_room(room, self.encodings.get(sid, JSON_ENCODING))
+        join_room(room, sid=sid, namespace='/')
+        self.rooms.setdefault(room, set()).add(sid)
+        self.clients.setdefault(sid, set()).add(room)
+
+    def _leave(self, sid, room):
+        """Leave a room in the client's encoding (caller holds the lock)"""
+        room = encoded_room(room, self.encodings.get(sid, JSON_ENCODING))
+        leave_room(room, sid=sid, namespace='/')
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(sid)
+            if not members:
+                del self.rooms[room]
+        self.clients.get(sid, set()).discard(room)
+
+    def connect(self, sid, encoding=JSON_ENCODING):
+        """Apply the default subscription to a new client that negotiated an alert encoding"""
+        with self.lock:
+            self.clients.setdefault(sid, set())
+            self.encodings[sid] = encoding
+            if self.default_subscription == 'all':
+                self._join(sid, ALL_CAMERAS_ROOM)
+                self.defaulted.add(sid)
+
+    def disconnect(self, sid):
+        """Forget a client's subscriptions (Socket.IO drops it from its rooms itself)"""
+        with self.lock:
+            for room in self.clients.pop(sid, set()):
+                members = self.rooms.get(room)
+                if members is not None:
+                    members.discard(sid)
+                    if not members:
+                        del self.rooms[room]
+            self.defaulted.discard(sid)
+            self.encodings.pop(sid, None)
+
+    def subscribe(self, sid, camera_ids=None, all_cameras=False):
+        """Add cameras (or every camera) to a client's subscription and return its rooms
+
+        The first explicit subscription replaces the default 'all' subscription.
+        """
+        with self.lock:
+            if sid in self.defaulted:
+                self.defaulted.discard(sid)
+                if not all_cameras:
+                    self._leave(sid, ALL_CAMERAS_ROOM)
+            if all_cameras:
+                self._join(sid, ALL_CAMERAS_ROOM)
+            for camera_id in camera_ids or []:
+                self._join(sid, room_for(camera_id))
+            return sorted(self.clients.get(sid, set()))
+
+    def unsubscribe(self, sid, camera_ids=None, all_cameras=False):
+        """Remove cameras (or the all-cameras room) from a client's subscription and return its rooms"""
+        with self.lock:
+            self.defaulted.discard(sid)
+            if all_cameras:
+                self._leave(sid, ALL_CAMERAS_ROOM)
+            for camera_id in camera_ids or []:
+                self._leave(sid, room_for(camera_id))
+            return sorted(self.clients.get(sid, set()))
+
+    def publish(self, event, payload):
+        """Emit to the camera's room and the all-cameras room (each client gets it once)
+
+        Binary clients get the payload encoded once per event, not once per client. Events
+        without a camera_id are broadcast as JSON as before. Each room gets its own emit (the
+        pinned python-socketio is not relied on to accept a list of rooms), and members of both
+        rooms are skipped in the camera room.
+        """
+        camera_id = payload.get('camera_id') if isinstance(payload, dict) else None
+        with self.lock:
+            self.emitted[event] = self.emitted.get(event, 0) + 1
+            if camera_id is None:
+                targets = None
+            else:
+                # encoding -> [(room, sids to skip)] for rooms with subscribers in that encoding
+                targets = {}
+                for encoding in set(self.encodings.values()) | {JSON_ENCODING}:
+                    all_room = encoded_room(ALL_CAMERAS_ROOM, encoding)
+                    camera_room = encoded_room(room_for(camera_id), encoding)
+                    everyone = self.rooms.get(all_room, set())
+                    rooms = []
+                    if everyone:
+                        rooms.append((all_room, None))
+                    if camera_room in self.rooms:
+                        rooms.append((camera_room, sorted(self.rooms[camera_room] & everyone) or None))
+                    if rooms:
+                        targets[encoding] = rooms
+
+        if targets is None:
+            self.socketio.emit(event, payload)
+            return
+        for encoding, rooms in targets.items():
+            data = payload if encoding == JSON_ENCODING else encode_alert(event, payload)
+            for room, skip in rooms:
+                self.socketio.emit(event, data, to=room, skip_sid=skip)
+
+    def get_stats(self):
+        """Subscriber count per room, connected clients and emitted events"""
+        with self.lock:
+            return {
+                'rooms': {room: len(members) for room, members in self.rooms.items()},
+                'clients': len(self.clients),
+                'encodings': {encoding: list(self.encodings.values()).count(encoding)
+                              for encoding in set(self.encodings.values())},
+                'default_subscription': self.default_subscription,
+                'emitted': dict(self.emitted)
+            }
@@ -0,0 +1,315 @@
+"""
+SecureEye camera worker processes
+Shards cameras across processes so detection is not serialised on one interpreter's GIL
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from cooperative import run_blocking
+from metrics import merge_snapshots
+
+# How often workers report capture counters back to the main process
+STATS_INTERVAL = 2.0
+
+
+def shard_for_camera(camera_id, num_workers):
+    """Pick a stable worker index for a camera"""
+    return zlib.crc32(str(camera_id).encode('utf-8')) % num_workers
+
+
+def _worker_main(worker_index, control_queue, result_queue, analysis_interval):
+    """Entry point of a worker process: run the cameras assigned to this shard"""
+    # Imported inside the worker so the pool itself stays free of OpenCV imports
+    from surveillance_detector import SurveillanceDetector
+    from camera_pipeline import run_camera_pipeline
+    from rate_control import AnalysisRateController
+    from scheduler import DetectionScheduler
+    from alert_engine import AlertEngine
+    from metrics import registry, process_stats
+    from tracing import tracer
+
+    # A forked worker must not report the parent's samples or spans again
+    registry.reset()
+    tracer.spans.clear()
+    detector = SurveillanceDetector()
+    alert_engine = AlertEngine()
+    # Each worker has its own CPU budget since it runs on its own interpreter
+    rate_controller = AnalysisRateController(active_interval=analysis_interval)
+    scheduler = DetectionScheduler()
+    if scheduler.num_workers > 0:
+        scheduler.start()
+    else:
+        scheduler = None
+    zones = {}
+    pipelines = {}
+    captures = {}
+    threads = {}
+
+    def publish(event, payload):
+        result_queue.put(('emit', event, payload))
+
+    def store_detections(camera_id, detections):
+        result_queue.put(('store', camera_id, detections))
+
+    def run_camera(camera_id, options):
+        this_thread = threading.current_thread()
+        run_camera_pipeline(
+            camera_id, options['stream_url'], detector,
+            get_zones=zones.get,
+            should_run=lambda: threads.get(camera_id) is this_thread,
+            publish=publish,
+            store_detections=store_detections,
+            captures=captures,
+            analysis_interval=analysis_interval,
+            rate_controller=rate_controller,
+            scheduler=scheduler,
+            priority=options.get('priority', 0),
+            max_staleness=options.get('max_staleness'),
+            alert_engine=alert_engine,
+            get_pipeline=pipelines.get,
+            # After a quick stop and start the new thread owns the camera's detector, alert and rate state
+            owns_camera=lambda: threads.get(camera_id, this_thread) is this_thread
+        )
+        # Pipeline ended on its own (e.g. camera failed to open)
+        if threads.get(camera_id) is this_thread:
+            del threads[camera_id]
+            result_queue.put(('stopped', camera_id, None))
+
+    print(f"[WORKER] Detection worker {worker_index} started")
+    last_stats = time.time()
+
+    while True:
+        try:
+            message = control_queue.get(timeout=STATS_INTERVAL)
+        except queue.Empty:
+            message = ()
+
+        if message is None:
+            break
+
+        if message:
+            command, camera_id, arg = message
+            if command == 'start':
+                if camera_id not in threads:
+                    thread = threading.Thread(target=run_camera, args=(camera_id, arg))
+                    thread.daemon = True
+                    threads[camera_id] = thread
+                    thread.start()
+            elif command == 'stop':
+                threads.pop(camera_id, None)
+            elif command == 'zones':
+                zones[camera_id] = arg
+            elif command == 'pipeline':
+                if arg is None:
+                    pipelines.pop(camera_id, None)
+                else:
+                    pipelines[camera_id] = arg
+            elif command == 'alert_settings':
+                try:
+                    alert_engine.configure(camera_id, **arg)
+                except (TypeError, ValueError) as e:
+                    print(f"[WORKER] Invalid alert settings for camera {camera_id}: {e}")
+            elif command == 'tracing':
+                tracer.set_enabled(arg)
+            elif command == 'trace':
+                request_id, seconds = arg
+                result_queue.put(('trace', worker_index, (request_id, os.getpid(), tracer.collect(seconds))))
+
+        if time.time() - last_stats >= STATS_INTERVAL:
+            last_stats = time.time()
+            stats = {
+                'cameras': {cid: capture.get_stats() for cid, capture in list(captures.items())},
+                'background_models': detector.background_models.get_stats(),
+                'rates': rate_controller.get_stats(),
+                'scheduler': scheduler.get_stats() if scheduler else None,
+                'alerts': alert_engine.get_stats(),
+                'metrics': registry.snapshot(),
+                'process': process_stats()
+            }
+            result_queue.put(('stats', worker_index, stats))
+
+    threads.clear()
+    print(f"[WORKER] Detection worker {worker_index} stopped")
+
+
+class CameraWorkerPool:
+    def __init__(self, num_workers, publish, store_detections=None, analysis_interval=0.1, start_method=None):
+        """Create a pool of detection worker processes
+
+        publish(event, payload) and store_detections(camera_id, detections) are called in
+        the main process for every result a worker sends back. start_method 'spawn' gives
+        workers a fresh interpreter (needed when the server process is monkey-patched).
+        """
+        self.context = multiprocessing.get_context(start_method)
+        self.num_workers = num_workers
+        self.publish = publish
+        self.store_detections = store_detections
+        self.analysis_interval = analysis_interval
+        self.result_queue = self.context.Queue()
+        self.control_queues = []
+        self.processes = []
+        self.worker_stats = {}  # Latest capture and detector stats reported by each worker
+        self.trace_requests = {}  # request id -> {worker index: (pid, spans)} collected so far
+        self.trace_ids = itertools.count(1)
+        self.trace_ready = threading.Condition()
+        self.pump_thread = None
+        self.running = False
+
+    def start(self):
+        """Start worker processes and the result pump thread"""
+        self.running = True
+        for worker_index in range(self.num_workers):
+            control_queue = self.context.Queue()
+            process = self.context.Process(
+                target=_worker_main,
+                args=(worker_index, control_queue, self.result_queue, self.analysis_interval),
+                name=f"secureeye-worker-{worker_index}"
+            )
+            process.daemon = True
+            process.start()
+            self.control_queues.append(control_queue)
+            self.processes.append(process)
+
+        self.pump_thread = threading.Thread(target=self._pump_results, name='worker-results')
+        self.pump_thread.daemon = True
+        self.pump_thread.start()
+        print(f"[WORKER] Started {self.num_workers} detection worker processes")
+
+    def stop(self):
+        """Ask all workers to exit"""
+        self.running = False
+        for control_queue in self.control_queues:
+            control_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+
+    def _send(self, camera_id, message):
+        """Send a control message to the worker that owns camera_id"""
+        worker_index = shard_for_camera(camera_id, self.num_workers)
+        self.control_queues[worker_index].put(message)
+
+    def start_camera(self, camera_id, stream_url, zones=None, priority=0, max_staleness=None, pipeline=None,
+                     alert_settings=None):
+        """Start detection for a camera on its shard
+
+        alert_settings are the camera's own alert timing overrides, re-sent so the worker's copy
+        matches the main process even if the worker missed an update.
+        """
+        if zones:
+            self._send(camera_id, ('zones', camera_id, zones))
+        if alert_settings:
+            self._send(camera_id, ('alert_settings', camera_id, alert_settings))
+        if pipeline is not None:
+            self._send(camera_id, ('pipeline', camera_id, pipeline))
+        options = {'stream_url': stream_url, 'priority': priority, 'max_staleness': max_staleness}
+        self._send(camera_id, ('start', camera_id, options))
+
+    def stop_camera(self, camera_id):
+        """Stop detection for a camera on its shard"""
+        self._send(camera_id, ('stop', camera_id, None))
+
+    def update_zones(self, camera_id, zones):
+        """Forward a camera's zone list to the worker that owns camera_id"""
+        self._send(camera_id, ('zones', camera_id, zones))
+
+    def update_pipeline(self, camera_id, pipeline):
+        """Forward a camera's detector pipeline (None = the default) to the worker that owns camera_id"""
+        self._send(camera_id, ('pipeline', camera_id, pipeline))
+
+    def update_alert_settings(self, camera_id, settings):
+        """Forward alert timing to the worker that owns camera_id, or to every worker for the defaults"""
+        if camera_id is None:
+            for control_queue in self.control_queues:
+                control_queue.put(('alert_settings', None, settings))
+        else:
+            self._send(camera_id, ('alert_settings', camera_id, settings))
+
+    def get_camera_stats(self):
+        """Merge the capture counters reported by all workers"""
+        merged = {}
+        for stats in list(self.worker_stats.values()):
+            merged.update(stats['cameras'])
+        return merged
+
+    def get_scheduler_stats(self):
+        """Detection scheduler counters reported by each worker"""
+        return {f"worker-{index}": stats['scheduler'] for index, stats in list(self.worker_stats.items())}
+
+    def get_rate_stats(self):
+        """Analysis rates reported by each worker"""
+        return {f"worker-{index}": stats['rates'] for index, stats in list(self.worker_stats.items())}
+
+    def get_background_model_stats(self):
+        """Background model counts and memory reported by each worker"""
+        return {f"worker-{index}": stats['background_models'] for index, stats in list(self.worker_stats.items())}
+
+    def get_alert_stats(self):
+        """Alert settings and open incidents reported by each worker"""
+        return {f"worker-{index}": stats['alerts'] for index, stats in list(self.worker_stats.items())}
+
+    def get_metrics_snapshot(self):
+        """Detector and analysis latency histograms summed over all workers"""
+        return merge_snapshots(stats.get('metrics') for stats in list(self.worker_stats.values()))
+
+    def get_process_stats(self):
+        """CPU and memory reported by each worker process"""
+        return {f"worker-{index}": stats.get('process') for index, stats in list(self.worker_stats.items())}
+
+    def set_tracing(self, enabled):
+        """Turn stage tracing on or off in every worker"""
+        for control_queue in self.control_queues:
+            control_queue.put(('tracing', None, bool(enabled)))
+
+    def collect_traces(self, seconds=None, timeout=2.0):
+        """Ask every worker for its recent spans; returns {(pid, 'worker-N'): spans} from those that answered in time"""
+        request_id = next(self.trace_ids)
+        with self.trace_ready:
+            self.trace_requests[request_id] = {}
+        for control_queue in self.control_queues:
+            control_queue.put(('trace', None, (request_id, seconds)))
+
+        deadline = time.time() + timeout
+        with self.trace_ready:
+            while len(self.trace_requests[request_id]) < self.num_workers:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.trace_ready.wait(remaining)
+            replies = self.trace_requests.pop(request_id)
+        return {(pid, f"worker-{index}"): spans for index, (pid, spans) in replies.items()}
+
+    def _pump_results(self):
+        """Deliver worker results (emits, detections, stats) in the main process"""
+        while self.running:
+            try:
+                # Blocks on a native thread in cooperative mode so the event loop keeps running
+                kind, key, payload = run_blocking(self.result_queue.get, timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            try:
+                if kind == 'emit':
+                    self.publish(key, payload)
+                elif kind == 'store':
+                    if self.store_detections:
+                        self.store_detections(key, payload)
+                elif kind == 'stats':
+                    self.worker_stats[key] = payload
+                elif kind == 'trace':
+                    request_id, pid, spans = payload
+                    with self.trace_ready:
+                        # Replies to a request that already timed out are dropped
+                        if request_id in self.trace_requests:
+                            self.trace_requests[request_id][key] = (pid, spans)
+                            self.trace_ready.notify_all()
+                elif kind == 'stopped':
+                    print(f"[WORKER] Camera {key} stopped in worker")
+            except Exception as e:
+                print(f"[WORKER] Error handling worker result: {e}")
@@ -0,0 +1,74 @@
+"""
+SecureEye cooperative mode helpers
+Keeps blocking calls (disk, SQLite, Firestore, multiprocessing queues) off the eventlet hub when the server runs cooperatively
+"""
+
+import queue
+import sys
+import threading
+
+_tpool = None
+_checked = False
+
+
+def is_cooperative():
+    """True when eventlet has monkey-patched threading (async_server.py / gunicorn eventlet worker)"""
+    global _tpool, _checked
+    if not _checked:
+        _checked = True
+        eventlet = sys.modules.get('eventlet')
+        if eventlet is not None:
+            from eventlet import patcher, tpool
+            if patcher.is_monkey_patched('thread'):
+                _tpool = tpool
+    return _tpool is not None
+
+
+def run_blocking(function, *args, **kwargs):
+    """Call function on a real OS thread in cooperative mode (directly otherwise) and return its result
+
+    Green threads share one OS thread, so a blocking syscall there stalls every socket; eventlet's
+    tpool runs it on a native thread while only the calling green thread waits.
+    """
+    if is_cooperative():
+        return _tpool.execute(function, *args, **kwargs)
+    return function(*args, **kwargs)
+
+
+def run_with_deadline(timeout, function, *args, on_exit=None, **kwargs):
+    """Like run_blocking, but raise TimeoutError if function has not returned within timeout seconds
+
+    The call cannot be cancelled: it keeps running on its OS thread and its result is discarded,
+    so function must clean up after itself. on_exit() is called once function has really
+    returned, after a timeout too (e.g. to release a slot only when the call is gone).
+    """
+    if is_cooperative():
+        import eventlet
+        call = eventlet.spawn(_tpool.execute, function, *args, **kwargs)
+        if on_exit:
+            # Runs on the hub, so it may touch green locks and semaphores
+            call.link(lambda _: on_exit())
+        with eventlet.Timeout(timeout, TimeoutError(f"No result within {timeout:g}s")):
+            return call.wait()
+
+    results = queue.Queue(maxsize=1)
+
+    def call():
+        try:
+            results.put((True, function(*args, **kwargs)))
+        except Exception as e:
+            results.put((False, e))
+        finally:
+            if on_exit:
+                on_exit()
+
+    thread = threading.Thread(target=call, name='deadline-call')
+    thread.daemon = True
+    thread.start()
+    try:
+        ok, value = results.get(timeout=timeout)
+    except queue.Empty:
+        raise TimeoutError(f"No result within {timeout:g}s")
+    if not ok:
+        raise value
+    return value
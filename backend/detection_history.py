@@ -0,0 +1,218 @@
+"""
+SecureEye detection history
+Local SQLite store of detections indexed by camera, type and time, with keyset-paginated queries
+"""
+
+import base64
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from cooperative import run_blocking
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    camera_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    ts REAL NOT NULL,
+    phase TEXT,
+    confidence REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_detections_camera_type_ts ON detections (camera_id, type, ts, id);
+CREATE INDEX IF NOT EXISTS idx_detections_camera_ts ON detections (camera_id, ts, id);
+CREATE INDEX IF NOT EXISTS idx_detections_type_ts ON detections (type, ts, id);
+CREATE INDEX IF NOT EXISTS idx_detections_ts ON detections (ts, id);
+"""
+
+MAX_PAGE_SIZE = 1000
+
+
+def parse_time(value):
+    """Parse epoch seconds or an ISO 8601 timestamp from a query parameter"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def encode_cursor(ts, row_id):
+    """Opaque cursor for the row after which the next page starts"""
+    return base64.urlsafe_b64encode(json.dumps([ts, row_id]).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        ts, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(ts), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class DetectionHistory:
+    def __init__(self, path, retention_days=None, batch_size=200, flush_interval=0.5):
+        """Open (or create) the history database at path
+
+        Rows are inserted by a background thread in one transaction per batch, so record()
+        never waits on the disk. With retention_days, older rows are pruned about hourly.
+        """
+        self.path = path
+        self.retention_days = retention_days if retention_days is not None else float(os.getenv('HISTORY_RETENTION_DAYS', '0'))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=10000)
+        self.running = False
+        self.thread = None
+        self.last_prune = 0
+        self.stats = {'recorded': 0, 'dropped': 0, 'inserted': 0, 'pruned': 0}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.commit()
+        connection.close()
+
+    def _connect(self):
+        # Not tied to one thread: cooperative mode runs each call on whichever pool thread is free
+        connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        # WAL lets queries run while the writer thread commits
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def start(self):
+        """Start the background insert thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._writer_loop, name='detection-history')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """Insert what is queued and stop the background thread"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout)
+
+    def record(self, camera_id, detections, timestamp=None):
+        """Queue one row per detection type in an aggregated detections dict"""
+        ts = timestamp if timestamp is not None else time.time()
+        for detection_type, data in detections.items():
+            data = data if isinstance(data, dict) else {'value': data}
+            row = (str(camera_id), detection_type, ts, data.get('phase'), data.get('confidence'),
+                   json.dumps(data, default=str))
+            try:
+                self.queue.put_nowait(row)
+                self.stats['recorded'] += 1
+            except queue.Full:
+                self.stats['dropped'] += 1
+
+    def _writer_loop(self):
+        """Insert queued rows in batches; prune old rows when a retention period is set"""
+        connection = self._connect()
+        while self.running or not self.queue.empty():
+            try:
+                rows = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                rows = []
+            while rows and len(rows) < self.batch_size:
+                try:
+                    rows.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                if rows:
+                    run_blocking(self._insert, connection, rows)
+                    self.stats['inserted'] += len(rows)
+                if self.retention_days > 0 and time.time() - self.last_prune > 3600:
+                    self.last_prune = time.time()
+                    self.stats['pruned'] += run_blocking(self._prune, connection,
+                                                         time.time() - self.retention_days * 86400)
+            except sqlite3.Error as e:
+                print(f"[HISTORY] Failed to write detection history: {e}")
+        connection.close()
+
+    def _insert(self, connection, rows):
+        """Insert rows in one transaction"""
+        with connection:
+            connection.executemany(
+                'INSERT INTO detections (camera_id, type, ts, phase, confidence, data) VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+
+    def _prune(self, connection, cutoff):
+        """Delete rows older than cutoff and return how many were removed"""
+        with connection:
+            return connection.execute('DELETE FROM detections WHERE ts < ?', (cutoff,)).rowcount
+
+    def _fetch(self, sql, params):
+        """Run a read query on a short-lived connection (opening one costs far less than the query)"""
+        with closing(sqlite3.connect(self.path, timeout=10)) as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def query(self, camera_id=None, detection_type=None, since=None, until=None, cursor=None, limit=100):
+        """Newest-first page of detections matching the filters
+
+        Returns (rows, next_cursor); next_cursor is None on the last page. Pages are keyed on
+        (ts, id) so each page is an index range scan no matter how deep it is.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = [], []
+        if camera_id is not None:
+            clauses.append('camera_id = ?')
+            params.append(str(camera_id))
+        if detection_type is not None:
+            clauses.append('type = ?')
+            params.append(detection_type)
+        if since is not None:
+            clauses.append('ts >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('ts < ?')
+            params.append(until)
+        if cursor:
+            ts, row_id = decode_cursor(cursor)
+            clauses.append('(ts, id) < (?, ?)')
+            params.extend([ts, row_id])
+
+        sql = 'SELECT id, camera_id, type, ts, phase, confidence, data FROM detections'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY ts DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+
+        rows = run_blocking(self._fetch, sql, params)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][3], rows[-1][0])
+
+        results = [{
+            'id': row_id,
+            'camera_id': row_camera,
+            'type': row_type,
+            'timestamp': datetime.fromtimestamp(ts).isoformat(),
+            'ts': ts,
+            'phase': phase,
+            'confidence': confidence,
+            'data': json.loads(data)
+        } for row_id, row_camera, row_type, ts, phase, confidence, data in rows]
+        return results, next_cursor
+
+    def get_stats(self):
+        """Queue depth and write counters"""
+        stats = dict(self.stats)
+        stats['queued'] = self.queue.qsize()
+        stats['path'] = self.path
+        return stats
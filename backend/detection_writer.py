@@ -0,0 +1,323 @@
+"""
+SecureEye detection writer
+Commits detection records to Firestore in batches from a background thread so camera loops never wait on the network
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from cooperative import run_blocking
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block', 'spill')
+
+
+def detection_record(camera_id, detections):
+    """The document stored for one set of aggregated detections"""
+    return {
+        'camera_id': camera_id,
+        'detections': detections,
+        'created_at': time.time(),
+        'processed': True
+    }
+
+
+class BatchedDetectionWriter:
+    def __init__(self, db, collection='detections', max_queue=None, batch_size=None, flush_interval=None,
+                 overflow_policy=None, spill_path=None, block_timeout=1.0, max_retries=3, timestamp_value=None):
+        """Create a writer for a Firestore client (or anything with the same collection/batch API)
+
+        Records are committed when batch_size of them are queued or flush_interval seconds after
+        the oldest one arrived. When max_queue records are waiting, overflow_policy decides what
+        happens to new ones: drop the oldest queued record, drop the new one, block the caller
+        for up to block_timeout seconds, or spill it to a JSON-lines file that is read back once
+        the queue drains. timestamp_value (e.g. firestore.SERVER_TIMESTAMP) is stored as each
+        document's 'timestamp' at commit time.
+        """
+        self.db = db
+        self.collection = collection
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('DETECTION_QUEUE_SIZE', '1000'))
+        # Firestore allows at most 500 writes per batch
+        self.batch_size = min(batch_size if batch_size is not None else int(os.getenv('DETECTION_BATCH_SIZE', '50')), 500)
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv('DETECTION_FLUSH_INTERVAL', '1.0'))
+        self.overflow_policy = overflow_policy or os.getenv('DETECTION_OVERFLOW_POLICY', 'drop_oldest')
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {self.overflow_policy}")
+        self.spill_path = spill_path or os.getenv('DETECTION_SPILL_PATH', os.path.join(os.path.dirname(__file__), 'detections_spill.jsonl'))
+        self.block_timeout = block_timeout
+        self.max_retries = max_retries
+        self.timestamp_value = timestamp_value
+
+        self.cond = threading.Condition()
+        self.queue = deque()  # (enqueued_at, record)
+        self.running = False
+        self.thread = None
+        self.spill_lock = threading.Lock()
+        self.stats = {'enqueued': 0, 'committed': 0, 'dropped': 0, 'spilled': 0, 'unspilled': 0,
+                      'batches': 0, 'failed_batches': 0, 'commit_total': 0.0, 'last_commit_ms': 0.0,
+                      'max_commit_ms': 0.0}
+
+    def start(self):
+        """Start the background commit thread (no-op if already running)"""
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._writer_loop, name='detection-writer')
+        self.thread.daemon = True
+        self.thread.start()
+        print(f"[WRITER] Detection writer started (batch {self.batch_size}, queue {self.max_queue}, {self.overflow_policy})")
+
+    def stop(self, timeout=5.0):
+        """Commit what is queued and stop the background thread"""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def write(self, camera_id, detections):
+        """Queue one detection record; returns False if the record was dropped"""
+        return self.enqueue(detection_record(camera_id, detections))
+
+    def enqueue(self, record):
+        """Queue a ready-made record, applying the overflow policy when the queue is full"""
+        spill = False
+        with self.cond:
+            if len(self.queue) >= self.max_queue:
+                if self.overflow_policy == 'drop_oldest':
+                    self.queue.popleft()
+                    self.stats['dropped'] += 1
+                elif self.overflow_policy == 'drop_newest':
+                    self.stats['dropped'] += 1
+                    return False
+                elif self.overflow_policy == 'block':
+                    deadline = time.time() + self.block_timeout
+                    while len(self.queue) >= self.max_queue and self.running:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        self.cond.wait(remaining)
+                    if len(self.queue) >= self.max_queue:
+                        self.stats['dropped'] += 1
+                        return False
+                else:
+                    self.stats['spilled'] += 1
+                    spill = True
+            if not spill:
+                self.queue.append((time.time(), record))
+                self.stats['enqueued'] += 1
+                self.cond.notify_all()
+                return True
+
+        # Spill outside the queue lock so a slow disk only delays this caller
+        return self._spill([record])
+
+    def _spill(self, records):
+        """Append records to the spill file"""
+        try:
+            with self.spill_lock, open(self.spill_path, 'a', encoding='utf-8') as spill_file:
+                for record in records:
+                    spill_file.write(json.dumps(record, default=str) + '\n')
+            return True
+        except OSError as e:
+            print(f"[WRITER] Failed to spill detections: {e}")
+            with self.cond:
+                self.stats['dropped'] += len(records)
+            return False
+
+    def _unspill(self):
+        """Move spilled records back into the queue, as many as there is room for"""
+        with self.spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            try:
+                with open(self.spill_path, 'r', encoding='utf-8') as spill_file:
+                    records = [json.loads(line) for line in spill_file if line.strip()]
+            except (OSError, ValueError) as e:
+                print(f"[WRITER] Failed to read spilled detections: {e}")
+                return
+            with self.cond:
+                room = self.max_queue - len(self.queue)
+                if room <= 0:
+                    return
+                now = time.time()
+                self.queue.extend((now, record) for record in records[:room])
+                self.stats['unspilled'] += min(room, len(records))
+            remaining = records[room:]
+            if remaining:
+                with open(self.spill_path, 'w', encoding='utf-8') as spill_file:
+                    for record in remaining:
+                        spill_file.write(json.dumps(record, default=str) + '\n')
+            else:
+                os.remove(self.spill_path)
+            print(f"[WRITER] Re-queued {len(records) - len(remaining)} spilled detections")
+
+    def _next_batch(self):
+        """Wait until a full batch is queued or the oldest record is flush_interval old"""
+        with self.cond:
+            while self.running:
+                if len(self.queue) >= self.batch_size:
+                    break
+                if self.queue:
+                    remaining = self.queue[0][0] + self.flush_interval - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                else:
+                    self.cond.wait(self.flush_interval)
+                    if not self.queue:
+                        # Idle: let the writer loop do housekeeping
+                        break
+            count = min(len(self.queue), self.batch_size)
+            batch = [self.queue.popleft()[1] for _ in range(count)]
+            if batch:
+                # Room freed up for callers blocked by the 'block' policy
+                self.cond.notify_all()
+            return batch
+
+    def commit_batch(self, records):
+        """Commit records synchronously in Firestore batches (e.g. as an event log sink)"""
+        for start in range(0, len(records), self.batch_size):
+            self._commit(records[start:start + self.batch_size])
+
+    def _commit(self, records):
+        """Commit one Firestore write batch (raises if the commit fails)"""
+        batch = self.db.batch()
+        collection = self.db.collection(self.collection)
+        for record in records:
+            document = dict(record)
+            if self.timestamp_value is not None:
+                document['timestamp'] = self.timestamp_value
+            batch.set(collection.document(), document)
+
+        started = time.time()
+        run_blocking(batch.commit)
+        elapsed_ms = (time.time() - started) * 1000
+        with self.cond:
+            self.stats['batches'] += 1
+            self.stats['committed'] += len(records)
+            self.stats['commit_total'] += elapsed_ms
+            self.stats['last_commit_ms'] = elapsed_ms
+            self.stats['max_commit_ms'] = max(self.stats['max_commit_ms'], elapsed_ms)
+
+    def _writer_loop(self):
+        """Commit batches until stopped, retrying failed commits with backoff"""
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if not self.running:
+                    break
+                if self.overflow_policy == 'spill':
+                    self._unspill()
+                continue
+
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self._commit(batch)
+                    break
+                except Exception as e:
+                    with self.cond:
+                        self.stats['failed_batches'] += 1
+                    print(f"[WRITER] Firestore batch commit failed (attempt {attempt + 1}): {e}")
+                    if attempt < self.max_retries and self.running:
+                        time.sleep(min(0.5 * 2 ** attempt, 5.0))
+            else:
+                # Out of retries: keep the records on disk if spilling, otherwise give up on them
+                if self.overflow_policy == 'spill':
+                    with self.cond:
+                        self.stats['spilled'] += len(batch)
+                    self._spill(batch)
+                else:
+                    with self.cond:
+                        self.stats['dropped'] += len(batch)
+
+        print("[WRITER] Detection writer stopped")
+
+    def get_stats(self):
+        """Queue depth, throughput counters and commit latency"""
+        with self.cond:
+            batches = self.stats['batches']
+            return {
+                'queued': len(self.queue),
+                'max_queue': self.max_queue,
+                'batch_size': self.batch_size,
+                'overflow_policy': self.overflow_policy,
+                'enqueued': self.stats['enqueued'],
+                'committed': self.stats['committed'],
+                'dropped': self.stats['dropped'],
+                'spilled': self.stats['spilled'],
+                'unspilled': self.stats['unspilled'],
+                'batches': batches,
+                'failed_batches': self.stats['failed_batches'],
+                'avg_commit_ms': self.stats['commit_total'] / batches if batches else 0,
+                'last_commit_ms': self.stats['last_commit_ms'],
+                'max_commit_ms': self.stats['max_commit_ms']
+            }
+
+
+class LocalFirestore:
+    """In-memory stand-in for the Firestore client API used by BatchedDetectionWriter
+
+    Useful for running the backend and its writer without Firebase; commit_latency simulates
+    network round trips and fail_commits makes the next N commits raise.
+    """
+
+    def __init__(self, commit_latency=0.0, fail_commits=0):
+        self.commit_latency = commit_latency
+        self.fail_commits = fail_commits
+        self.collections = {}  # name -> {document_id: data}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def collection(self, name):
+        return _LocalCollection(self, name)
+
+    def batch(self):
+        return _LocalBatch(self)
+
+
+class _LocalCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def document(self, document_id=None):
+        return _LocalDocument(self, document_id or f"doc-{next(self.client.ids)}")
+
+    def add(self, data):
+        document = self.document()
+        document.set(data)
+        return None, document
+
+
+class _LocalDocument:
+    def __init__(self, collection, document_id):
+        self.collection = collection
+        self.id = document_id
+
+    def set(self, data):
+        client = self.collection.client
+        with client.lock:
+            client.collections.setdefault(self.collection.name, {})[self.id] = dict(data)
+
+
+class _LocalBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, document, data):
+        self.writes.append((document, data))
+
+    def commit(self):
+        if self.client.commit_latency:
+            time.sleep(self.client.commit_latency)
+        with self.client.lock:
+            if self.client.fail_commits > 0:
+                self.client.fail_commits -= 1
+                raise ConnectionError("Simulated Firestore failure")
+        for document, data in self.writes:
+            document.set(data)
@@ -0,0 +1,217 @@
+"""
+SecureEye detector registry
+Detectors are plugins with declared inputs, a cost estimate and a default cadence; each camera runs the pipeline configured for it
+"""
+
+import math
+import os
+import time
+
+# Frame views a plugin may declare it reads (all come from the shared FrameContext)
+INPUTS = ('frame', 'gray', 'hsv', 'roi')
+SCOPES = ('frame', 'zones')
+
+
+class DetectorPlugin:
+    def __init__(self, name, run, inputs, cost_ms, interval, scope='frame', description=''):
+        """A detector the pipeline can schedule
+
+        run(detector, ctx, camera_id, zones) returns (detected, data) for scope 'frame', or
+        {zone_name: (detected, data)} for scope 'zones'; data carries at least 'confidence'.
+        cost_ms is a rough per-run cost on a 640x480 frame and interval the default seconds
+        between runs (0 = every analysed frame).
+        """
+        unknown = set(inputs) - set(INPUTS)
+        if unknown:
+            raise ValueError(f"Unknown inputs for detector {name}: {sorted(unknown)}")
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown scope for detector {name}: {scope}")
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.cost_ms = float(cost_ms)
+        self.interval = float(interval)
+        self.scope = scope
+        self.description = description
+
+    def describe(self):
+        return {
+            'name': self.name,
+            'inputs': list(self.inputs),
+            'cost_ms': self.cost_ms,
+            'default_interval': self.interval,
+            'scope': self.scope,
+            'description': self.description
+        }
+
+
+class DetectorRegistry:
+    def __init__(self):
+        self.plugins = {}  # name -> DetectorPlugin, in registration order
+
+    def register(self, name, inputs, cost_ms, interval, scope='frame', description=''):
+        """Decorator registering run(detector, ctx, camera_id, zones) as a detector plugin"""
+        def decorator(run):
+            self.plugins[name] = DetectorPlugin(name, run, inputs, cost_ms, interval, scope, description)
+            return run
+        return decorator
+
+    def get(self, name):
+        plugin = self.plugins.get(name)
+        if plugin is None:
+            raise ValueError(f"Unknown detector: {name} (available: {', '.join(self.plugins)})")
+        return plugin
+
+    def describe(self):
+        """Every registered detector with its inputs, cost and default cadence"""
+        return [plugin.describe() for plugin in self.plugins.values()]
+
+    def normalize_pipeline(self, config):
+        """Turn a pipeline config into {detector: {'interval': seconds}} in registration order
+
+        Accepts {"fire": {"interval": 2}, "motion": {}}, {"fire": 2}, a list of names or of
+        {"detector": "fire", "interval": 2} objects, or a string like "motion,fire:2,crowd:5".
+        A detector without an interval runs at its default cadence.
+        """
+        if isinstance(config, str):
+            config = [item.strip() for item in config.split(',') if item.strip()]
+        if isinstance(config, list):
+            entries = {}
+            for item in config:
+                if isinstance(item, dict):
+                    item = dict(item)
+                    entries[item.pop('detector', None)] = item
+                elif isinstance(item, str):
+                    name, _, interval = item.partition(':')
+                    entries[name.strip()] = {'interval': interval} if interval else {}
+                else:
+                    raise ValueError('Pipeline entries must be detector names or objects')
+            config = entries
+        if not isinstance(config, dict):
+            raise ValueError('Pipeline must be an object, a list or a string')
+
+        pipeline = {}
+        for name, options in config.items():
+            plugin = self.get(name)
+            if options is None or options is True:
+                options = {}
+            elif isinstance(options, (int, float)) and not isinstance(options, bool):
+                options = {'interval': options}
+            elif not isinstance(options, dict):
+                raise ValueError(f"Options for detector {name} must be an object or an interval")
+            if options.get('enabled', True) is False:
+                continue
+            interval = options.get('interval')
+            interval = plugin.interval if interval in (None, '') else float(interval)
+            if not math.isfinite(interval) or interval < 0:
+                raise ValueError(f"Interval for detector {name} must be a finite number of seconds, not negative")
+            pipeline[name] = {'interval': interval}
+        return {name: pipeline[name] for name in self.plugins if name in pipeline}
+
+    def estimate_cost(self, pipeline, analysis_interval):
+        """Rough detector milliseconds per second of video for a pipeline at the given analysis interval"""
+        total = 0.0
+        for name, options in pipeline.items():
+            period = max(options['interval'], analysis_interval, 1e-3)
+            total += self.get(name).cost_ms / period
+        return total
+
+
+detectors = DetectorRegistry()
+
+
+_default_pipeline = None  # DETECTION_PIPELINE, parsed once the built-in plugins are registered
+
+
+def load_default_pipeline(registry=None):
+    """Parse DETECTION_PIPELINE, falling back to zone motion (with a warning) if it is invalid"""
+    registry = registry or detectors
+    value = os.getenv('DETECTION_PIPELINE', 'motion')
+    try:
+        return registry.normalize_pipeline(value)
+    except (TypeError, ValueError) as e:
+        print(f"[PIPELINE] Invalid DETECTION_PIPELINE {value!r} ({e}), using 'motion'")
+        return registry.normalize_pipeline('motion')
+
+
+def default_pipeline(registry=None):
+    """Pipeline of cameras without their own: DETECTION_PIPELINE, zone motion on every analysed frame unless set"""
+    if registry is not None and registry is not detectors:
+        return load_default_pipeline(registry)
+    return dict(_default_pipeline)
+
+
+class CameraPipeline:
+    def __init__(self, config=None, registry=None):
+        """The detectors one camera runs and when each last ran
+
+        config is a normalised pipeline; None uses default_pipeline().
+        """
+        self.registry = registry or detectors
+        self.default = default_pipeline(self.registry)
+        self.config = None
+        self.last_run = {}
+        self.update(config)
+
+    def update(self, config):
+        """Switch to a new pipeline config (None = default); detectors keep their last-run times"""
+        self.config = config
+        self.active = config if config is not None else self.default
+
+    def due(self, now=None):
+        """Plugins whose interval has elapsed, in registration order"""
+        now = now if now is not None else time.time()
+        due = {}
+        for name, options in self.active.items():
+            if now - self.last_run.get(name, 0) >= options['interval']:
+                due[name] = self.registry.get(name)
+        return due
+
+    def run(self, plugin, detector, ctx, camera_id, zones, now=None):
+        """Run a plugin and remember when it ran"""
+        self.last_run[plugin.name] = now if now is not None else time.time()
+        return plugin.run(detector, ctx, camera_id, zones)
+
+
+@detectors.register('motion', inputs=('gray', 'roi'), cost_ms=3.0, interval=0, scope='zones',
+                    description='Frame differencing over the union of the zones')
+def zone_motion(detector, ctx, camera_id, zones):
+    return detector.detect_motion_in_zones(ctx, zones, camera_id)
+
+
+@detectors.register('human', inputs=('frame', 'roi'), cost_ms=3.0, interval=0.5, scope='zones',
+                    description='Human-shaped moving blobs in each zone (background subtraction)')
+def zone_humans(detector, ctx, camera_id, zones):
+    return detector.detect_humans_in_zones(ctx, zones, camera_id)
+
+
+@detectors.register('fire', inputs=('hsv',), cost_ms=1.5, interval=2.0,
+                    description='Share of fire-coloured pixels in the frame')
+def fire(detector, ctx, camera_id, zones):
+    detected, fire_ratio = detector.detect_fire(ctx)
+    # 10% of the frame in fire colours is full confidence
+    return detected, {'confidence': min(fire_ratio * 10, 1.0), 'fire_ratio': fire_ratio}
+
+
+@detectors.register('crowd', inputs=('gray',), cost_ms=1.5, interval=5.0,
+                    description='Edge density of the frame')
+def crowd(detector, ctx, camera_id, zones):
+    detected, edge_density = detector.detect_crowd(ctx)
+    return detected, {'confidence': min(edge_density / 0.3, 1.0), 'edge_density': edge_density}
+
+
+@detectors.register('violence', inputs=('gray',), cost_ms=0.5, interval=1.0,
+                    description='Rapid change between consecutive runs')
+def violence(detector, ctx, camera_id, zones):
+    detected, change_ratio = detector.detect_violence(ctx, camera_id)
+    return detected, {'confidence': min(change_ratio * 2, 1.0), 'change_ratio': change_ratio}
+
+
+@detectors.register('frame_motion', inputs=('frame',), cost_ms=10.0, interval=1.0,
+                    description='Background subtraction over the whole frame')
+def frame_motion(detector, ctx, camera_id, zones):
+    detected, motion_area = detector.detect_motion(ctx, camera_id)
+    return detected, {'confidence': min(motion_area / (ctx.width * ctx.height) * 10, 1.0), 'motion_area': motion_area}
+
+
+_default_pipeline = load_default_pipeline()
@@ -0,0 +1,380 @@
+"""
+SecureEye event log
+Segmented, checksummed write-ahead log for detections, replayed to Firestore (or any sink) with a committed offset
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from cooperative import run_blocking
+
+# Each entry: sequence number, payload length, CRC32 of the payload, then the JSON payload
+ENTRY_HEADER = struct.Struct('<QII')
+SEGMENT_SUFFIX = '.log'
+OFFSET_FILE = 'committed.offset'
+
+
+class EventLog:
+    def __init__(self, directory, segment_bytes=None, fsync_interval=None, max_bytes=None):
+        """Open (or create) a log in directory
+
+        append() only encodes the record and adds it to an in-memory buffer; a flusher thread
+        writes buffered entries and fsyncs them as one group every fsync_interval seconds, so
+        at most that much is lost on power failure. Segments are rotated at segment_bytes and
+        deleted once every entry in them is committed. While the sink is unreachable the log
+        is capped at max_bytes (0 = unbounded): the oldest uncommitted segments are dropped.
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes if segment_bytes is not None else int(os.getenv('EVENT_LOG_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('EVENT_LOG_MAX_BYTES', str(256 * 1024 * 1024)))
+        self.fsync_interval = fsync_interval if fsync_interval is not None else float(os.getenv('EVENT_LOG_FSYNC_INTERVAL', '0.05'))
+        os.makedirs(directory, exist_ok=True)
+
+        self.cond = threading.Condition()
+        self.offset_lock = threading.Lock()  # The replayer commits while the flusher may enforce the size cap
+        self.pending = []  # Encoded entries not yet written
+        self.pending_first_seq = None
+        self.running = False
+        self.thread = None
+        self.segment_file = None
+        self.segment_path = None
+        self.read_cursor = None  # (next seq, segment path, byte position) of the last read()
+        self.stats = {'appended': 0, 'fsyncs': 0, 'fsync_total': 0.0, 'corrupt_entries': 0, 'deleted_segments': 0,
+                      'dropped_segments': 0, 'dropped_entries': 0}
+
+        self.committed_seq = self._load_committed()
+        self.next_seq = self._recover()
+        self.durable_seq = self.next_seq - 1
+
+    def _segments(self):
+        """Segment paths with their first sequence number, oldest first"""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SEGMENT_SUFFIX):
+                try:
+                    segments.append((int(name[:-len(SEGMENT_SUFFIX)]), os.path.join(self.directory, name)))
+                except ValueError:
+                    continue
+        return sorted(segments)
+
+    def _load_committed(self):
+        """Read the committed offset (0 if nothing was ever committed)"""
+        try:
+            with open(os.path.join(self.directory, OFFSET_FILE), 'r', encoding='utf-8') as offset_file:
+                return int(offset_file.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _scan(self, path, position=0):
+        """Yield (seq, record, end position) for valid entries in a segment, stopping at the first bad one"""
+        with open(path, 'rb') as segment:
+            segment.seek(position)
+            while True:
+                header = segment.read(ENTRY_HEADER.size)
+                if len(header) < ENTRY_HEADER.size:
+                    return
+                seq, length, checksum = ENTRY_HEADER.unpack(header)
+                payload = segment.read(length)
+                if len(payload) < length:
+                    return  # Torn write at the tail
+                if zlib.crc32(payload) != checksum:
+                    self.stats['corrupt_entries'] += 1
+                    return
+                position += ENTRY_HEADER.size + length
+                yield seq, json.loads(payload.decode('utf-8')), position
+
+    def _recover(self):
+        """Find the next sequence number, truncating a torn or corrupt tail of the last segment"""
+        segments = self._segments()
+        if not segments:
+            return self.committed_seq + 1
+
+        first_seq, path = segments[-1]
+        last_seq, valid_end = first_seq - 1, 0
+        for seq, _, position in self._scan(path):
+            last_seq, valid_end = seq, position
+        if valid_end < os.path.getsize(path):
+            print(f"[EVENTLOG] Truncating damaged tail of {os.path.basename(path)} at byte {valid_end}")
+            with open(path, 'r+b') as segment:
+                segment.truncate(valid_end)
+        return max(last_seq + 1, self.committed_seq + 1)
+
+    def start(self):
+        """Start the background flusher (no-op if already running)"""
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._flush_loop, name='event-log-flusher')
+        self.thread.daemon = True
+        self.thread.start()
+        print(f"[EVENTLOG] Event log open at {self.directory} (next seq {self.next_seq}, committed {self.committed_seq})")
+
+    def close(self, timeout=5.0):
+        """Flush buffered entries and stop the flusher"""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout)
+        self._write_pending()
+        if self.segment_file:
+            self.segment_file.close()
+            self.segment_file = None
+
+    def append(self, record):
+        """Buffer a record for the log and return its sequence number"""
+        payload = json.dumps(record, default=str, separators=(',', ':')).encode('utf-8')
+        with self.cond:
+            seq = self.next_seq
+            self.next_seq += 1
+            if not self.pending:
+                self.pending_first_seq = seq
+            self.pending.append(ENTRY_HEADER.pack(seq, len(payload), zlib.crc32(payload)) + payload)
+            self.stats['appended'] += 1
+        return seq
+
+    def flush(self, timeout=None):
+        """Wait until everything appended so far is on disk"""
+        if not self.running:
+            self._write_pending()
+            return True
+        with self.cond:
+            target = self.next_seq - 1
+            self.cond.notify_all()  # Wake the flusher now instead of at its next interval
+            return self.cond.wait_for(lambda: self.durable_seq >= target, timeout)
+
+    def _flush_loop(self):
+        """Write and fsync buffered entries as one group every fsync_interval"""
+        while True:
+            with self.cond:
+                if not self.running:
+                    return
+                self.cond.wait(self.fsync_interval)
+            self._write_pending()
+
+    def _write_pending(self):
+        """Append buffered entries to the active segment, rotating it when full, then fsync"""
+        with self.cond:
+            if not self.pending:
+                return
+            entries, first_seq = self.pending, self.pending_first_seq
+            self.pending, self.pending_first_seq = [], None
+
+        started = time.time()
+        run_blocking(self._write_entries, first_seq, entries)
+
+        with self.cond:
+            self.durable_seq = first_seq + len(entries) - 1
+            self.stats['fsyncs'] += 1
+            self.stats['fsync_total'] += time.time() - started
+            self.cond.notify_all()
+
+    def _write_entries(self, first_seq, entries):
+        """Write entries to disk and fsync them (runs on a real thread in cooperative mode)"""
+        for index, entry in enumerate(entries):
+            if self.segment_file is None or self.segment_file.tell() >= self.segment_bytes:
+                self._rotate(first_seq + index)
+            self.segment_file.write(entry)
+        self.segment_file.flush()
+        os.fsync(self.segment_file.fileno())
+
+    def _rotate(self, first_seq):
+        """Close the active segment and start a new one named after its first sequence number"""
+        reopening = self.segment_file is None
+        if self.segment_file:
+            self.segment_file.flush()
+            os.fsync(self.segment_file.fileno())
+            self.segment_file.close()
+        segments = self._segments()
+        if reopening and segments and os.path.getsize(segments[-1][1]) < self.segment_bytes:
+            # Reopen the last segment after a restart instead of starting a tiny new one
+            self.segment_path = segments[-1][1]
+        else:
+            self.segment_path = os.path.join(self.directory, f"{first_seq:020d}{SEGMENT_SUFFIX}")
+        self.segment_file = open(self.segment_path, 'ab')
+        self._enforce_cap()
+
+    def _enforce_cap(self):
+        """Drop the oldest segments, committed or not, while the log is over max_bytes"""
+        if not self.max_bytes:
+            return
+        segments = self._segments()
+        sizes = {}
+        for _, path in segments:
+            try:
+                sizes[path] = os.path.getsize(path)
+            except FileNotFoundError:
+                sizes[path] = 0  # Deleted by a commit in the meantime
+        total = sum(sizes.values())
+        for index, (first_seq, path) in enumerate(segments[:-1]):
+            if total <= self.max_bytes or path == self.segment_path:
+                break
+            next_first = segments[index + 1][0]
+            dropped = max(0, next_first - 1 - max(self.committed_seq, first_seq - 1))
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Deleted by a commit in the meantime
+            total -= sizes[path]
+            self.stats['dropped_segments'] += 1
+            self.stats['dropped_entries'] += dropped
+            if dropped:
+                print(f"[EVENTLOG] Log over {self.max_bytes} bytes, dropped {dropped} unreplayed entries")
+            if next_first - 1 > self.committed_seq:
+                # The replayer resumes after the dropped entries
+                self._write_offset(next_first - 1)
+
+    def read(self, after_seq, max_records=100):
+        """Return up to max_records durable (seq, record) pairs with seq > after_seq"""
+        with self.cond:
+            durable_seq = self.durable_seq
+        records = []
+        segments = self._segments()
+
+        # Continue where the previous read stopped when possible, instead of rescanning a segment
+        start_path, start_position = None, 0
+        if self.read_cursor and self.read_cursor[0] == after_seq + 1 and os.path.exists(self.read_cursor[1]):
+            start_path, start_position = self.read_cursor[1], self.read_cursor[2]
+
+        for index, (first_seq, path) in enumerate(segments):
+            next_first = segments[index + 1][0] if index + 1 < len(segments) else None
+            if next_first is not None and next_first <= after_seq + 1:
+                continue  # Every entry in this segment is already past
+            if start_path and path < start_path:
+                continue
+            position = start_position if path == start_path else 0
+            try:
+                for seq, record, end in self._scan(path, position):
+                    if seq > durable_seq:
+                        break
+                    if seq > after_seq:
+                        records.append((seq, record))
+                        self.read_cursor = (seq + 1, path, end)
+                        if len(records) >= max_records:
+                            return records
+            except FileNotFoundError:
+                continue  # Dropped by the size cap while we were reading
+            if records and records[-1][0] >= durable_seq:
+                break
+        return records
+
+    def _write_offset(self, seq):
+        """Durably store the committed offset (never moving it backwards)"""
+        offset_path = os.path.join(self.directory, OFFSET_FILE)
+        temp_path = offset_path + '.tmp'
+        with self.offset_lock:
+            seq = max(seq, self.committed_seq)
+            with open(temp_path, 'w', encoding='utf-8') as offset_file:
+                offset_file.write(str(seq))
+                offset_file.flush()
+                os.fsync(offset_file.fileno())
+            os.replace(temp_path, offset_path)
+            self.committed_seq = seq
+        return seq
+
+    def commit(self, seq):
+        """Record that every entry up to seq reached its sink and delete fully committed segments"""
+        # The size cap may already have moved the offset past a batch that was in flight
+        seq = self._write_offset(seq)
+
+        segments = self._segments()
+        for index, (first_seq, path) in enumerate(segments[:-1]):
+            # A segment is done when the next one starts at or before the first uncommitted entry
+            if segments[index + 1][0] <= seq + 1 and path != self.segment_path:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue  # Already dropped by the size cap
+                self.stats['deleted_segments'] += 1
+
+    def get_stats(self):
+        """Sequence numbers, backlog and fsync cost"""
+        segments = self._segments()
+        with self.cond:
+            fsyncs = self.stats['fsyncs']
+            return {
+                'directory': self.directory,
+                'segments': len(segments),
+                'bytes': sum(os.path.getsize(path) for _, path in segments if os.path.exists(path)),
+                'next_seq': self.next_seq,
+                'durable_seq': self.durable_seq,
+                'committed_seq': self.committed_seq,
+                'uncommitted': self.durable_seq - self.committed_seq,
+                'buffered': len(self.pending),
+                'appended': self.stats['appended'],
+                'fsyncs': fsyncs,
+                'avg_fsync_ms': self.stats['fsync_total'] / fsyncs * 1000 if fsyncs else 0,
+                'corrupt_entries': self.stats['corrupt_entries'],
+                'deleted_segments': self.stats['deleted_segments'],
+                'max_bytes': self.max_bytes,
+                'dropped_segments': self.stats['dropped_segments'],
+                'dropped_entries': self.stats['dropped_entries']
+            }
+
+
+class LogReplayer:
+    def __init__(self, log, sink, batch_size=100, poll_interval=1.0, max_backoff=30.0):
+        """Drain log entries after the committed offset into sink(records)
+
+        sink must return only once the records are stored (and raise if they were not); the
+        offset is committed after each successful call, so a crash replays at most one batch.
+        """
+        self.log = log
+        self.sink = sink
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+        self.stats = {'replayed': 0, 'batches': 0, 'failures': 0, 'last_error': None}
+
+    def start(self):
+        """Start replaying in the background"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._replay_loop, name='event-log-replayer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop replaying"""
+        self.running = False
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def _replay_loop(self):
+        """Replay batches; back off exponentially while the sink is failing"""
+        backoff = self.poll_interval
+        while self.running:
+            entries = run_blocking(self.log.read, self.log.committed_seq, self.batch_size)
+            if not entries:
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+                continue
+            try:
+                run_blocking(self.sink, [record for _, record in entries])
+            except Exception as e:
+                self.stats['failures'] += 1
+                self.stats['last_error'] = str(e)
+                print(f"[EVENTLOG] Replay to sink failed, retrying in {backoff:.1f}s: {e}")
+                self.wakeup.wait(backoff)
+                self.wakeup.clear()
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            run_blocking(self.log.commit, entries[-1][0])
+            self.stats['replayed'] += len(entries)
+            self.stats['batches'] += 1
+            backoff = self.poll_interval
+
+    def get_stats(self):
+        """Replay progress and the last sink error"""
+        stats = dict(self.stats)
+        stats['lag'] = self.log.durable_seq - self.log.committed_seq
+        return stats
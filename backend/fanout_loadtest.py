@@ -0,0 +1,265 @@
+"""
+SecureEye Socket.IO fan-out load test
+Opens M dashboard-like Socket.IO clients, drives a fixed alert rate through the server and reports delivery latency
+
+    LOADTEST_ENABLED=1 python app.py                  # in another terminal
+    python fanout_loadtest.py --clients 10,100,500 --rate 20 --duration 20
+    python fanout_loadtest.py --clients 200 --encoding msgpack --subscribe 2 --cameras 20
+
+Clients connect like home.html (default all-cameras subscription) and handle the same events.
+Latency is the alert's server-side timestamp to receipt here, so run on the server's host.
+Clients are spread over --processes so the load tool itself does not become the bottleneck.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+import requests
+import socketio
+from report_stats import fmt, percentile
+
+# Events home.html listens for; counted per client so unexpected traffic shows up too
+DASHBOARD_EVENTS = ('status', 'detection_alert', 'zone_alert', 'zone_updated', 'zone_data', 'detection_started',
+                    'detection_stopped', 'camera_error', 'subscribed', 'alert_settings_updated', 'error')
+
+
+def alert_sent_at(payload):
+    """Server-side time of an alert in epoch seconds (JSON 'timestamp' or decoded 'timestamp_ms')"""
+    if 'timestamp_ms' in payload:
+        return payload['timestamp_ms'] / 1000.0
+    return datetime.fromisoformat(payload['timestamp']).timestamp()
+
+
+class DashboardClient:
+    def __init__(self, index, encoding):
+        self.index = index
+        self.encoding = encoding
+        self.client = socketio.Client(reconnection=False)
+        self.events = {}  # event -> count
+        self.latencies = {}  # load run -> [seconds]
+        self.cameras = []
+        for event in DASHBOARD_EVENTS:
+            self.client.on(event, self._handler(event))
+
+    def _handler(self, event):
+        def handle(data=None):
+            received = time.time()
+            self.events[event] = self.events.get(event, 0) + 1
+            if event != 'zone_alert':
+                return
+            if isinstance(data, (bytes, bytearray)):
+                from alert_encoding import decode_alert
+                _, data = decode_alert(data)
+            if isinstance(data, dict) and data.get('load_run') is not None:
+                self.latencies.setdefault(data['load_run'], []).append(received - alert_sent_at(data))
+        return handle
+
+    def connect(self, url, cameras=None):
+        auth = {'encoding': 'msgpack', 'encoding_version': 1} if self.encoding == 'msgpack' else None
+        self.client.connect(url, auth=auth)
+        if cameras:
+            # An explicit subscription replaces the default all-cameras one
+            self.cameras = list(cameras)
+            self.client.emit('subscribe', {'camera_ids': self.cameras})
+
+    def close(self):
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+
+def _client_process(group, url, count, encoding, camera_ids, subscribe, commands, results):
+    """Run a share of the clients until told to collect and close"""
+    rng = random.Random(group)
+    clients = []
+    failed = 0
+    for index in range(count):
+        client = DashboardClient(index, encoding)
+        cameras = rng.sample(camera_ids, min(subscribe, len(camera_ids))) if subscribe else None
+        try:
+            client.connect(url, cameras)
+            clients.append(client)
+        except Exception as e:
+            failed += 1
+            if failed == 1:
+                print(f"[LOAD] Client connection failed: {e}")
+    results.put(('ready', group, {'connected': len(clients), 'failed': failed}))
+
+    while True:
+        command, run_id = commands.get()
+        if command == 'collect':
+            results.put(('result', group, [{
+                'cameras': client.cameras,
+                'events': dict(client.events),
+                'latencies': client.latencies.get(run_id, []),
+                'connected': client.client.connected
+            } for client in clients]))
+        elif command == 'close':
+            break
+
+    threads = [threading.Thread(target=client.close) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+
+def expected_alerts(emitted, camera_ids, subscribed):
+    """How many of emitted round-robin alerts a client subscribed to `subscribed` cameras should get"""
+    if not subscribed:
+        return emitted
+    per_camera = {}
+    for index, camera_id in enumerate(camera_ids):
+        per_camera[camera_id] = emitted // len(camera_ids) + (1 if index < emitted % len(camera_ids) else 0)
+    return sum(per_camera.get(camera_id, 0) for camera_id in subscribed)
+
+
+def run_step(url, clients, args):
+    """Connect `clients` clients, drive args.rate alerts/s for args.duration seconds and summarise"""
+    context = multiprocessing.get_context('spawn')
+    processes = min(args.processes, clients)
+    camera_ids = [f"load-{index}" for index in range(args.cameras)]
+    results = context.Queue()
+    groups = []
+    for group in range(processes):
+        share = clients // processes + (1 if group < clients % processes else 0)
+        commands = context.Queue()
+        process = context.Process(target=_client_process,
+                                  args=(group, url, share, args.encoding, camera_ids, args.subscribe, commands, results))
+        process.daemon = True
+        process.start()
+        groups.append((process, commands))
+
+    connected = failed = 0
+    for _ in range(processes):
+        _, _, ready = results.get(timeout=args.connect_timeout)
+        connected += ready['connected']
+        failed += ready['failed']
+    print(f"[LOAD] {connected} clients connected ({failed} failed)")
+    time.sleep(1.0)  # Let subscriptions settle
+
+    response = requests.post(f"{url}/api/loadtest/alerts", timeout=10,
+                             json={'rate': args.rate, 'duration': args.duration, 'camera_ids': camera_ids})
+    response.raise_for_status()
+    run_id = response.json()['run_id']
+
+    # Wait for the run to finish, then give in-flight messages time to arrive
+    while True:
+        time.sleep(1.0)
+        server = requests.get(f"{url}/api/loadtest/alerts", timeout=10).json()
+        if not server.get('running'):
+            break
+    time.sleep(args.drain)
+
+    for _, commands in groups:
+        commands.put(('collect', run_id))
+    reports = []
+    for _ in range(processes):
+        _, _, group_reports = results.get(timeout=60)
+        reports.extend(group_reports)
+    for process, commands in groups:
+        commands.put(('close', None))
+    for process, _ in groups:
+        process.join(timeout=15)
+
+    latencies = sorted(latency for report in reports for latency in report['latencies'])
+    received = [len(report['latencies']) for report in reports]
+    expected = sum(expected_alerts(server['emitted'], camera_ids, report['cameras']) for report in reports)
+    elapsed = server.get('elapsed') or args.duration
+    client_rates = sorted(count / elapsed for count in received)
+    return {
+        'clients': clients,
+        'connected': connected,
+        'connect_failed': failed,
+        'disconnected': sum(1 for report in reports if not report['connected']),
+        'target_rate': args.rate,
+        'achieved_rate': server.get('achieved_rate'),
+        'emitted': server['emitted'],
+        'emit_ms_p50': server.get('emit_ms_p50'),
+        'emit_ms_p99': server.get('emit_ms_p99'),
+        'delivered': sum(received),
+        'expected': expected,
+        'delivery_ratio': sum(received) / expected if expected else None,
+        'latency_p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+        'latency_p95_ms': percentile(latencies, 0.95) * 1000 if latencies else None,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'latency_max_ms': latencies[-1] * 1000 if latencies else None,
+        'client_rate_min': client_rates[0] if client_rates else None,
+        'client_rate_median': percentile(client_rates, 0.5),
+        'messages_per_second': sum(received) / elapsed
+    }
+
+
+def print_report(steps, slo_ms, min_delivery):
+    """Fan-out table, marking the first client count where delivery degrades"""
+    print(f"\n{'clients':>8}{'conn':>6}{'rate':>7}{'emit p99':>10}{'p50 ms':>8}{'p99 ms':>8}{'max ms':>8}"
+          f"{'delivered':>10}{'msg/s':>9}{'min/cl':>8}")
+    saturated = None
+    for step in steps:
+        ok = (step['latency_p99_ms'] is not None and step['latency_p99_ms'] <= slo_ms
+              and (step['delivery_ratio'] or 0) >= min_delivery
+              and (step['achieved_rate'] or 0) >= 0.95 * step['target_rate'])
+        if not ok and saturated is None:
+            saturated = step['clients']
+        print(f"{step['clients']:>8}{step['connected']:>6}{fmt(step['achieved_rate'], '{:.1f}'):>7}"
+              f"{fmt(step['emit_ms_p99'], '{:.2f}'):>10}{fmt(step['latency_p50_ms'], '{:.0f}'):>8}"
+              f"{fmt(step['latency_p99_ms'], '{:.0f}'):>8}{fmt(step['latency_max_ms'], '{:.0f}'):>8}"
+              f"{fmt(step['delivery_ratio'], '{:.1%}'):>10}{step['messages_per_second']:>9.0f}"
+              f"{fmt(step['client_rate_min'], '{:.1f}'):>8}{'' if ok else '  <- saturated'}")
+    if saturated is None:
+        print(f"\n[LOAD] No saturation: p99 <= {slo_ms:.0f} ms and >= {min_delivery:.0%} delivered at every step")
+    else:
+        print(f"\n[LOAD] Fan-out saturates at {saturated} clients "
+              f"(p99 > {slo_ms:.0f} ms, < {min_delivery:.0%} delivered or the alert rate fell behind)")
+    return saturated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Socket.IO fan-out load test for SecureEye')
+    parser.add_argument('--url', default='http://localhost:5000', help='Backend started with LOADTEST_ENABLED=1')
+    parser.add_argument('--clients', default='10,50,100,200', help='Comma-separated client counts')
+    parser.add_argument('--processes', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='Client processes per step')
+    parser.add_argument('--rate', type=float, default=10.0, help='Alerts per second published by the server')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of alert load per step')
+    parser.add_argument('--cameras', type=int, default=10, help='Cameras the alerts rotate over')
+    parser.add_argument('--subscribe', type=int, default=0,
+                        help='Cameras each client subscribes to (0 keeps the default all-cameras subscription)')
+    parser.add_argument('--encoding', choices=('json', 'msgpack'), default='json')
+    parser.add_argument('--drain', type=float, default=3.0, help='Seconds to wait for late messages')
+    parser.add_argument('--connect-timeout', type=float, default=120.0)
+    parser.add_argument('--slo-ms', type=float, default=250.0, help='p99 delivery latency budget')
+    parser.add_argument('--min-delivery', type=float, default=0.99, help='Required delivered fraction')
+    parser.add_argument('--output', default='', help='Write the report JSON here')
+    args = parser.parse_args(argv)
+
+    steps = []
+    for clients in [int(count) for count in args.clients.split(',') if count]:
+        print(f"[LOAD] {clients} clients, {args.rate:g} alerts/s for {args.duration:g}s")
+        try:
+            step = run_step(args.url, clients, args)
+        except (queue.Empty, requests.RequestException) as e:
+            print(f"[LOAD] Step with {clients} clients failed: {e}")
+            break
+        steps.append(step)
+        print(f"[LOAD] {clients} clients: p99 {step['latency_p99_ms'] or 0:.0f} ms, "
+              f"{(step['delivery_ratio'] or 0):.1%} delivered")
+
+    saturated = print_report(steps, args.slo_ms, args.min_delivery)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': {'timestamp': datetime.now().isoformat(), 'args': vars(args)},
+                       'saturated_at': saturated, 'steps': steps}, f, indent=2)
+        print(f"[LOAD] Report written to {args.output}")
+    return steps
+
+
+if __name__ == '__main__':
+    main()
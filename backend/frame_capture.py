@@ -0,0 +1,118 @@
+"""
+SecureEye latest-frame capture stage
+Reads a camera as fast as the source delivers and only hands the newest frame to detection
+"""
+
+import threading
+import time
+from tracing import tracer
+from frame_sources import ReconnectingSource
+
+
+class LatestFrameCapture:
+    def __init__(self, camera_id, stream_url):
+        self.camera_id = camera_id
+        self.stream_url = stream_url
+        self.source = None
+        self.stopping = threading.Event()
+        self.running = False
+        self.thread = None
+
+        # Single-slot frame buffer guarded by a condition variable
+        self.frame_ready = threading.Condition()
+        self.frame = None
+        self.frame_seq = 0
+        self.frame_time = 0
+        self.consumed_seq = 0
+
+        # Counters exposed to the detection loop and the API
+        self.frames_captured = 0
+        self.frames_consumed = 0
+        self.frames_dropped = 0  # frames overwritten before detection picked them up
+        self.started_at = None
+
+    def start(self):
+        """Open the source and start the capture thread
+
+        Returns False if the source cannot be opened at all; a device or stream that is down (at
+        start or later) is reconnected with backoff and the capture keeps running in the meantime.
+        """
+        self.source = ReconnectingSource(self.stream_url, stop_event=self.stopping)
+        if not self.source.open():
+            self.source.release()
+            return False
+
+        self.running = True
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self._capture_loop, name=f"capture-{self.camera_id}")
+        self.thread.daemon = True
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Stop the capture thread and release the source"""
+        self.stopping.set()  # Also ends a reconnect backoff wait
+        with self.frame_ready:
+            self.running = False
+            self.frame_ready.notify_all()
+
+    def is_running(self):
+        """Check whether the capture thread is still delivering (or reconnecting to) the source"""
+        return self.running
+
+    def _capture_loop(self):
+        """Keep pulling frames so the source buffer never backs up"""
+        try:
+            tracer.set_context(self.camera_id, 'capture')
+            while self.running:
+                with tracer.span('read'):
+                    ret, frame = self.source.read()
+                if not ret:
+                    # Only when the source finished, gave up reconnecting or was stopped
+                    if self.running:
+                        print(f"[CAMERA] Camera {self.camera_id} source ended ({self.source.state})")
+                    break
+
+                with self.frame_ready:
+                    # The previous frame was never analysed, it is dropped in favour of this one
+                    if self.frame is not None and self.consumed_seq < self.frame_seq:
+                        self.frames_dropped += 1
+                    self.frame = frame
+                    self.frame_seq += 1
+                    self.frame_time = time.time()
+                    self.frames_captured += 1
+                    self.frame_ready.notify_all()
+        finally:
+            with self.frame_ready:
+                self.running = False
+                self.frame_ready.notify_all()
+            self.source.release()
+
+    def read_latest(self, last_seq=0, timeout=1.0):
+        """Wait for a frame newer than last_seq and return (seq, frame, frame_time)"""
+        with self.frame_ready:
+            if self.frame_seq <= last_seq and self.running:
+                self.frame_ready.wait_for(lambda: self.frame_seq > last_seq or not self.running, timeout)
+
+            if self.frame_seq <= last_seq:
+                return last_seq, None, 0
+
+            self.consumed_seq = self.frame_seq
+            self.frames_consumed += 1
+            return self.frame_seq, self.frame, self.frame_time
+
+    def get_stats(self):
+        """Return capture counters for this camera"""
+        uptime = time.time() - self.started_at if self.started_at else 0
+        return {
+            'camera_id': self.camera_id,
+            'running': self.running,
+            'frames_captured': self.frames_captured,
+            'frames_consumed': self.frames_consumed,
+            'frames_dropped': self.frames_dropped,
+            'read_failures': self.source.read_failures if self.source else 0,
+            'capture_fps': self.frames_captured / uptime if uptime > 0 else 0,
+            'analysis_fps': self.frames_consumed / uptime if uptime > 0 else 0,
+            'frame_age': time.time() - self.frame_time if self.frame_time else None,
+            'source': self.source.get_stats() if self.source else None
+        }
@@ -0,0 +1,84 @@
+"""
+SecureEye per-frame preprocessing context
+Computes derived views of a frame (gray, HSV, blurs, pyramid levels, crops) lazily and at most once
+"""
+
+import cv2
+from tracing import tracer
+
+
+class FrameContext:
+    def __init__(self, frame):
+        self.frame = frame
+        self.height, self.width = frame.shape[:2]
+        self.views = {}  # Derived views keyed by (name, params)
+
+    def _cached(self, key, compute):
+        """Return a cached view, computing it on first request"""
+        view = self.views.get(key)
+        if view is None:
+            with tracer.span(key[0]):
+                view = compute()
+            self.views[key] = view
+        return view
+
+    def gray(self):
+        """Grayscale version of the frame"""
+        return self._cached(('gray',), lambda: cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY))
+
+    def hsv(self):
+        """HSV version of the frame"""
+        return self._cached(('hsv',), lambda: cv2.cvtColor(self.frame, cv2.COLOR_BGR2HSV))
+
+    def blurred_gray(self, ksize=21):
+        """Gaussian-blurred grayscale frame"""
+        return self._cached(('blurred_gray', ksize), lambda: cv2.GaussianBlur(self.gray(), (ksize, ksize), 0))
+
+    def pyramid(self, level):
+        """Frame downscaled by 2**level with pyrDown (level 0 is the frame itself)"""
+        if level <= 0:
+            return self.frame
+        return self._cached(('pyramid', level), lambda: cv2.pyrDown(self.pyramid(level - 1)))
+
+    def clip_rect(self, zone):
+        """Clip a zone dict to the frame and return (x, y, w, h), or None if it is empty"""
+        x = int(float(zone['x']))
+        y = int(float(zone['y']))
+        w = int(float(zone['width']))
+        h = int(float(zone['height']))
+
+        # Ensure zone is within frame bounds
+        x = max(0, min(x, self.width))
+        y = max(0, min(y, self.height))
+        w = max(0, min(w, self.width - x))
+        h = max(0, min(h, self.height - y))
+
+        if w <= 0 or h <= 0:
+            return None
+        return x, y, w, h
+
+    def roi(self, rect):
+        """BGR crop of the frame (a view, no copy)"""
+        x, y, w, h = rect
+        return self.frame[y:y+h, x:x+w]
+
+    def gray_roi(self, rect):
+        """Grayscale crop, sliced from the shared grayscale frame"""
+        x, y, w, h = rect
+        return self.gray()[y:y+h, x:x+w]
+
+    def blurred_gray_roi(self, rect, ksize=21):
+        """Blurred grayscale crop, reusing the full blurred frame when it already exists"""
+        full = self.views.get(('blurred_gray', ksize))
+        if full is not None:
+            x, y, w, h = rect
+            return full[y:y+h, x:x+w]
+        return self._cached(('blurred_gray_roi', tuple(rect), ksize),
+                            lambda: cv2.GaussianBlur(self.gray_roi(rect), (ksize, ksize), 0))
+
+
+def as_frame_context(frame):
+    """Accept either a raw frame or an existing FrameContext"""
+    if isinstance(frame, FrameContext):
+        return frame
+    return FrameContext(frame)
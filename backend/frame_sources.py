@@ -0,0 +1,418 @@
+"""
+SecureEye frame sources
+Device, network stream, video file, image directory and synthetic sources behind one interface,
+plus a wrapper that reconnects a dropped source with exponential backoff and jitter
+"""
+
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+import cv2
+from synthetic_source import SyntheticCapture, is_synthetic
+
+STREAM_SCHEMES = ('rtsp://', 'rtsps://', 'rtmp://', 'http://', 'https://', 'udp://', 'tcp://')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.m4v', '.webm', '.mjpeg', '.mjpg', '.ts')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def _flag(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+class _Pacer:
+    def __init__(self, fps):
+        """Release one frame every 1/fps seconds, skipping missed ticks instead of bursting"""
+        self.interval = 1.0 / fps if fps and fps > 0 else 0
+        self.next_frame = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.time()
+        if self.next_frame is not None and self.next_frame > now:
+            time.sleep(self.next_frame - now)
+        self.next_frame = max((self.next_frame or now) + self.interval, time.time())
+
+
+class FrameSource:
+    kind = 'source'
+
+    def __init__(self, target, options=None):
+        """One camera input; open() and read() never raise, they report failure instead"""
+        self.target = target
+        self.options = options or {}
+        self.properties = {}  # cv2.CAP_PROP_* values applied on every (re)open of a capture
+        self.finished = False  # A file or directory played once has nothing more to give
+        self.transient = False  # Whether a failed first open may just mean the source is down for now
+
+    def open(self):
+        """Connect to the source; True on success"""
+        raise NotImplementedError
+
+    def read(self):
+        """Return (ok, frame)"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class CaptureSource(FrameSource):
+    open_timeout = 0  # Seconds OpenCV may spend connecting or waiting for a frame (0 = backend default)
+
+    def __init__(self, target, options=None):
+        super().__init__(target, options)
+        self.cap = None
+
+    def open(self):
+        self.close()
+        try:
+            if self.open_timeout:
+                timeout_ms = int(self.open_timeout * 1000)
+                cap = cv2.VideoCapture(self.target, cv2.CAP_ANY, [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms,
+                                                                  cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms])
+            else:
+                cap = cv2.VideoCapture(self.target)
+        except cv2.error:
+            return False
+        if not cap.isOpened():
+            cap.release()
+            return False
+        # Ask the backend to keep as few frames queued as possible
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        for prop, value in self.properties.items():
+            cap.set(prop, value)
+        self.cap = cap
+        return True
+
+    def read(self):
+        if self.cap is None:
+            return False, None
+        ret, frame = self.cap.read()
+        if not ret or frame is None:
+            return False, None
+        return True, frame
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class DeviceSource(CaptureSource):
+    kind = 'device'
+
+    def __init__(self, target, options=None):
+        super().__init__(target, options)
+        self.transient = True  # Unplugged or held by another process
+
+
+class StreamSource(CaptureSource):
+    kind = 'stream'
+    # An unreachable RTSP host would otherwise block open() for tens of seconds
+    open_timeout = float(os.getenv('SOURCE_OPEN_TIMEOUT', '10'))
+
+    def __init__(self, target, options=None):
+        super().__init__(target, options)
+        self.transient = True  # Camera rebooting or network down
+
+
+class FileSource(CaptureSource):
+    kind = 'file'
+
+    def __init__(self, target, options=None):
+        """Plays a video file in real time (its own fps unless options['fps']), looping unless loop=0"""
+        super().__init__(target, options)
+        self.loop = _flag(self.options.get('loop', '1'))
+        self.pacer = None
+
+    def open(self):
+        if not super().open():
+            return False
+        fps = float(self.options.get('fps') or self.cap.get(cv2.CAP_PROP_FPS) or 25)
+        self.pacer = _Pacer(fps if _flag(self.options.get('realtime', '1')) else 0)
+        return True
+
+    def read(self):
+        if self.cap is None:
+            return False, None
+        self.pacer.wait()
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret or frame is None:
+            if not self.loop:
+                self.finished = True
+            return False, None
+        return True, frame
+
+
+class ImageDirectorySource(FrameSource):
+    kind = 'images'
+
+    def __init__(self, target, options=None):
+        """Replays the images in a directory in name order at options['fps'] (default 5)"""
+        super().__init__(target, options)
+        self.loop = _flag(self.options.get('loop', '1'))
+        self.pacer = _Pacer(float(self.options.get('fps', 5)))
+        self.paths = []
+        self.position = 0
+
+    def open(self):
+        try:
+            names = sorted(os.listdir(self.target))
+        except OSError:
+            return False
+        self.paths = [os.path.join(self.target, name) for name in names if name.lower().endswith(IMAGE_EXTENSIONS)]
+        self.position = 0
+        return bool(self.paths)
+
+    def read(self):
+        if not self.paths:
+            return False, None
+        if self.position >= len(self.paths):
+            if not self.loop:
+                self.finished = True
+                return False, None
+            self.position = 0
+        self.pacer.wait()
+        frame = cv2.imread(self.paths[self.position])
+        self.position += 1
+        if frame is None:
+            return False, None
+        return True, frame
+
+
+class SyntheticSource(FrameSource):
+    kind = 'synthetic'
+
+    def __init__(self, target, options=None):
+        super().__init__(target, options)
+        self.capture = None
+
+    def open(self):
+        self.capture = SyntheticCapture(self.target)
+        return True
+
+    def read(self):
+        return self.capture.read() if self.capture else (False, None)
+
+    def close(self):
+        if self.capture:
+            self.capture.release()
+            self.capture = None
+
+
+def _local_path(stream_url):
+    """Path and query options of a file:// or images:// URL (file:///abs or file://relative)"""
+    parsed = urlparse(stream_url)
+    options = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+    return parsed.netloc + parsed.path, options
+
+
+def create_source(stream_url):
+    """Pick the source implementation for a camera's stream_url
+
+    0, 1, ... or device://N     local capture device
+    rtsp://, http(s)://, ...    network stream
+    file://path?loop=0&fps=25   video file (a plain path to a video file works too; loops by default)
+    images://dir?fps=5&loop=0   image directory (a plain directory path works too)
+    synthetic://?fps=15&...     generated moving object (see synthetic_source.py)
+    """
+    if isinstance(stream_url, int):
+        return DeviceSource(stream_url)
+    url = str(stream_url).strip()
+    if url.isdigit():
+        return DeviceSource(int(url))
+    if url.startswith('device://'):
+        return DeviceSource(int(url[len('device://'):]))
+    if is_synthetic(url):
+        return SyntheticSource(url)
+    if url.startswith(STREAM_SCHEMES):
+        return StreamSource(url)
+    if url.startswith('file://'):
+        path, options = _local_path(url)
+        return FileSource(path, options)
+    if url.startswith('images://'):
+        path, options = _local_path(url)
+        return ImageDirectorySource(path, options)
+    if os.path.isdir(url):
+        return ImageDirectorySource(url)
+    if url.lower().endswith(VIDEO_EXTENSIONS) or os.path.isfile(url):
+        return FileSource(url)
+    # Anything else (e.g. a GStreamer pipeline) is handed to OpenCV as is
+    return StreamSource(url)
+
+
+class ReconnectingSource:
+    def __init__(self, stream_url, base_delay=None, max_delay=None, max_attempts=None, stop_event=None,
+                 properties=None):
+        """A frame source that reopens itself after a failed read
+
+        Retries wait base_delay * 2**attempt seconds, capped at max_delay and jittered to between
+        half and all of that, so cameras that dropped together do not reconnect in lockstep.
+        max_attempts consecutive failed reopens (0 = keep trying) give up. Settings default to
+        SOURCE_RECONNECT_BASE, SOURCE_RECONNECT_MAX and SOURCE_RECONNECT_ATTEMPTS. Setting
+        stop_event (or calling close()) interrupts a backoff wait. properties are cv2.CAP_PROP_*
+        settings for device, stream and file captures, re-applied after every reconnect.
+
+        Only the thread reading from the source may release() it; other threads close() it,
+        which makes that thread's read() return (False, None) so it can release the source itself.
+        """
+        self.stream_url = stream_url
+        self.source = create_source(stream_url)
+        self.source.properties = dict(properties or {})
+        self.base_delay = float(base_delay if base_delay is not None else os.getenv('SOURCE_RECONNECT_BASE', '0.5'))
+        self.max_delay = float(max_delay if max_delay is not None else os.getenv('SOURCE_RECONNECT_MAX', '30'))
+        self.max_attempts = int(max_attempts if max_attempts is not None else os.getenv('SOURCE_RECONNECT_ATTEMPTS', '0'))
+        self.stop_event = stop_event or threading.Event()
+
+        self.state = 'idle'  # idle, streaming, backoff, finished, failed, closed
+        self.attempt = 0
+        self.frames = 0
+        self.opens = 0
+        self.open_failures = 0
+        self.read_failures = 0
+        self.disconnects = 0
+        self.reconnects = 0
+        self.downtime = 0.0
+        self.disconnected_at = None
+        self.connected_at = None
+        self.last_frame_at = None
+        self.next_retry_at = None
+        self.last_error = None
+
+    @property
+    def kind(self):
+        return self.source.kind
+
+    def open(self, retry=True):
+        """First connection attempt
+
+        A device or stream that is down is retried with backoff by read(), like a dropped one,
+        unless retry is False. Returns False if the source cannot be opened and is not retried.
+        """
+        if self.source.open():
+            self.opens += 1
+            self.state = 'streaming'
+            self.connected_at = time.time()
+            return True
+        self.open_failures += 1
+        self.last_error = 'open failed'
+        if not retry or not self.source.transient:
+            self.state = 'failed'
+            return False
+        print(f"[SOURCE] Could not open {self.source.kind} source {self.stream_url}, retrying")
+        self.state = 'backoff'
+        self.disconnected_at = time.time()
+        return True
+
+    def backoff(self, attempt):
+        """Jittered exponential delay before reconnect attempt number attempt (0-based)"""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+
+    def read(self):
+        """Next frame, reconnecting as needed; (False, None) once finished, given up or stopped"""
+        while not self.stop_event.is_set():
+            if self.state == 'streaming':
+                ok, frame = self.source.read()
+                if ok:
+                    self.frames += 1
+                    self.attempt = 0
+                    self.last_frame_at = time.time()
+                    return True, frame
+                self.source.close()
+                if self.source.finished:
+                    self.state = 'finished'
+                    return False, None
+                self.read_failures += 1
+                self.disconnects += 1
+                self.disconnected_at = time.time()
+                self.last_error = 'read failed'
+                print(f"[SOURCE] Lost {self.source.kind} source {self.stream_url}, reconnecting")
+            elif self.state != 'backoff':
+                return False, None
+
+            if self.max_attempts and self.attempt >= self.max_attempts:
+                self.state = 'failed'
+                print(f"[SOURCE] Giving up on {self.stream_url} after {self.attempt} reconnect attempts")
+                return False, None
+            delay = self.backoff(self.attempt)
+            self.state = 'backoff'
+            self.next_retry_at = time.time() + delay
+            if self.stop_event.wait(delay):
+                break
+            self.attempt += 1
+            if self.source.open():
+                self.opens += 1
+                self.reconnects += 1
+                self.state = 'streaming'
+                self.connected_at = time.time()
+                if self.disconnected_at:
+                    self.downtime += self.connected_at - self.disconnected_at
+                    print(f"[SOURCE] Reconnected {self.stream_url} after {self.connected_at - self.disconnected_at:.1f}s")
+                self.disconnected_at = None
+                self.next_retry_at = None
+            else:
+                self.open_failures += 1
+                self.last_error = 'reconnect failed'
+        return False, None
+
+    def close(self):
+        """Stop reading from any thread; the reading thread's read() returns and it releases the source"""
+        self.stop_event.set()
+
+    def release(self):
+        """Release the underlying source (reading thread only)"""
+        self.stop_event.set()
+        self.source.close()
+        if self.state in ('streaming', 'backoff'):
+            self.state = 'closed'
+
+    def get_stats(self):
+        """Health of this source: state, reconnects, downtime and frame freshness"""
+        now = time.time()
+        downtime = self.downtime + (now - self.disconnected_at if self.disconnected_at else 0)
+        return {
+            'kind': self.source.kind,
+            'state': self.state,
+            'frames': self.frames,
+            'opens': self.opens,
+            'open_failures': self.open_failures,
+            'read_failures': self.read_failures,
+            'disconnects': self.disconnects,
+            'reconnects': self.reconnects,
+            'reconnect_attempt': self.attempt,
+            'downtime_seconds': downtime,
+            'connected_for': now - self.connected_at if self.state == 'streaming' and self.connected_at else None,
+            'seconds_since_frame': now - self.last_frame_at if self.last_frame_at else None,
+            'next_retry_in': max(0.0, self.next_retry_at - now) if self.state == 'backoff' and self.next_retry_at else None,
+            'last_error': self.last_error
+        }
+
+
+def open_first(stream_urls, **settings):
+    """Open the first of several candidate sources that delivers a frame; (source, first_frame) or (None, None)
+
+    A single candidate that is down is kept and retried with backoff (first_frame is then None).
+    """
+    if len(stream_urls) == 1:
+        source = ReconnectingSource(stream_urls[0], **settings)
+        if source.open():
+            return source, None
+        source.release()
+        return None, None
+    for stream_url in stream_urls:
+        source = ReconnectingSource(stream_url, **settings)
+        if source.open(retry=False):
+            ok, frame = source.source.read()
+            if ok:
+                source.frames += 1
+                source.last_frame_at = time.time()
+                return source, frame
+        source.release()
+    return None, None
@@ -6,120 +6,50 @@ Uses OpenCV Haar cascades for human detection (no TensorFlow required)
 
 import os
 import cv2
-import numpy as np
 import threading
 import time
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_socketio import SocketIO, emit
-import base64
-import logging
+import json
+from rate_control import AnalysisRateController
+from metrics import registry, render_metrics, process_stats
+from tracing import tracer, traced, chrome_trace
+from camera_rooms import CameraRooms, parse_subscription
+from alert_encoding import ENCODING_VERSION, client_encoding
+from frame_sources import open_first
+from human_detector import HumanDetector
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Camera alerts go only to clients subscribed to that camera (or to all cameras)
+camera_rooms = CameraRooms(socketio)
+
 # Global variables
 active_cameras = {}
 detection_threads = {}
 detection_enabled = True
 camera_zones = {}  # Store zones for each camera
-
-class HumanDetector:
-    def __init__(self):
-        """Initialize human detection using OpenCV Haar cascades"""
-        try:
-            # Load Haar cascade for human detection
-            self.human_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_fullbody.xml')
-            self.person_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_upperbody.xml')
-            
-            # If fullbody cascade is not available, try alternative
-            if self.human_cascade.empty():
-                print("⚠️ Full body cascade not found, using upper body cascade")
-                self.human_cascade = self.person_cascade
-            
-            print("✅ Human detection cascades loaded successfully")
-            
-        except Exception as e:
-            print(f"❌ Error loading detection cascades: {e}")
-            self.human_cascade = None
-            self.person_cascade = None
-    
-    def detect_humans(self, frame):
-        """Detect humans in the frame using Haar cascades"""
-        try:
-            if self.human_cascade is None:
-                return False, 0, []
-            
-            # Convert to grayscale for detection
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
-            # Detect humans
-            humans = self.human_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30),
-                flags=cv2.CASCADE_SCALE_IMAGE
-            )
-            
-            # Also try upper body detection for better coverage
-            if self.person_cascade is not None:
-                upper_bodies = self.person_cascade.detectMultiScale(
-                    gray,
-                    scaleFactor=1.1,
-                    minNeighbors=5,
-                    minSize=(30, 30)
-                )
-                
-                # Combine detections
-                all_detections = list(humans) + list(upper_bodies)
-                humans = np.array(all_detections)
-            
-            if len(humans) > 0:
-                return True, len(humans), humans
-            else:
-                return False, 0, []
-                
-        except Exception as e:
-            print(f"Human detection error: {e}")
-            return False, 0, []
-    
-    def detect_motion(self, frame, previous_frame):
-        """Detect motion between frames"""
-        try:
-            if previous_frame is None:
-                return False, 0
-            
-            # Convert to grayscale
-            gray1 = cv2.cvtColor(previous_frame, cv2.COLOR_BGR2GRAY)
-            gray2 = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
-            # Calculate frame difference
-            diff = cv2.absdiff(gray1, gray2)
-            
-            # Apply threshold
-            _, thresh = cv2.threshold(diff, 30, 255, cv2.THRESH_BINARY)
-            
-            # Find contours
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            motion_area = 0
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area > 500:  # Minimum area threshold
-                    motion_area += area
-            
-            return motion_area > 1000, motion_area
-            
-        except Exception as e:
-            print(f"Motion detection error: {e}")
-            return False, 0
+camera_streams = {}  # camera_id -> ReconnectingSource, closed to stop its camera thread (which releases it)
 
 # Initialize detector
 detector = HumanDetector()
 
+# Analysis cadence per camera: fast while people/motion are around, slow on static scenes
+rate_controller = AnalysisRateController(active_interval=0.3)
+
+def close_camera_stream(camera_id):
+    """Stop a camera's source, ending any reconnect backoff it is waiting in
+
+    Only signals the camera thread: it may be inside a read on the capture, so it releases the source itself.
+    """
+    source = camera_streams.pop(camera_id, None)
+    if source:
+        source.close()
+
 def process_camera_stream(camera_id, stream_url):
     """Process camera stream for human detection with zone support"""
     global detection_enabled
@@ -127,55 +57,44 @@ def process_camera_stream(camera_id, stream_url):
     print(f"🎥 Starting human detection for camera {camera_id}")
     
     # Try multiple camera sources
-    cap = None
     camera_sources = []
     
     # Add different camera sources to try
-    if stream_url.isdigit():
-        camera_sources.append(int(stream_url))
-    elif stream_url.startswith('http'):
+    if stream_url.isdigit() or '://' in stream_url or os.path.exists(stream_url):
         camera_sources.append(stream_url)
     else:
         # Try default cameras
-        camera_sources.extend([0, 1, 2])  # Try cameras 0, 1, 2
+        camera_sources.extend(['0', '1', '2'])  # Try cameras 0, 1, 2
     
-    # Try to open camera from different sources
-    for source in camera_sources:
-        print(f"🔍 Trying camera source: {source}")
-        cap = cv2.VideoCapture(source)
-        
-        # Test if camera works by trying to read a frame
-        if cap.isOpened():
-            ret, test_frame = cap.read()
-            if ret and test_frame is not None:
-                print(f"✅ Camera {camera_id} opened successfully from source {source}")
-                break
-            else:
-                cap.release()
-                cap = None
-        else:
-            cap.release()
-            cap = None
+    # Open the first source that delivers a frame; a dropped source is reopened with backoff
+    source, _ = open_first(camera_sources, properties={
+        cv2.CAP_PROP_FRAME_WIDTH: 640,
+        cv2.CAP_PROP_FRAME_HEIGHT: 480,
+        cv2.CAP_PROP_FPS: 30
+    })
     
-    if cap is None or not cap.isOpened():
+    if source is None:
         print(f"❌ Failed to open any camera for {camera_id}")
         # Send error notification
-        socketio.emit('camera_error', {
+        camera_rooms.publish('camera_error', {
             'camera_id': camera_id,
             'error': 'No accessible camera found',
             'timestamp': datetime.now().isoformat()
         })
         return
+    print(f"✅ Camera {camera_id} opened successfully from source {source.stream_url}")
+    camera_streams[camera_id] = source
+    if camera_id not in active_cameras:
+        # Removed while the source was opening
+        close_camera_stream(camera_id)
     
-    # Set camera properties for better performance
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    cap.set(cv2.CAP_PROP_FPS, 30)
+    # Emits are timed as their own stage when tracing is on
+    publish = traced('emit')(camera_rooms.publish)
+    tracer.set_context(camera_id)
     
     previous_frame = None
     frame_count = 0
-    consecutive_failures = 0
-    max_failures = 10
+    last_analysis = 0
     
     # Get detection zone for this camera (default if not set)
     detection_zone = camera_zones.get(camera_id, {
@@ -185,95 +104,96 @@ def process_camera_stream(camera_id, stream_url):
         'height': 300  # Height of zone
     })
     
-    while detection_enabled and camera_id in active_cameras:
-        ret, frame = cap.read()
-        if not ret or frame is None:
-            consecutive_failures += 1
-            print(f"❌ Failed to read frame from camera {camera_id} (attempt {consecutive_failures})")
-            
-            if consecutive_failures >= max_failures:
-                print(f"❌ Too many failures, stopping camera {camera_id}")
-                socketio.emit('camera_error', {
-                    'camera_id': camera_id,
-                    'error': 'Camera stopped responding',
-                    'timestamp': datetime.now().isoformat()
-                })
+    try:
+        while detection_enabled and camera_id in active_cameras:
+            with tracer.span('read'):
+                ret, frame = source.read()
+            if not ret:
+                # The source only gives up when it finished or ran out of reconnect attempts
+                if source.state in ('failed', 'finished'):
+                    print(f"❌ Camera {camera_id} source {source.state}, stopping")
+                    publish('camera_error', {
+                        'camera_id': camera_id,
+                        'error': 'Camera stopped responding' if source.state == 'failed' else 'Camera source ended',
+                        'timestamp': datetime.now().isoformat()
+                    })
                 break
-            
-            time.sleep(0.5)
-            continue
-        
-        # Reset failure counter on successful read
-        consecutive_failures = 0
         
-        # Resize frame for processing
-        frame = cv2.resize(frame, (640, 480))
-        frame_count += 1
+            # Resize frame for processing
+            with tracer.span('resize'):
+                frame = cv2.resize(frame, (640, 480))
+            frame_count += 1
         
-        # Run detection every 3 frames to reduce CPU load
-        if frame_count % 3 == 0:
-            detections = {}
+            # Run detection when this camera's adaptive interval has elapsed
+            if time.time() - last_analysis >= rate_controller.interval_for(camera_id):
+                last_analysis = time.time()
+                detections = {}
+            
+                # Extract detection zone from frame
+                zone_frame = frame[detection_zone['y']:detection_zone['y']+detection_zone['height'],
+                                  detection_zone['x']:detection_zone['x']+detection_zone['width']]
             
-            # Extract detection zone from frame
-            zone_frame = frame[detection_zone['y']:detection_zone['y']+detection_zone['height'],
-                              detection_zone['x']:detection_zone['x']+detection_zone['width']]
+                # Motion detection in the zone
+                zone_previous = None
+                if previous_frame is not None:
+                    zone_previous = previous_frame[detection_zone['y']:detection_zone['y']+detection_zone['height'],
+                                                 detection_zone['x']:detection_zone['x']+detection_zone['width']]
             
-            # Human detection in the zone
-            humans_detected, human_count, human_boxes = detector.detect_humans(zone_frame)
-            if humans_detected:
-                detections['human'] = {
-                    'detected': True,
-                    'confidence': min(human_count * 0.3, 1.0),
-                    'count': human_count,
-                    'zone': detection_zone,
-                    'timestamp': datetime.now().isoformat()
-                }
-                print(f"👤 Detected {human_count} human(s) in detection zone of camera {camera_id}")
+                # Human detection in the zone (cascades only run where something moved)
+                humans_detected, human_count, human_boxes = detector.detect_humans(zone_frame, zone_previous)
+                if humans_detected:
+                    detections['human'] = {
+                        'detected': True,
+                        'confidence': min(human_count * 0.3, 1.0),
+                        'count': human_count,
+                        'zone': detection_zone,
+                        'timestamp': datetime.now().isoformat()
+                    }
+                    print(f"👤 Detected {human_count} human(s) in detection zone of camera {camera_id}")
                 
-                # Send beep notification
-                socketio.emit('zone_alert', {
-                    'camera_id': camera_id,
-                    'alert_type': 'human_detected',
-                    'count': human_count,
-                    'confidence': detections['human']['confidence'],
-                    'zone': detection_zone,
-                    'timestamp': datetime.now().isoformat()
-                })
+                    # Send beep notification
+                    publish('zone_alert', {
+                        'camera_id': camera_id,
+                        'alert_type': 'human_detected',
+                        'count': human_count,
+                        'confidence': detections['human']['confidence'],
+                        'zone': detection_zone,
+                        'timestamp': datetime.now().isoformat()
+                    })
             
-            # Motion detection in the zone
-            zone_previous = None
-            if previous_frame is not None:
-                zone_previous = previous_frame[detection_zone['y']:detection_zone['y']+detection_zone['height'],
-                                             detection_zone['x']:detection_zone['x']+detection_zone['width']]
+                motion_detected, motion_area = detector.detect_motion(zone_frame, zone_previous)
+                if motion_detected:
+                    detections['motion'] = {
+                        'detected': True,
+                        'confidence': min(motion_area / 10000, 1.0),
+                        'area': motion_area,
+                        'zone': detection_zone,
+                        'timestamp': datetime.now().isoformat()
+                    }
+                    print(f"🏃 Motion detected in zone of camera {camera_id} (area: {motion_area})")
             
-            motion_detected, motion_area = detector.detect_motion(zone_frame, zone_previous)
-            if motion_detected:
-                detections['motion'] = {
-                    'detected': True,
-                    'confidence': min(motion_area / 10000, 1.0),
-                    'area': motion_area,
-                    'zone': detection_zone,
-                    'timestamp': datetime.now().isoformat()
-                }
-                print(f"🏃 Motion detected in zone of camera {camera_id} (area: {motion_area})")
+                # Send detections via WebSocket
+                if detections:
+                    publish('detection_alert', {
+                        'camera_id': camera_id,
+                        'detections': detections,
+                        'timestamp': datetime.now().isoformat(),
+                        'zone_based': True
+                    })
+                    print(f"🚨 Zone detection alert sent for camera {camera_id}: {list(detections.keys())}")
             
-            # Send detections via WebSocket
-            if detections:
-                socketio.emit('detection_alert', {
-                    'camera_id': camera_id,
-                    'detections': detections,
-                    'timestamp': datetime.now().isoformat(),
-                    'zone_based': True
-                })
-                print(f"🚨 Zone detection alert sent for camera {camera_id}: {list(detections.keys())}")
-        
-        previous_frame = frame.copy()
-        
-        # Small delay to prevent overwhelming the system
-        time.sleep(0.1)
-    
-    if cap:
-        cap.release()
+                analysis_seconds = time.time() - last_analysis
+                registry.observe('secureeye_frame_analysis_seconds', (('camera_id', str(camera_id)),), analysis_seconds)
+                rate_controller.record(camera_id, analysis_seconds, bool(detections))
+            
+                # Compare the next analysis against this one, however far apart they are
+                previous_frame = frame.copy()
+    finally:
+        rate_controller.remove(camera_id)
+        if camera_streams.get(camera_id) is source:
+            del camera_streams[camera_id]
+        # Released here, by the thread that reads it, never by the request that stopped the camera
+        source.release()
     print(f"🛑 Stopped human detection for camera {camera_id}")
 
 @app.route('/api/health', methods=['GET'])
@@ -295,6 +215,67 @@ def get_cameras():
         'count': len(active_cameras)
     })
 
+@app.route('/api/cameras/rates', methods=['GET'])
+def get_camera_rates():
+    """Get the current adaptive analysis rate of each camera"""
+    return jsonify({
+        'rates': rate_controller.get_stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/rooms', methods=['GET'])
+def get_room_stats():
+    """Get Socket.IO subscriber counts per camera room"""
+    stats = camera_rooms.get_stats()
+    stats['timestamp'] = datetime.now().isoformat()
+    return jsonify(stats)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint: detector latency, emits and process usage"""
+    stats = process_stats()
+    labels = (('process', 'main'),)
+    gauges = [(
+        'secureeye_emits_total', (('event', event),), count, 'counter', 'Socket.IO events published'
+    ) for event, count in camera_rooms.get_stats()['emitted'].items()]
+    for camera_id, source in list(camera_streams.items()):
+        source_stats = source.get_stats()
+        camera = (('camera_id', str(camera_id)),)
+        gauges += [
+            ('secureeye_source_up', camera, 1 if source_stats['state'] == 'streaming' else 0, 'gauge',
+             'Whether the camera source is currently delivering'),
+            ('secureeye_source_reconnects_total', camera, source_stats['reconnects'], 'counter',
+             'Successful source reconnects'),
+            ('secureeye_source_downtime_seconds_total', camera, source_stats['downtime_seconds'], 'counter',
+             'Time spent disconnected')
+        ]
+    gauges += [
+        ('secureeye_process_cpu_seconds_total', labels, stats['cpu_seconds'], 'counter', 'User and system CPU time'),
+        ('secureeye_process_resident_memory_bytes', labels, stats['rss_bytes'], 'gauge', 'Resident memory')
+    ]
+    text = render_metrics(registry.snapshot(), gauges, registry.descriptions)
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/trace', methods=['GET'])
+def get_trace():
+    """Dump the last `seconds` (default 10) of stage spans as Chrome trace JSON"""
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        return jsonify({'error': 'seconds must be a number'}), 400
+    trace = chrome_trace({(os.getpid(), 'main'): tracer.collect(seconds)})
+    return Response(json.dumps(trace), mimetype='application/json',
+                    headers={'Content-Disposition': 'attachment; filename=secureeye-trace.json'})
+
+@app.route('/api/trace', methods=['POST'])
+def set_tracing():
+    """Turn stage tracing on or off: {"enabled": true}"""
+    data = request.get_json(silent=True) or {}
+    if 'enabled' not in data:
+        return jsonify({'error': 'enabled is required'}), 400
+    tracer.set_enabled(data['enabled'])
+    return jsonify(tracer.get_stats())
+
 @app.route('/api/cameras', methods=['POST'])
 def add_camera():
     """Add a new camera for monitoring"""
@@ -341,6 +322,7 @@ def remove_camera(camera_id):
     # Stop detection thread
     if camera_id in detection_threads:
         del detection_threads[camera_id]
+    close_camera_stream(camera_id)
     
     return jsonify({
         'message': 'Camera removed successfully',
@@ -348,15 +330,34 @@ def remove_camera(camera_id):
     })
 
 @socketio.on('connect')
-def handle_connect():
-    """Handle client connection"""
+def handle_connect(auth=None):
+    """Handle client connection and negotiate its alert encoding (JSON unless it asks for msgpack)"""
     print(f'🔌 Client connected: {request.sid}')
-    emit('status', {'message': 'Connected to SecureEye Human Detection backend'})
+    encoding = client_encoding(auth, request.args)
+    camera_rooms.connect(request.sid, encoding)
+    emit('status', {
+        'message': 'Connected to SecureEye Human Detection backend',
+        'encoding': encoding,
+        'encoding_version': ENCODING_VERSION
+    })
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
     print(f'🔌 Client disconnected: {request.sid}')
+    camera_rooms.disconnect(request.sid)
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """Receive alerts for {camera_ids: [...]} or {camera_id} or, with {all: true}, every camera"""
+    camera_ids, all_cameras = parse_subscription(data)
+    emit('subscribed', {'rooms': camera_rooms.subscribe(request.sid, camera_ids, all_cameras)})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Stop receiving alerts for the given cameras (or, with {all: true}, the all-cameras room)"""
+    camera_ids, all_cameras = parse_subscription(data)
+    emit('subscribed', {'rooms': camera_rooms.unsubscribe(request.sid, camera_ids, all_cameras)})
 
 @socketio.on('start_detection')
 def handle_start_detection(data):
@@ -394,6 +395,7 @@ def handle_stop_detection(data):
         del active_cameras[camera_id]
         if camera_id in detection_threads:
             del detection_threads[camera_id]
+        close_camera_stream(camera_id)
         emit('detection_stopped', {'camera_id': camera_id})
         print(f'🛑 Human detection stopped for camera {camera_id}')
     else:
@@ -421,6 +423,10 @@ if __name__ == '__main__':
     print("📡 Available endpoints:")
     print("   - GET /api/health - Health check")
     print("   - GET /api/cameras - List cameras")
+    print("   - GET /api/cameras/rates - Adaptive analysis rate per camera")
+    print("   - GET /api/rooms - Alert subscribers per camera room")
+    print("   - GET /api/metrics - Prometheus metrics")
+    print("   - GET/POST /api/trace - Stage trace dump (Chrome trace JSON) / enable tracing")
     print("   - POST /api/cameras - Add camera")
     print("   - DELETE /api/cameras/<id> - Remove camera")
     print("")
@@ -428,6 +434,7 @@ if __name__ == '__main__':
     print("   - start_detection - Start monitoring camera")
     print("   - stop_detection - Stop monitoring camera")
     print("   - detection_alert - Receive detection alerts")
+    print("   - subscribe / unsubscribe - Choose cameras to receive alerts for")
     print("")
     print("👤 Detection Features:")
     print("   - Human detection using Haar cascades")
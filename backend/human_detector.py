@@ -0,0 +1,187 @@
+"""
+SecureEye human detector
+OpenCV Haar cascades for people, run only around moving blobs (no TensorFlow required)
+"""
+
+import os
+import cv2
+from metrics import timed_detector
+from tracing import traced
+
+# 'motion' runs the cascades only around moving blobs, 'full' scans the whole zone
+HUMAN_DETECTION_MODE = os.getenv('HUMAN_DETECTION_MODE', 'motion')
+
+
+def merge_boxes(boxes, min_overlap=0.3):
+    """Merge (x, y, w, h) boxes that overlap by more than min_overlap of the smaller box"""
+    merged = [list(box) for box in boxes]
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(merged)):
+            for j in range(i + 1, len(merged)):
+                ax, ay, aw, ah = merged[i]
+                bx, by, bw, bh = merged[j]
+                ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+                iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+                smaller = min(aw * ah, bw * bh)
+                if smaller > 0 and ix * iy > min_overlap * smaller:
+                    x0, y0 = min(ax, bx), min(ay, by)
+                    x1, y1 = max(ax + aw, bx + bw), max(ay + ah, by + bh)
+                    merged[i] = [x0, y0, x1 - x0, y1 - y0]
+                    del merged[j]
+                    changed = True
+                    break
+            if changed:
+                break
+    return [tuple(box) for box in merged]
+
+
+class HumanDetector:
+    def __init__(self, mode=HUMAN_DETECTION_MODE):
+        """Initialize human detection using OpenCV Haar cascades"""
+        self.mode = mode
+        self.region_padding = 24       # Context kept around each motion blob
+        self.min_region_size = (64, 128)  # Smallest window handed to the cascades (w, h)
+        self.min_blob_area = 200       # Ignore blobs smaller than this (noise)
+        self.skipped_frames = 0        # Frames where the cascades did not run at all
+        try:
+            # Load Haar cascade for human detection
+            self.human_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_fullbody.xml')
+            self.person_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_upperbody.xml')
+            
+            # If fullbody cascade is not available, try alternative
+            if self.human_cascade.empty():
+                print("⚠️ Full body cascade not found, using upper body cascade")
+                self.human_cascade = self.person_cascade
+            
+            print("✅ Human detection cascades loaded successfully")
+            
+        except Exception as e:
+            print(f"❌ Error loading detection cascades: {e}")
+            self.human_cascade = None
+            self.person_cascade = None
+    
+    def motion_regions(self, gray, previous_gray):
+        """Padded bounding boxes of moving blobs, merged where they overlap"""
+        diff = cv2.absdiff(gray, previous_gray)
+        _, thresh = cv2.threshold(diff, 30, 255, cv2.THRESH_BINARY)
+        thresh = cv2.dilate(thresh, None, iterations=2)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        frame_h, frame_w = gray.shape[:2]
+        min_w, min_h = self.min_region_size
+        pad = self.region_padding
+        regions = []
+        for contour in contours:
+            if cv2.contourArea(contour) < self.min_blob_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            
+            # Pad the blob and grow it to the smallest useful cascade window
+            cx, cy = x + w / 2, y + h / 2
+            w = max(w + 2 * pad, min_w)
+            h = max(h + 2 * pad, min_h)
+            x0 = int(max(0, cx - w / 2))
+            y0 = int(max(0, cy - h / 2))
+            x1 = int(min(frame_w, cx + w / 2))
+            y1 = int(min(frame_h, cy + h / 2))
+            if x1 > x0 and y1 > y0:
+                regions.append((x0, y0, x1 - x0, y1 - y0))
+        
+        return merge_boxes(regions, min_overlap=0.0)
+    
+    def _run_cascades(self, gray):
+        """Run both cascades on a grayscale image and return their raw boxes"""
+        boxes = list(self.human_cascade.detectMultiScale(
+            gray,
+            scaleFactor=1.1,
+            minNeighbors=5,
+            minSize=(30, 30),
+            flags=cv2.CASCADE_SCALE_IMAGE
+        ))
+        
+        # Also try upper body detection for better coverage
+        if self.person_cascade is not None and self.person_cascade is not self.human_cascade:
+            boxes += list(self.person_cascade.detectMultiScale(
+                gray,
+                scaleFactor=1.1,
+                minNeighbors=5,
+                minSize=(30, 30)
+            ))
+        return [tuple(int(v) for v in box) for box in boxes]
+    
+    @timed_detector('detect_humans')
+    @traced('detect_humans')
+    def detect_humans(self, frame, previous_frame=None):
+        """Detect humans in the frame using Haar cascades
+
+        In 'motion' mode with a previous frame, the cascades only scan padded regions around
+        moving blobs and are skipped when nothing moves. Boxes are in frame coordinates.
+        """
+        try:
+            if self.human_cascade is None:
+                return False, 0, []
+            
+            # Convert to grayscale for detection
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            
+            if self.mode == 'motion' and previous_frame is not None and previous_frame.shape == frame.shape:
+                previous_gray = cv2.cvtColor(previous_frame, cv2.COLOR_BGR2GRAY)
+                regions = self.motion_regions(gray, previous_gray)
+                if not regions:
+                    self.skipped_frames += 1
+                    return False, 0, []
+                
+                # Detect humans per region and map boxes back to frame coordinates
+                detections = []
+                for rx, ry, rw, rh in regions:
+                    for x, y, w, h in self._run_cascades(gray[ry:ry+rh, rx:rx+rw]):
+                        detections.append((x + rx, y + ry, w, h))
+            else:
+                detections = self._run_cascades(gray)
+            
+            # Full-body and upper-body hits on the same person become one box
+            humans = merge_boxes(detections)
+            
+            if len(humans) > 0:
+                return True, len(humans), humans
+            else:
+                return False, 0, []
+                
+        except Exception as e:
+            print(f"Human detection error: {e}")
+            return False, 0, []
+    
+    @timed_detector('detect_motion')
+    @traced('detect_motion')
+    def detect_motion(self, frame, previous_frame):
+        """Detect motion between frames"""
+        try:
+            if previous_frame is None:
+                return False, 0
+            
+            # Convert to grayscale
+            gray1 = cv2.cvtColor(previous_frame, cv2.COLOR_BGR2GRAY)
+            gray2 = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            
+            # Calculate frame difference
+            diff = cv2.absdiff(gray1, gray2)
+            
+            # Apply threshold
+            _, thresh = cv2.threshold(diff, 30, 255, cv2.THRESH_BINARY)
+            
+            # Find contours
+            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            
+            motion_area = 0
+            for contour in contours:
+                area = cv2.contourArea(contour)
+                if area > 500:  # Minimum area threshold
+                    motion_area += area
+            
+            return motion_area > 1000, motion_area
+            
+        except Exception as e:
+            print(f"Motion detection error: {e}")
+            return False, 0
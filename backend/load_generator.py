@@ -0,0 +1,87 @@
+"""
+SecureEye alert load generator
+Publishes synthetic zone alerts at a fixed rate so Socket.IO fan-out can be measured without cameras
+"""
+
+import itertools
+import threading
+import time
+from datetime import datetime
+
+
+class AlertLoadGenerator:
+    def __init__(self, publish):
+        """publish(event, payload) is the same callback the camera pipelines use"""
+        self.publish = publish
+        self.lock = threading.Lock()
+        self.thread = None
+        self.run_ids = itertools.count(1)
+        self.stats = {}
+
+    def start(self, rate, duration, camera_ids, event='zone_alert'):
+        """Emit rate alerts/second for duration seconds, cycling through camera_ids; returns the run id"""
+        if rate <= 0 or duration <= 0:
+            raise ValueError('rate and duration must be positive')
+        if not camera_ids:
+            raise ValueError('At least one camera_id is required')
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                raise RuntimeError('A load run is already in progress')
+            run_id = next(self.run_ids)
+            self.stats = {'run_id': run_id, 'running': True, 'rate': rate, 'duration': duration,
+                          'cameras': len(camera_ids), 'event': event, 'emitted': 0, 'behind': 0,
+                          'emit_seconds': []}
+            self.thread = threading.Thread(target=self._run, args=(run_id, rate, duration, list(camera_ids), event),
+                                           name='alert-load')
+            self.thread.daemon = True
+            self.thread.start()
+        return run_id
+
+    def _run(self, run_id, rate, duration, camera_ids, event):
+        interval = 1.0 / rate
+        started = time.time()
+        total = int(rate * duration)
+        emit_seconds = self.stats['emit_seconds']
+        for seq in range(total):
+            # Absolute schedule: a slow emit makes the next one late instead of shifting the rest
+            due = started + seq * interval
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -interval:
+                self.stats['behind'] += 1
+
+            camera_id = camera_ids[seq % len(camera_ids)]
+            payload = {
+                'camera_id': camera_id,
+                'alert_type': 'motion_detected',
+                'phase': 'started',
+                'alert_id': f"load-{run_id}-{seq}",
+                'count': 1,
+                'confidence': 0.9,
+                'zone': {'name': 'load', 'x': 0, 'y': 0, 'width': 640, 'height': 480},
+                'beep': False,
+                'message': 'Load test alert',
+                'load_run': run_id,
+                'load_seq': seq,
+                'timestamp': datetime.now().isoformat()
+            }
+            emit_started = time.perf_counter()
+            self.publish(event, payload)
+            emit_seconds.append(time.perf_counter() - emit_started)
+            self.stats['emitted'] += 1
+
+        self.stats['running'] = False
+        self.stats['elapsed'] = time.time() - started
+
+    def get_stats(self):
+        """Progress of the current (or last) run, with the server-side cost of each publish call"""
+        stats = dict(self.stats)
+        emit_seconds = sorted(stats.pop('emit_seconds', []))
+        if emit_seconds:
+            stats['emit_ms_p50'] = emit_seconds[len(emit_seconds) // 2] * 1000
+            stats['emit_ms_p99'] = emit_seconds[min(len(emit_seconds) - 1, int(len(emit_seconds) * 0.99))] * 1000
+            stats['emit_ms_max'] = emit_seconds[-1] * 1000
+        if stats.get('elapsed'):
+            stats['achieved_rate'] = stats['emitted'] / stats['elapsed']
+        return stats
@@ -0,0 +1,191 @@
+"""
+SecureEye metrics
+Lock-free per-thread counters and latency histograms rendered in Prometheus text exposition format
+"""
+
+import functools
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Seconds; detector calls range from sub-millisecond ROI checks to full-frame cascades
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Counters and histograms that each thread updates in its own shard
+
+        Recording never takes a lock: a thread only ever writes its own shard, and a scrape
+        sums all shards. A scrape may miss an update that is in flight, never corrupt one.
+        """
+        self.buckets = tuple(buckets)
+        self.local = threading.local()
+        self.shards = []
+        self.shards_lock = threading.Lock()  # Only taken when a thread records its first metric
+        self.descriptions = {}  # name -> (type, help)
+
+    def describe(self, name, metric_type, help_text):
+        """Set the # TYPE and # HELP lines for a metric"""
+        self.descriptions[name] = (metric_type, help_text)
+
+    def _shard(self):
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = {'counters': {}, 'histograms': {}}
+            self.local.shard = shard
+            with self.shards_lock:
+                self.shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        """Add value to a counter; labels is a tuple of (key, value) pairs"""
+        counters = self._shard()['counters']
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        """Record one latency sample in a histogram"""
+        histograms = self._shard()['histograms']
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = [[0] * (len(self.buckets) + 1), 0.0]  # per-bucket counts (+Inf last), sum
+            histograms[key] = histogram
+        index = 0
+        for bound in self.buckets:
+            if seconds <= bound:
+                break
+            index += 1
+        histogram[0][index] += 1
+        histogram[1] += seconds
+
+    def timed(self, name, **labels):
+        """Decorator recording each call's duration in histogram name"""
+        label_items = tuple(sorted(labels.items()))
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(name, label_items, time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        """Drop every shard, e.g. in a forked child that inherited the parent's samples"""
+        with self.shards_lock:
+            self.local = threading.local()
+            self.shards = []
+
+    def snapshot(self):
+        """Summed counters and histograms as plain (picklable) dicts"""
+        with self.shards_lock:
+            shards = list(self.shards)
+        counters = {}
+        histograms = {}
+        for shard in shards:
+            for key, value in list(shard['counters'].items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, (counts, total) in list(shard['histograms'].items()):
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+        return {'counters': counters, 'histograms': histograms, 'buckets': self.buckets}
+
+
+def merge_snapshots(snapshots):
+    """Sum snapshots from several processes (all must use the same buckets)"""
+    counters, histograms, buckets = {}, {}, DEFAULT_BUCKETS
+    for snapshot in snapshots:
+        if not snapshot:
+            continue
+        buckets = snapshot['buckets']
+        for key, value in snapshot['counters'].items():
+            counters[key] = counters.get(key, 0) + value
+        for key, (counts, total) in snapshot['histograms'].items():
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+    return {'counters': counters, 'histograms': histograms, 'buckets': buckets}
+
+
+def process_stats():
+    """CPU seconds and resident memory of this process (rss_bytes is None where it cannot be read)"""
+    if resource is None:
+        return {'cpu_seconds': time.process_time(), 'rss_bytes': None}
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    rss = usage.ru_maxrss * 1024  # Peak RSS in KiB on Linux, used if /proc is unavailable
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    return {'cpu_seconds': usage.ru_utime + usage.ru_stime, 'rss_bytes': rss}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(snapshot, gauges=(), descriptions=None):
+    """Prometheus text format for a snapshot plus extra (name, labels, value, type, help) samples"""
+    descriptions = descriptions or {}
+    families = {}  # name -> list of lines
+
+    def family(name, default_type, default_help):
+        if name not in families:
+            metric_type, help_text = descriptions.get(name, (default_type, default_help))
+            families[name] = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        return families[name]
+
+    for (name, labels), value in sorted(snapshot['counters'].items()):
+        family(name, 'counter', name).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    bounds = [repr(float(bound)) for bound in snapshot['buckets']] + ['+Inf']
+    for (name, labels), (counts, total) in sorted(snapshot['histograms'].items()):
+        lines = family(name, 'histogram', name)
+        cumulative = 0
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+    for name, labels, value, metric_type, help_text in gauges:
+        family(name, metric_type, help_text).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    return '\n'.join(line for lines in families.values() for line in lines) + '\n'
+
+
+# Process-wide registry used by the detectors and camera pipelines
+registry = MetricsRegistry()
+registry.describe('secureeye_detector_seconds', 'histogram', 'Detector call latency in seconds')
+registry.describe('secureeye_frame_analysis_seconds', 'histogram', 'Time to analyse one frame per camera in seconds')
+
+
+def timed_detector(name):
+    """Decorator adding a detector method's latency to secureeye_detector_seconds"""
+    return registry.timed('secureeye_detector_seconds', detector=name)
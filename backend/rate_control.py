@@ -0,0 +1,115 @@
+"""
+SecureEye adaptive analysis rate controller
+Runs busy cameras fast, static cameras slowly, and backs everyone off when detection exceeds its CPU budget
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class AnalysisRateController:
+    def __init__(self, active_interval=None, idle_interval=None, activity_hold=None,
+                 cpu_budget=None, max_backoff=10.0, load_window=2.0):
+        # Seconds between analysed frames while a camera has recent motion/alerts
+        self.active_interval = active_interval if active_interval is not None else float(os.getenv('ANALYSIS_INTERVAL', '0.1'))
+        # Seconds between analysed frames on a static scene
+        self.idle_interval = idle_interval if idle_interval is not None else float(os.getenv('IDLE_ANALYSIS_INTERVAL', '1.0'))
+        # How long a camera stays at the active rate after its last motion or alert
+        self.activity_hold = activity_hold if activity_hold is not None else float(os.getenv('ACTIVITY_HOLD_SECONDS', '10'))
+        # Detection seconds allowed per wall-clock second across all cameras (1.0 = one full core)
+        self.cpu_budget = cpu_budget if cpu_budget is not None else float(os.getenv('DETECTION_CPU_BUDGET', '0.8'))
+        self.max_backoff = max_backoff
+        self.load_window = load_window
+
+        self.lock = threading.Lock()
+        self.cameras = {}  # camera_id -> {'last_activity', 'last_cost', 'analysed'}
+        self.costs = deque()  # (finished_at, seconds) of recent detection runs
+        self.cost_total = 0.0
+
+    def _camera(self, camera_id):
+        """Per-camera state, created on first use (new cameras start active)"""
+        state = self.cameras.get(camera_id)
+        if state is None:
+            state = {'last_activity': time.time(), 'last_cost': 0.0, 'analysed': 0}
+            self.cameras[camera_id] = state
+        return state
+
+    def _trim(self, now):
+        """Forget detection runs older than the load window"""
+        while self.costs and now - self.costs[0][0] > self.load_window:
+            self.cost_total -= self.costs.popleft()[1]
+
+    def record(self, camera_id, detection_seconds, active):
+        """Record one analysed frame: how long detection took and whether it saw activity"""
+        now = time.time()
+        with self.lock:
+            state = self._camera(camera_id)
+            state['last_cost'] = detection_seconds
+            state['analysed'] += 1
+            if active:
+                state['last_activity'] = now
+            self.costs.append((now, detection_seconds))
+            self.cost_total += detection_seconds
+            self._trim(now)
+
+    def load(self):
+        """Detection seconds spent per wall-clock second over the load window"""
+        with self.lock:
+            self._trim(time.time())
+            return max(self.cost_total, 0.0) / self.load_window
+
+    def backoff(self):
+        """Global slow-down factor (>= 1) applied when detection exceeds the CPU budget"""
+        if self.cpu_budget <= 0:
+            return 1.0
+        return min(max(self.load() / self.cpu_budget, 1.0), self.max_backoff)
+
+    def _interval(self, last_activity, now, backoff):
+        """Interval of a camera last active at last_activity, under the given global backoff"""
+        idle_for = now - last_activity
+        if idle_for <= self.activity_hold:
+            base = self.active_interval
+        else:
+            # Ease down to the idle rate over one more hold period instead of jumping
+            progress = min((idle_for - self.activity_hold) / max(self.activity_hold, 1e-6), 1.0)
+            base = self.active_interval + (self.idle_interval - self.active_interval) * progress
+        return base * backoff
+
+    def interval_for(self, camera_id):
+        """Seconds to wait between analysed frames of this camera"""
+        with self.lock:
+            last_activity = self._camera(camera_id)['last_activity']
+        return self._interval(last_activity, time.time(), self.backoff())
+
+    def remove(self, camera_id):
+        """Forget a stopped camera"""
+        with self.lock:
+            self.cameras.pop(camera_id, None)
+
+    def get_stats(self):
+        """Current analysis rate of every camera plus the global load and backoff"""
+        backoff = self.backoff()
+        now = time.time()
+        with self.lock:
+            # Read-only snapshot: a poll must not bring back a camera remove() just dropped
+            states = {camera_id: dict(state) for camera_id, state in self.cameras.items()}
+        cameras = {}
+        for camera_id in states:
+            interval = self._interval(states[camera_id]['last_activity'], now, backoff)
+            idle_for = now - states[camera_id]['last_activity']
+            cameras[camera_id] = {
+                'interval': interval,
+                'rate_hz': 1.0 / interval if interval > 0 else None,
+                'state': 'active' if idle_for <= self.activity_hold else 'idle',
+                'seconds_since_activity': idle_for,
+                'last_detection_ms': states[camera_id]['last_cost'] * 1000,
+                'analysed_frames': states[camera_id]['analysed']
+            }
+        return {
+            'cameras': cameras,
+            'load': self.load(),
+            'cpu_budget': self.cpu_budget,
+            'backoff': backoff
+        }
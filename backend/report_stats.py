@@ -0,0 +1,17 @@
+"""
+SecureEye report helpers
+Percentiles and table formatting shared by the benchmark, scale harness and fan-out load test
+"""
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def fmt(value, pattern):
+    """Format a table cell, '-' for a missing value"""
+    return pattern.format(value) if value is not None else '-'
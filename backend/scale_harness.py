@@ -0,0 +1,293 @@
+"""
+SecureEye many-camera scale harness
+Adds N synthetic cameras through POST /api/cameras and measures alert latency, drops, CPU and memory as N grows
+
+    python scale_harness.py --spawn --cameras 10,50,200
+    python scale_harness.py --url http://localhost:5000 --cameras 10,20,40 --output scale.json
+
+Each camera is a synthetic:// source whose moving object appears every --period seconds, so the
+end-to-end latency of every motion incident (frame rendered -> zone_alert received here) is known.
+Run it on the same host as the server: latency compares the two processes' wall clocks. Start the
+server with DETECTION_TEST_ALERTS=0 (--spawn does this), or its periodic test alerts add noise.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+import requests
+import socketio
+from report_stats import fmt, percentile
+from synthetic_source import last_onset, synthetic_url
+
+
+def parse_metrics(text):
+    """{(name, labels): value} from Prometheus text format"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        metric, _, value = line.rpartition(' ')
+        name, _, labels = metric.partition('{')
+        try:
+            samples[(name, labels.rstrip('}'))] = float(value)
+        except ValueError:
+            continue
+    return samples
+
+
+def metric_sum(samples, name):
+    return sum(value for (sample_name, _), value in samples.items() if sample_name == name)
+
+
+class AlertRecorder:
+    def __init__(self, url):
+        """Socket.IO client recording when each camera's motion incidents start"""
+        self.client = socketio.Client(reconnection=True)
+        self.lock = threading.Lock()
+        self.started = {}  # camera_id -> [receive time, ...]
+        self.client.on('zone_alert', self._on_zone_alert)
+        self.client.connect(url)
+
+    def _on_zone_alert(self, data):
+        received = time.time()
+        if data.get('phase') != 'started':
+            return
+        with self.lock:
+            self.started.setdefault(data.get('camera_id'), []).append(received)
+
+    def set_zones(self, camera_id, zones):
+        self.client.emit('update_zone', {'camera_id': camera_id, 'zones': zones})
+
+    def set_alert_settings(self, camera_id, **settings):
+        self.client.emit('update_alert_settings', dict(settings, camera_id=camera_id))
+
+    def alerts_for(self, camera_id):
+        with self.lock:
+            return list(self.started.get(camera_id, []))
+
+    def close(self):
+        self.client.disconnect()
+
+
+class Server:
+    def __init__(self, port, env_overrides, log_path):
+        """Run app.py as a subprocess configured for load testing"""
+        env = dict(os.environ)
+        env.update(env_overrides)
+        env['PORT'] = str(port)
+        env.setdefault('DEBUG', 'True')  # app.py runs the Werkzeug server without a terminal only in debug
+        self.log = open(log_path, 'w')
+        self.process = subprocess.Popen([sys.executable, 'app.py'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                        env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        self.url = f"http://localhost:{port}"
+
+    def wait_ready(self, timeout=90):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}, see {self.log.name}")
+            try:
+                if requests.get(f"{self.url}/api/health", timeout=2).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"Server not ready after {timeout}s, see {self.log.name}")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+def snapshot(url):
+    """Capture counters per camera and process CPU/memory from the server"""
+    cameras = requests.get(f"{url}/api/cameras/stats", timeout=30).json()['cameras']
+    samples = parse_metrics(requests.get(f"{url}/api/metrics", timeout=30).text)
+    return {
+        'time': time.time(),
+        'cameras': cameras,
+        'cpu_seconds': metric_sum(samples, 'secureeye_process_cpu_seconds_total'),
+        'rss_bytes': metric_sum(samples, 'secureeye_process_resident_memory_bytes')
+    }
+
+
+def run_step(url, recorder, count, args, step_index):
+    """Run count cameras for args.duration seconds and summarise what happened"""
+    width, height = args.resolution
+    camera_ids = [f"scale-{step_index}-{index}" for index in range(count)]
+    phases = {}
+    for index, camera_id in enumerate(camera_ids):
+        # Staggered onsets spread the load; --burst makes every camera fire at once
+        phases[camera_id] = 0.0 if args.burst else round(args.period * index / count, 3)
+        recorder.set_zones(camera_id, [{'name': 'scene', 'x': 0, 'y': 0, 'width': 640, 'height': 480}])
+        # No cooldown, so every incident starts a new alert however short the period
+        recorder.set_alert_settings(camera_id, cooldown=0)
+
+    time.sleep(1.0)  # Let the zone updates land before the cameras start
+    for index, camera_id in enumerate(camera_ids):
+        stream_url = synthetic_url(fps=args.fps, width=width, height=height, period=args.period,
+                                   on=args.on, phase=phases[camera_id], seed=index)
+        response = requests.post(f"{url}/api/cameras", json={'camera_id': camera_id, 'stream_url': stream_url}, timeout=30)
+        if not response.ok:
+            print(f"[SCALE] Could not add camera {camera_id}: {response.status_code} {response.text}")
+
+    print(f"[SCALE] {count} cameras added, warming up for {args.warmup}s")
+    time.sleep(args.warmup)
+    before = snapshot(url)
+    time.sleep(args.duration)
+    after = snapshot(url)
+
+    # Match every incident that began in the window to the first alert after it
+    latencies = []
+    expected = 0
+    for camera_id in camera_ids:
+        alerts = recorder.alerts_for(camera_id)
+        onset = last_onset(before['time'], args.period, phases[camera_id]) + args.period
+        # Incidents starting too close to the end of the window may not have been reported yet
+        while onset + args.on < after['time']:
+            expected += 1
+            received = [at for at in alerts if onset <= at < onset + args.period]
+            if received:
+                latencies.append(received[0] - onset)
+            onset += args.period
+
+    elapsed = after['time'] - before['time']
+    captured = dropped = consumed = 0
+    for camera_id in camera_ids:
+        start, end = before['cameras'].get(camera_id), after['cameras'].get(camera_id)
+        if not start or not end:
+            continue
+        captured += end['frames_captured'] - start['frames_captured']
+        dropped += end['frames_dropped'] - start['frames_dropped']
+        consumed += end['frames_consumed'] - start['frames_consumed']
+    running = sum(1 for camera_id in camera_ids if camera_id in after['cameras'])
+
+    for camera_id in camera_ids:
+        requests.delete(f"{url}/api/cameras/{camera_id}", timeout=30)
+    time.sleep(args.cooldown)
+
+    latencies.sort()
+    return {
+        'cameras': count,
+        'cameras_running': running,
+        'duration': elapsed,
+        'incidents_expected': expected,
+        'incidents_alerted': len(latencies),
+        'missed_ratio': (expected - len(latencies)) / expected if expected else None,
+        'latency_p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+        'latency_p95_ms': percentile(latencies, 0.95) * 1000 if latencies else None,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'latency_max_ms': latencies[-1] * 1000 if latencies else None,
+        'capture_fps_per_camera': captured / elapsed / count if count else None,
+        'analysis_fps_per_camera': consumed / elapsed / count if count else None,
+        'dropped_ratio': dropped / captured if captured else None,
+        'cpu_cores': (after['cpu_seconds'] - before['cpu_seconds']) / elapsed,
+        'rss_mb': after['rss_bytes'] / (1024 * 1024)
+    }
+
+
+def print_curve(steps, slo_ms, max_missed):
+    """Scaling table, marking the first step that breaks the latency or missed-alert budget"""
+    print(f"\n{'cameras':>8}{'running':>9}{'p50 ms':>9}{'p99 ms':>9}{'missed':>8}{'cap fps':>9}"
+          f"{'ana fps':>9}{'dropped':>9}{'cpu':>7}{'rss MB':>9}")
+    broken = None
+    for step in steps:
+        ok = (step['latency_p99_ms'] is not None and step['latency_p99_ms'] <= slo_ms
+              and (step['missed_ratio'] or 0) <= max_missed)
+        if not ok and broken is None:
+            broken = step['cameras']
+        print(f"{step['cameras']:>8}{step['cameras_running']:>9}{fmt(step['latency_p50_ms'], '{:.0f}'):>9}"
+              f"{fmt(step['latency_p99_ms'], '{:.0f}'):>9}{fmt(step['missed_ratio'], '{:.1%}'):>8}"
+              f"{fmt(step['capture_fps_per_camera'], '{:.1f}'):>9}{fmt(step['analysis_fps_per_camera'], '{:.1f}'):>9}"
+              f"{fmt(step['dropped_ratio'], '{:.1%}'):>9}{step['cpu_cores']:>7.2f}{step['rss_mb']:>9.0f}"
+              f"{'' if ok else '  <- over budget'}")
+    if broken is None:
+        print(f"\n[SCALE] Every step met p99 <= {slo_ms:.0f} ms with at most {max_missed:.0%} missed incidents")
+    else:
+        print(f"\n[SCALE] Over budget from {broken} cameras (p99 > {slo_ms:.0f} ms or > {max_missed:.0%} missed)")
+    return broken
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scale test SecureEye with synthetic cameras')
+    parser.add_argument('--url', default='http://localhost:5000', help='Running backend (ignored with --spawn)')
+    parser.add_argument('--spawn', action='store_true', help='Start app.py for the run and stop it afterwards')
+    parser.add_argument('--port', type=int, default=5077, help='Port for --spawn')
+    parser.add_argument('--workers', default=None, help='DETECTION_WORKERS for --spawn')
+    parser.add_argument('--cameras', default='10,50,200', help='Comma-separated camera counts')
+    parser.add_argument('--fps', type=float, default=15.0, help='Frames per second of each synthetic camera')
+    parser.add_argument('--resolution', default='640x480', help='Synthetic frame size WxH')
+    parser.add_argument('--period', type=float, default=20.0, help='Seconds between incidents per camera')
+    parser.add_argument('--on', type=float, default=4.0, help='Seconds the object stays in view')
+    parser.add_argument('--burst', action='store_true', help='Start every camera\'s incidents at the same instant')
+    parser.add_argument('--warmup', type=float, default=10.0, help='Seconds before measuring each step')
+    parser.add_argument('--duration', type=float, default=60.0, help='Measured seconds per step')
+    parser.add_argument('--cooldown', type=float, default=5.0, help='Seconds after removing a step\'s cameras')
+    parser.add_argument('--slo-ms', type=float, default=1000.0, help='p99 alert latency budget')
+    parser.add_argument('--max-missed', type=float, default=0.05, help='Missed incident budget (fraction)')
+    parser.add_argument('--output', default='', help='Write the scaling curve JSON here')
+    args = parser.parse_args(argv)
+    width, height = args.resolution.lower().split('x')
+    args.resolution = (int(width), int(height))
+    counts = [int(count) for count in args.cameras.split(',') if count]
+    if args.period < args.on + 4:
+        # An incident ends ALERT_CLEAR_AFTER (3s by default) after the object leaves
+        print(f"[SCALE] Warning: --period {args.period:g} leaves too little time for incidents to end between onsets")
+
+    server = None
+    url = args.url
+    if args.spawn:
+        workdir = tempfile.mkdtemp(prefix='secureeye-scale-')
+        overrides = {
+            'DETECTION_TEST_ALERTS': '0',
+            'EVENT_LOG_DIR': os.path.join(workdir, 'event_log'),
+            'HISTORY_DB_PATH': os.path.join(workdir, 'detections.db')
+        }
+        if args.workers is not None:
+            overrides['DETECTION_WORKERS'] = args.workers
+        server = Server(args.port, overrides, os.path.join(workdir, 'server.log'))
+        print(f"[SCALE] Starting backend on port {args.port} (log: {server.log.name})")
+        server.wait_ready()
+        url = server.url
+
+    recorder = AlertRecorder(url)
+    steps = []
+    try:
+        for step_index, count in enumerate(counts):
+            print(f"[SCALE] Step {step_index + 1}/{len(counts)}: {count} cameras")
+            step = run_step(url, recorder, count, args, step_index)
+            steps.append(step)
+            print(f"[SCALE] {count} cameras: p99 {step['latency_p99_ms'] or 0:.0f} ms, "
+                  f"{step['incidents_alerted']}/{step['incidents_expected']} incidents alerted, "
+                  f"{step['cpu_cores']:.2f} cores")
+    finally:
+        recorder.close()
+        if server:
+            server.stop()
+
+    broken = print_curve(steps, args.slo_ms, args.max_missed)
+    if args.output:
+        report = {
+            'meta': {'timestamp': datetime.now().isoformat(), 'url': url, 'cpu_count': os.cpu_count(),
+                     'args': vars(args)},
+            'over_budget_from': broken,
+            'steps': steps
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[SCALE] Scaling curve written to {args.output}")
+    return steps
+
+
+if __name__ == '__main__':
+    main()
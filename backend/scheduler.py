@@ -0,0 +1,152 @@
+"""
+SecureEye detection scheduler
+Shares a fixed pool of detection threads across all cameras by priority and frame deadline
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+
+
+class FrameJob:
+    def __init__(self, camera_id, run, priority, deadline):
+        self.camera_id = camera_id
+        self.run = run
+        self.priority = priority
+        self.deadline = deadline
+        self.submitted_at = time.time()
+        self.done = threading.Event()
+        self.executed = False
+        self.dropped = False
+        self.result = None
+        self.run_seconds = 0.0
+
+    def wait(self, timeout=None):
+        """Wait until the job ran or was dropped"""
+        return self.done.wait(timeout)
+
+
+class DetectionScheduler:
+    def __init__(self, num_workers=None, max_staleness=None):
+        # Detection threads shared by every camera in this process
+        self.num_workers = num_workers if num_workers is not None else int(os.getenv('DETECTION_THREADS', str(os.cpu_count() or 4)))
+        # Default seconds a frame may wait (since capture) before it is too stale to analyse
+        self.max_staleness = max_staleness if max_staleness is not None else float(os.getenv('MAX_FRAME_STALENESS', '1.0'))
+
+        self.cond = threading.Condition()
+        self.heap = []  # (-priority, deadline, seq, job): highest priority, then earliest deadline
+        self.seq = itertools.count()
+        self.workers = []
+        self.running = False
+        self.camera_stats = {}  # camera_id -> counters
+
+    def start(self):
+        """Start the detection threads (no-op if already running)"""
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        for index in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"detection-{index}")
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+        print(f"[SCHEDULER] Started {self.num_workers} detection threads")
+
+    def stop(self):
+        """Stop the detection threads, dropping queued jobs"""
+        with self.cond:
+            self.running = False
+            pending = [entry[-1] for entry in self.heap]
+            self.heap = []
+            self.cond.notify_all()
+        for job in pending:
+            job.dropped = True
+            job.done.set()
+
+    def _stats(self, camera_id):
+        """Counters for a camera, created on first use (caller holds the lock)"""
+        stats = self.camera_stats.get(camera_id)
+        if stats is None:
+            stats = {'scheduled': 0, 'executed': 0, 'dropped': 0, 'priority': 0,
+                     'queue_wait_total': 0.0, 'run_total': 0.0}
+            self.camera_stats[camera_id] = stats
+        return stats
+
+    def submit(self, camera_id, run, frame_time=None, priority=0, max_staleness=None):
+        """Queue run() for a camera frame captured at frame_time and return its FrameJob"""
+        staleness = max_staleness if max_staleness is not None else self.max_staleness
+        deadline = (frame_time or time.time()) + staleness
+        job = FrameJob(camera_id, run, priority, deadline)
+        with self.cond:
+            stats = self._stats(camera_id)
+            stats['scheduled'] += 1
+            stats['priority'] = priority
+            heapq.heappush(self.heap, (-priority, deadline, next(self.seq), job))
+            self.cond.notify()
+        return job
+
+    def _worker_loop(self):
+        """Take the most urgent job; drop it if its frame is already past the deadline"""
+        while True:
+            with self.cond:
+                while self.running and not self.heap:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                job = heapq.heappop(self.heap)[-1]
+                stats = self._stats(job.camera_id)
+                started = time.time()
+                if started > job.deadline:
+                    stats['dropped'] += 1
+                    job.dropped = True
+                    job.done.set()
+                    continue
+                stats['queue_wait_total'] += started - job.submitted_at
+
+            try:
+                job.result = job.run()
+            except Exception as e:
+                print(f"[SCHEDULER] Detection job for camera {job.camera_id} failed: {e}")
+            finally:
+                job.run_seconds = time.time() - started
+                job.executed = True
+                with self.cond:
+                    stats['executed'] += 1
+                    stats['run_total'] += job.run_seconds
+                job.done.set()
+
+    def remove(self, camera_id):
+        """Drop a stopped camera's queued jobs and counters"""
+        with self.cond:
+            removed = [entry[-1] for entry in self.heap if entry[-1].camera_id == camera_id]
+            if removed:
+                self.heap = [entry for entry in self.heap if entry[-1].camera_id != camera_id]
+                heapq.heapify(self.heap)
+            self.camera_stats.pop(camera_id, None)
+        for job in removed:
+            job.dropped = True
+            job.done.set()
+
+    def get_stats(self):
+        """Scheduled, executed and dropped counts per camera plus queue depth"""
+        with self.cond:
+            cameras = {}
+            for camera_id, stats in self.camera_stats.items():
+                executed = stats['executed']
+                cameras[camera_id] = {
+                    'priority': stats['priority'],
+                    'scheduled': stats['scheduled'],
+                    'executed': executed,
+                    'dropped': stats['dropped'],
+                    'avg_queue_wait_ms': stats['queue_wait_total'] / executed * 1000 if executed else 0,
+                    'avg_run_ms': stats['run_total'] / executed * 1000 if executed else 0
+                }
+            return {
+                'workers': self.num_workers,
+                'queued': len(self.heap),
+                'max_staleness': self.max_staleness,
+                'cameras': cameras
+            }
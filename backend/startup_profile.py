@@ -0,0 +1,127 @@
+"""
+SecureEye startup profiler
+Reports import time per module and how long the backend takes to answer /api/health
+
+    python app.py --profile-startup
+    python app.py --profile-startup --top 40 --depth 2
+
+The backend is started in child processes with a throwaway event log and history database,
+so profiling never touches the real ones.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(output):
+    """Parse `python -X importtime` stderr into [(module, depth, self_us, cumulative_us)]"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented two spaces per level below the module that imported them
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        modules.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def profile_imports(module, env):
+    """Import module in a fresh interpreter and return its per-module import times"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise RuntimeError(f"Importing {module} failed")
+    return parse_importtime(result.stderr)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_to_health(env, timeout=60.0):
+    """Start app.py and return (seconds until /api/health answers, seconds until the detector is loaded)"""
+    port = _free_port()
+    # Without a terminal app.py only runs the Werkzeug server in debug
+    env = dict(env, PORT=str(port), DEBUG=env.get('DEBUG', 'True'))
+    url = f"http://127.0.0.1:{port}/api/health"
+    started = time.time()
+    process = subprocess.Popen([sys.executable, 'app.py'], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    healthy = loaded = None
+    try:
+        while time.time() - started < timeout and process.poll() is None:
+            try:
+                with urlopen(url, timeout=1) as response:
+                    health = json.load(response)
+            except (URLError, OSError, ValueError):
+                time.sleep(0.01)
+                continue
+            if healthy is None:
+                healthy = time.time() - started
+            if health.get('detector_loaded'):
+                loaded = time.time() - started
+                break
+            time.sleep(0.02)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return healthy, loaded
+
+
+def print_imports(modules, top, depth):
+    """Slowest modules imported at or above depth, by cumulative time"""
+    total = sum(cumulative for _, level, _, cumulative in modules if level == 0)
+    print(f"\n[STARTUP] Import time {total / 1000:.0f} ms over {len(modules)} modules")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    shown = sorted((entry for entry in modules if entry[1] <= depth), key=lambda entry: -entry[3])[:top]
+    for name, level, self_us, cumulative_us in shown:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {'  ' * level}{name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile SecureEye backend startup')
+    parser.add_argument('--module', default='app', help='Module to import')
+    parser.add_argument('--top', type=int, default=25, help='Modules to list')
+    parser.add_argument('--depth', type=int, default=1, help='Import nesting depth to list (0 = direct imports)')
+    parser.add_argument('--no-server', action='store_true', help='Only profile imports, do not start the server')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='secureeye-startup-') as scratch:
+        env = dict(os.environ, EVENT_LOG_DIR=os.path.join(scratch, 'event_log'),
+                   HISTORY_DB_PATH=os.path.join(scratch, 'detections.db'),
+                   DEVICE_PROBE_CACHE=os.path.join(scratch, 'device_probes.json'))
+        print_imports(profile_imports(args.module, env), args.top, args.depth)
+
+        if not args.no_server:
+            healthy, loaded = time_to_health(env)
+            print()
+            if healthy is None:
+                print("[STARTUP] /api/health never answered")
+                return 1
+            print(f"[STARTUP] /api/health answered {healthy * 1000:.0f} ms after launch")
+            if loaded is None:
+                print("[STARTUP] Detector was not loaded in time (STARTUP_WARMUP=0 loads it on the first camera)")
+            else:
+                print(f"[STARTUP] Background warm-up had the detector ready {loaded * 1000:.0f} ms after launch")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
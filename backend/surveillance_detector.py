@@ -0,0 +1,391 @@
+"""
+SecureEye surveillance detector
+OpenCV-based fire, motion, violence, crowd and zone detection shared by the backend and its worker processes
+"""
+
+import os
+import time
+import cv2
+import numpy as np
+from frame_context import as_frame_context
+from background_models import BackgroundModelRegistry
+from zones import ZoneMaskCache, normalize_zone, split_zones, union_rect
+from metrics import timed_detector
+from tracing import tracer, traced
+
+
+class SurveillanceDetector:
+    def __init__(self):
+        self.fire_model = None
+        self.background_models = BackgroundModelRegistry(detect_shadows=True)  # MOG2 per camera and region
+        self.previous_frames = {}  # Store previous frames for each camera
+        self.violence_frames = {}  # Previous grayscale frame per camera for violence detection
+        self.detection_threshold = 0.7
+        self.test_motion_timers = {}  # Timer-based test motion detection
+        # Periodic test alerts (on by default); load and latency tests turn them off
+        self.test_alerts = os.getenv('DETECTION_TEST_ALERTS', '1').lower() in ('1', 'true', 'yes')
+        self.zone_masks = ZoneMaskCache()  # Rasterized polygon/exclude masks per camera
+        self.load_models()
+    
+    def load_models(self):
+        """Load pre-trained models for detection"""
+        try:
+            # Load fire detection model (you'll need to train or download this)
+            # For now, we'll use a simple color-based fire detection
+            print("Models loaded successfully")
+        except Exception as e:
+            print(f"Error loading models: {e}")
+    
+    @timed_detector('detect_fire')
+    @traced('detect_fire')
+    def detect_fire(self, frame):
+        """Detect fire in the frame using color analysis"""
+        try:
+            ctx = as_frame_context(frame)
+            
+            # HSV view gives better color detection (shared with other detectors)
+            hsv = ctx.hsv()
+            
+            # Define range for fire colors (red, orange, yellow)
+            lower_fire = np.array([0, 50, 50])
+            upper_fire = np.array([35, 255, 255])
+            
+            # Create mask for fire colors
+            fire_mask = cv2.inRange(hsv, lower_fire, upper_fire)
+            
+            # Count fire-colored pixels
+            fire_pixels = cv2.countNonZero(fire_mask)
+            total_pixels = ctx.width * ctx.height
+            fire_ratio = fire_pixels / total_pixels
+            
+            # If fire ratio is above threshold, consider it fire
+            if fire_ratio > 0.01:  # 1% of frame
+                return True, fire_ratio
+            return False, fire_ratio
+            
+        except Exception as e:
+            print(f"Fire detection error: {e}")
+            return False, 0
+    
+    @timed_detector('detect_motion')
+    @traced('detect_motion')
+    def detect_motion(self, frame, camera_id=None):
+        """Detect motion using background subtraction"""
+        try:
+            ctx = as_frame_context(frame)
+            
+            # Apply this camera's full-frame background model
+            fg_mask = self.background_models.get(camera_id, 'frame', ctx.frame).apply(ctx.frame)
+            
+            # Remove noise
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
+            
+            # Find contours
+            with tracer.span('contours'):
+                contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            
+            motion_detected = False
+            motion_area = 0
+            
+            for contour in contours:
+                area = cv2.contourArea(contour)
+                if area > 500:  # Minimum area threshold
+                    motion_detected = True
+                    motion_area += area
+            
+            return motion_detected, motion_area
+            
+        except Exception as e:
+            print(f"Motion detection error: {e}")
+            return False, 0
+    
+    @timed_detector('detect_violence')
+    @traced('detect_violence')
+    def detect_violence(self, frame, camera_id=None):
+        """Detect violence using motion analysis and object detection"""
+        try:
+            ctx = as_frame_context(frame)
+            gray = ctx.gray()
+            previous = self.violence_frames.get(camera_id)
+            self.violence_frames[camera_id] = gray
+            
+            # Simple violence detection based on rapid motion
+            if previous is not None and previous.shape == gray.shape:
+                # Calculate frame difference on the shared grayscale view
+                gray_diff = cv2.absdiff(gray, previous)
+                
+                # Count significant changes
+                changes = cv2.countNonZero(gray_diff)
+                total_pixels = gray_diff.shape[0] * gray_diff.shape[1]
+                change_ratio = changes / total_pixels
+                
+                # High change ratio might indicate violence
+                if change_ratio > 0.1:  # 10% change threshold
+                    return True, change_ratio
+                return False, 0
+            
+            return False, 0
+            
+        except Exception as e:
+            print(f"Violence detection error: {e}")
+            return False, 0
+    
+    @timed_detector('detect_crowd')
+    @traced('detect_crowd')
+    def detect_crowd(self, frame):
+        """Detect crowd using people counting"""
+        try:
+            # Simple crowd detection based on edge density
+            gray = as_frame_context(frame).gray()
+            edges = cv2.Canny(gray, 50, 150)
+            
+            # Count edge pixels
+            edge_pixels = cv2.countNonZero(edges)
+            total_pixels = edges.shape[0] * edges.shape[1]
+            edge_density = edge_pixels / total_pixels
+            
+            # High edge density might indicate crowd
+            crowd_detected = edge_density > 0.15  # 15% edge density threshold
+            
+            return crowd_detected, edge_density
+            
+        except Exception as e:
+            print(f"Crowd detection error: {e}")
+            return False, 0
+    
+    def _zone_rects(self, ctx, zones):
+        """Clip each named zone to the frame, skipping empty ones"""
+        rects = {}
+        for zone in zones:
+            rect = ctx.clip_rect(zone)
+            if rect is not None:
+                rects[zone['name']] = rect
+        return rects
+    
+    def _blob_mask(self, mask, keep):
+        """Label the blobs of a binary mask once and keep those accepted by keep(stats)
+
+        Returns the filtered 0/1 mask, its integral image and the bounding boxes of the kept blobs.
+        """
+        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        kept = keep(stats)
+        kept[0] = False  # label 0 is the background
+        
+        # Label lookup turns the kept blobs into a mask in one vectorized step
+        blob_mask = kept.astype(np.uint8)[labels]
+        return blob_mask, cv2.integral(blob_mask), stats[kept, :4]
+    
+    def _zone_stats(self, blobs, rect, origin, zone_mask=None):
+        """Blob count and blob area inside one zone, from the shared integral image
+
+        Polygon zones pass their cached zone_mask and count area with one bitwise AND instead.
+        """
+        blob_mask, integral, boxes = blobs
+        x, y, w, h = rect[0] - origin[0], rect[1] - origin[1], rect[2], rect[3]
+        if zone_mask is None:
+            area = int(integral[y + h, x + w] - integral[y, x + w] - integral[y + h, x] + integral[y, x])
+        else:
+            area = cv2.countNonZero(cv2.bitwise_and(blob_mask[y:y + h, x:x + w], zone_mask))
+        
+        if area == 0:
+            return 0, 0
+        
+        # A blob counts for every zone its bounding box overlaps
+        overlaps = ((boxes[:, 0] < x + w) & (boxes[:, 0] + boxes[:, 2] > x) &
+                    (boxes[:, 1] < y + h) & (boxes[:, 1] + boxes[:, 3] > y))
+        return int(np.count_nonzero(overlaps)), area
+    
+    @timed_detector('detect_human_in_zone')
+    @traced('detect_human_in_zone')
+    def detect_human_in_zone(self, frame, zone, camera_id=None):
+        """Detect humans specifically within a defined zone"""
+        if not zone:
+            return False, 0
+        if zone.get('version') is None:
+            zone = normalize_zone(zone)
+        return self.detect_humans_in_zones(frame, [zone], camera_id).get(zone['name'], (False, 0))
+    
+    @timed_detector('detect_humans_in_zones')
+    @traced('detect_humans_in_zones')
+    def detect_humans_in_zones(self, frame, zones, camera_id=None):
+        """Detect humans in several zones with one background-subtraction pass over their union"""
+        results = {}
+        try:
+            ctx = as_frame_context(frame)
+            include_zones, exclude_zones = split_zones(zones)
+            rects = self._zone_rects(ctx, include_zones)
+            if not rects:
+                return results
+            union = union_rect(rects.values())
+            masks = self.zone_masks.get(camera_id, include_zones, exclude_zones, rects, union, (ctx.width, ctx.height))
+            
+            # Apply this camera's zone background model to the union of the zones
+            zone_frame = ctx.roi(union)
+            fg_mask = self.background_models.get(camera_id, 'zones', zone_frame, union[:2]).apply(zone_frame)
+            
+            # Remove noise
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+            fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
+            
+            # Polygon and exclusion zones cost one bitwise AND with the cached mask
+            if masks['combined'] is not None:
+                fg_mask = cv2.bitwise_and(fg_mask, masks['combined'])
+            
+            def human_like(stats):
+                widths = stats[:, cv2.CC_STAT_WIDTH]
+                heights = stats[:, cv2.CC_STAT_HEIGHT]
+                aspect_ratio = heights / np.maximum(widths, 1)
+                # Minimum area for a human, with a human-like aspect ratio (roughly 1.5 to 3.0)
+                return (stats[:, cv2.CC_STAT_AREA] > 200) & (aspect_ratio >= 1.2) & (aspect_ratio <= 4.0)
+            
+            blobs = self._blob_mask(fg_mask, human_like)
+            
+            for name, rect in rects.items():
+                zone_mask = masks['zones'].get(name)
+                human_count, total_motion_area = self._zone_stats(blobs, rect, union, zone_mask)
+                
+                # Calculate confidence based on motion area and count
+                zone_area = masks['areas'].get(name, rect[2] * rect[3])
+                motion_ratio = total_motion_area / zone_area if zone_area > 0 else 0
+                confidence = min(motion_ratio * 2, 1.0)  # Scale confidence
+                
+                human_detected = human_count > 0 and confidence > 0.1
+                
+                results[name] = (human_detected, {
+                    'count': human_count,
+                    'confidence': confidence,
+                    'motion_area': total_motion_area,
+                    'zone_area': zone_area
+                })
+            
+            return results
+            
+        except Exception as e:
+            print(f"Zone detection error: {e}")
+            return results
+    
+    @timed_detector('detect_motion_in_zone')
+    @traced('detect_motion_in_zone')
+    def detect_motion_in_zone(self, frame, zone, camera_id):
+        """Detect motion using frame differencing - more reliable than background subtraction"""
+        if not zone:
+            return False, 0
+        if zone.get('version') is None:
+            zone = normalize_zone(zone)
+        return self.detect_motion_in_zones(frame, [zone], camera_id).get(zone['name'], (False, 0))
+    
+    @timed_detector('detect_motion_in_zones')
+    @traced('detect_motion_in_zones')
+    def detect_motion_in_zones(self, frame, zones, camera_id):
+        """Detect motion in several zones with one difference mask over their union
+
+        Returns {zone_name: (motion_detected, motion_data)} for every zone inside the frame.
+        """
+        results = {}
+        try:
+            ctx = as_frame_context(frame)
+            include_zones, exclude_zones = split_zones(zones)
+            rects = self._zone_rects(ctx, include_zones)
+            if not rects:
+                return results
+            union = union_rect(rects.values())
+            masks = self.zone_masks.get(camera_id, include_zones, exclude_zones, rects, union, (ctx.width, ctx.height))
+            
+            # Blurred grayscale union from the shared frame context (blur reduces noise)
+            gray_union = ctx.blurred_gray_roi(union, 21)
+            
+            # Initialize previous frame for this camera if not exists (or the zones changed)
+            previous = self.previous_frames.get(camera_id)
+            self.previous_frames[camera_id] = (union, gray_union.copy())
+            if previous is None or previous[0] != union:
+                return results
+            
+            with tracer.span('difference'):
+                # Calculate frame difference
+                frame_diff = cv2.absdiff(gray_union, previous[1])
+                
+                # Apply threshold to get binary image
+                _, thresh = cv2.threshold(frame_diff, 30, 255, cv2.THRESH_BINARY)
+                
+                # Remove noise with morphological operations
+                kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+                thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+                thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+                
+                # Dilate to fill holes
+                thresh = cv2.dilate(thresh, kernel, iterations=2)
+                
+                # Polygon and exclusion zones cost one bitwise AND with the cached mask
+                if masks['combined'] is not None:
+                    thresh = cv2.bitwise_and(thresh, masks['combined'])
+            
+            # Label blobs once; each zone then reads its statistics from the integral image
+            with tracer.span('contours'):
+                blobs = self._blob_mask(thresh, lambda stats: stats[:, cv2.CC_STAT_AREA] > 100)
+            
+            for name, rect in rects.items():
+                zone_mask = masks['zones'].get(name)
+                motion_count, total_motion_area = self._zone_stats(blobs, rect, union, zone_mask)
+                
+                # Calculate confidence
+                zone_area = masks['areas'].get(name, rect[2] * rect[3])
+                motion_ratio = total_motion_area / zone_area if zone_area > 0 else 0
+                confidence = min(motion_ratio * 10, 1.0)  # Scale confidence
+                
+                # Motion detected if we have significant movement
+                motion_detected = motion_count > 0 and total_motion_area > 500
+                
+                # Debug output
+                if motion_detected:
+                    print(f"[MOTION] MOTION DETECTED! Camera {camera_id} zone {name} - Count: {motion_count}, Area: {total_motion_area}, Confidence: {confidence:.3f}")
+                
+                results[name] = (motion_detected, {
+                    'count': motion_count,
+                    'confidence': confidence,
+                    'motion_area': total_motion_area,
+                    'zone_area': zone_area
+                })
+            
+            return results
+            
+        except Exception as e:
+            print(f"Zone motion detection error: {e}")
+            return results
+    
+    def release_camera(self, camera_id):
+        """Forget all per-camera state (background models, zone masks, previous frames)"""
+        self.background_models.evict(camera_id)
+        self.zone_masks.evict(camera_id)
+        self.previous_frames.pop(camera_id, None)
+        self.violence_frames.pop(camera_id, None)
+        self.test_motion_timers.pop(camera_id, None)
+    
+    def test_motion_detection(self, camera_id, zone):
+        """Simple test motion detection that always works - sends alerts every 3 seconds"""
+        if not self.test_alerts:
+            return False, 0
+        try:
+            if camera_id not in self.test_motion_timers:
+                self.test_motion_timers[camera_id] = time.time()
+                return False, 0
+            
+            current_time = time.time()
+            last_alert = self.test_motion_timers[camera_id]
+            
+            # Send test motion alert every 3 seconds
+            if current_time - last_alert >= 3.0:
+                self.test_motion_timers[camera_id] = current_time
+                print(f"[MOTION] TEST MOTION DETECTED! Camera {camera_id} - Test Alert")
+                return True, {
+                    'count': 1,
+                    'confidence': 0.8,
+                    'motion_area': 1000,
+                    'zone_area': zone['width'] * zone['height'] if zone else 1000
+                }
+            
+            return False, 0
+            
+        except Exception as e:
+            print(f"Test motion detection error: {e}")
+            return False, 0
@@ -0,0 +1,95 @@
+"""
+SecureEye synthetic camera source
+A VideoCapture stand-in that renders a moving object on a schedule, for load and latency testing
+
+    synthetic://?fps=15&width=640&height=480&period=20&on=4&phase=0
+
+The object is visible while (time - phase) % period < on (wall-clock seconds), so a client
+that knows the URL knows exactly when each motion incident began.
+"""
+
+import time
+from urllib.parse import urlparse, parse_qs
+import cv2
+import numpy as np
+
+SCHEME = 'synthetic://'
+
+DEFAULTS = {'fps': 15.0, 'width': 640, 'height': 480, 'period': 20.0, 'on': 4.0, 'phase': 0.0, 'seed': 1}
+
+
+def is_synthetic(stream_url):
+    return isinstance(stream_url, str) and stream_url.startswith(SCHEME)
+
+
+def parse_options(stream_url):
+    """Options of a synthetic:// URL with defaults filled in"""
+    query = parse_qs(urlparse(stream_url).query)
+    options = dict(DEFAULTS)
+    for key, default in DEFAULTS.items():
+        if key in query:
+            options[key] = type(default)(query[key][0])
+    return options
+
+
+def synthetic_url(**options):
+    """Build a synthetic:// URL from options (unknown keys are ignored by the source)"""
+    return SCHEME + '?' + '&'.join(f"{key}={value}" for key, value in options.items())
+
+
+def last_onset(now, period, phase):
+    """Wall-clock time the current (or most recent) object appearance began"""
+    return now - ((now - phase) % period)
+
+
+class SyntheticCapture:
+    def __init__(self, stream_url):
+        """Frames paced at fps; read() blocks until the next frame is due, like a live camera"""
+        self.options = parse_options(stream_url)
+        width, height = self.options['width'], self.options['height']
+        rng = np.random.default_rng(self.options['seed'])
+        # Static textured background: motion detectors see nothing until the object appears
+        self.background = cv2.GaussianBlur(rng.integers(30, 120, (height, width, 3), dtype=np.uint8), (5, 5), 0)
+        self.interval = 1.0 / self.options['fps']
+        self.next_frame = time.time()
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.options['fps']
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.options['width']
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.options['height']
+        return 0
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        delay = self.next_frame - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        # Skip ticks that were missed rather than bursting to catch up
+        self.next_frame = max(self.next_frame + self.interval, time.time())
+
+        now = time.time()
+        frame = self.background.copy()
+        options = self.options
+        elapsed = (now - options['phase']) % options['period']
+        if elapsed < options['on']:
+            width, height = options['width'], options['height']
+            box_w, box_h = max(8, width // 10), max(16, height // 3)
+            # Walks across the frame during the on window, so every frame differs from the last
+            x = int((width - box_w) * elapsed / options['on'])
+            y = (height - box_h) // 2
+            cv2.rectangle(frame, (x, y), (x + box_w, y + box_h), (235, 235, 235), -1)
+        return True, frame
+
+    def release(self):
+        self.opened = False
@@ -0,0 +1,157 @@
+"""
+SecureEye stage tracing
+Opt-in per-camera spans kept in a ring buffer and exported as Chrome trace (Perfetto) JSON
+"""
+
+import collections
+import functools
+import os
+import threading
+import time
+import zlib
+
+# Spans kept per process; at ~20 spans per analysed frame this is several minutes of 10 cameras
+DEFAULT_BUFFER_SPANS = 200000
+
+
+class _NullSpan:
+    """Shared no-op context used while tracing is off"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.started, time.perf_counter())
+        return False
+
+
+class _Context:
+    def __init__(self, tracer, camera_id, lane):
+        self.tracer = tracer
+        self.camera_id = camera_id
+        self.lane = lane
+
+    def __enter__(self):
+        local = self.tracer.local
+        self.previous = (getattr(local, 'camera_id', None), getattr(local, 'lane', None))
+        local.camera_id, local.lane = self.camera_id, self.lane
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.local.camera_id, self.tracer.local.lane = self.previous
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled=None, buffer_spans=None):
+        """Record begin/end of pipeline stages while enabled (env TRACING_ENABLED, off by default)
+
+        Spans are attributed to the camera set with context() on the current thread. The ring
+        buffer is a bounded deque, whose append is atomic, so recording takes no lock; the
+        oldest spans are overwritten once buffer_spans (env TRACE_BUFFER_SPANS) is reached.
+        """
+        if enabled is None:
+            enabled = os.getenv('TRACING_ENABLED', '0').lower() in ('1', 'true', 'yes')
+        self.enabled = enabled
+        self.spans = collections.deque(maxlen=int(buffer_spans or os.getenv('TRACE_BUFFER_SPANS', DEFAULT_BUFFER_SPANS)))
+        self.local = threading.local()
+
+    def set_enabled(self, enabled):
+        """Turn tracing on or off; the buffer is kept so a trace can still be dumped afterwards"""
+        self.enabled = bool(enabled)
+
+    def context(self, camera_id, lane='analysis'):
+        """Attribute spans on this thread to camera_id; lane separates concurrent work (capture/analysis)"""
+        return _Context(self, camera_id, lane)
+
+    def set_context(self, camera_id, lane='analysis'):
+        """Attribute all further spans on this (camera-dedicated) thread to camera_id"""
+        self.local.camera_id, self.local.lane = camera_id, lane
+
+    def span(self, name):
+        """Context manager timing one stage"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def traced(self, name):
+        """Decorator timing every call of a function as a span"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, started, time.perf_counter())
+            return wrapper
+        return decorator
+
+    def record(self, name, started, ended):
+        """Append a finished span (perf_counter seconds) for the current thread's camera"""
+        local = self.local
+        self.spans.append((started, ended - started, name, getattr(local, 'camera_id', None),
+                           getattr(local, 'lane', None) or threading.current_thread().name))
+
+    def collect(self, seconds=None):
+        """Spans that ended within the last seconds (all buffered spans if None) as plain tuples"""
+        spans = list(self.spans)
+        if seconds is None:
+            return spans
+        cutoff = time.perf_counter() - float(seconds)
+        return [span for span in spans if span[0] + span[1] >= cutoff]
+
+    def get_stats(self):
+        """Whether tracing is on and how full the ring buffer is"""
+        return {'enabled': self.enabled, 'spans': len(self.spans), 'capacity': self.spans.maxlen}
+
+
+def _track_id(pid, camera_id, lane):
+    """Stable integer thread id for a (camera, lane) track within a process"""
+    return zlib.crc32(f"{pid}:{camera_id}:{lane}".encode()) & 0x7fffffff
+
+
+def chrome_trace(spans_by_process):
+    """Build Chrome trace event JSON from {(pid, process_name): spans}
+
+    Each camera and lane becomes its own named track. Timestamps come from perf_counter,
+    which is the system-wide monotonic clock on Linux, so worker processes line up.
+    """
+    events = []
+    for (pid, process_name), spans in spans_by_process.items():
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': process_name}})
+        tracks = set()
+        for started, duration, name, camera_id, lane in spans:
+            tid = _track_id(pid, camera_id, lane)
+            if tid not in tracks:
+                tracks.add(tid)
+                label = f"camera {camera_id} {lane}" if camera_id is not None else str(lane)
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': label}})
+            event = {'name': name, 'cat': lane, 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': round(started * 1e6, 3), 'dur': round(duration * 1e6, 3)}
+            if camera_id is not None:
+                event['args'] = {'camera_id': camera_id}
+            events.append(event)
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+# Process-wide tracer used by the camera pipelines and detectors
+tracer = Tracer()
+traced = tracer.traced
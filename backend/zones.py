@@ -0,0 +1,172 @@
+"""
+SecureEye detection zones
+Normalises the zone payloads sent by the dashboard into a list of named zones per camera
+(rectangles or polygons, include or exclude) and caches their rasterized masks
+"""
+
+import itertools
+
+ZONE_TYPES = ('include', 'exclude')
+
+# Every normalised zone gets a new version so cached masks know when to rebuild
+_zone_versions = itertools.count(1)
+
+
+def _normalize_points(points):
+    """Turn [[x, y], ...] or [{'x':, 'y':}, ...] into a list of integer [x, y] pairs"""
+    normalized = []
+    for point in points:
+        if isinstance(point, dict):
+            point = (point['x'], point['y'])
+        normalized.append([int(float(point[0])), int(float(point[1]))])
+    if len(normalized) < 3:
+        raise ValueError('Polygon zones need at least 3 points')
+    return normalized
+
+
+def normalize_zone(zone, default_name='default'):
+    """Return a copy of a zone dict with a name, type, version and numeric geometry
+
+    Polygon zones carry 'points'; their x/y/width/height become the polygon's bounding box.
+    """
+    if not isinstance(zone, dict):
+        raise ValueError('Zone must be an object')
+
+    normalized = dict(zone)
+    normalized['name'] = str(zone.get('name') or zone.get('id') or default_name)
+    normalized['type'] = zone.get('type') or 'include'
+    if normalized['type'] not in ZONE_TYPES:
+        raise ValueError(f"Unknown zone type: {normalized['type']}")
+
+    if zone.get('points'):
+        points = _normalize_points(zone['points'])
+        xs = [x for x, y in points]
+        ys = [y for x, y in points]
+        normalized['points'] = points
+        normalized['x'] = min(xs)
+        normalized['y'] = min(ys)
+        normalized['width'] = max(xs) - min(xs) + 1
+        normalized['height'] = max(ys) - min(ys) + 1
+    else:
+        normalized.pop('points', None)
+        for key in ('x', 'y', 'width', 'height'):
+            normalized[key] = int(float(zone[key]))
+
+    normalized['version'] = next(_zone_versions)
+    return normalized
+
+
+def normalize_zones(zones):
+    """Turn a single zone dict or a list of zone dicts into a list of uniquely named zones"""
+    if isinstance(zones, dict):
+        return [normalize_zone(zones)]
+    if not isinstance(zones, (list, tuple)):
+        raise ValueError('Zones must be an object or a list')
+
+    normalized = []
+    names = set()
+    for index, zone in enumerate(zones):
+        zone = normalize_zone(zone, default_name=f"zone-{index + 1}")
+        if zone['name'] in names:
+            raise ValueError(f"Duplicate zone name: {zone['name']}")
+        names.add(zone['name'])
+        normalized.append(zone)
+    return normalized
+
+
+def upsert_zone(zones, zone):
+    """Return a new zone list with zone added or replacing the zone of the same name"""
+    zone = normalize_zone(zone)
+    updated = [existing for existing in (zones or []) if existing['name'] != zone['name']]
+    updated.append(zone)
+    return updated
+
+
+def split_zones(zones):
+    """Split a zone list into (include_zones, exclude_zones)"""
+    include = [zone for zone in zones if zone.get('type', 'include') != 'exclude']
+    exclude = [zone for zone in zones if zone.get('type', 'include') == 'exclude']
+    return include, exclude
+
+
+def union_rect(rects):
+    """Bounding box (x, y, w, h) covering all (x, y, w, h) rectangles"""
+    rects = list(rects)
+    x0 = min(x for x, y, w, h in rects)
+    y0 = min(y for x, y, w, h in rects)
+    x1 = max(x + w for x, y, w, h in rects)
+    y1 = max(y + h for x, y, w, h in rects)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def _fill_zone(mask, zone, origin, value):
+    """Rasterize one zone into mask (coordinates relative to origin)"""
+    # OpenCV is only needed once masks are built, so the API can validate zones without it
+    import cv2
+    import numpy as np
+    if zone.get('points'):
+        points = np.array(zone['points'], dtype=np.int32) - np.array(origin[:2], dtype=np.int32)
+        cv2.fillPoly(mask, [points], value)
+    else:
+        x, y = zone['x'] - origin[0], zone['y'] - origin[1]
+        cv2.rectangle(mask, (x, y), (x + zone['width'] - 1, y + zone['height'] - 1), value, -1)
+
+
+class ZoneMaskCache:
+    def __init__(self):
+        """Rasterized zone masks per camera, rebuilt only when zones or analysis resolution change"""
+        self.entries = {}  # camera_id -> (key, masks)
+        self.builds = 0
+
+    def get(self, camera_id, include_zones, exclude_zones, rects, union, frame_size):
+        """Return {'combined': mask or None, 'zones': {name: mask}, 'areas': {name: pixels}} for the union
+
+        'combined' is None when every include zone is a rectangle and there are no exclude
+        zones, so plain rectangles never pay for a mask. Per-zone masks exist only for
+        polygon zones and cover that zone's clipped rectangle.
+        """
+        key = (tuple(zone.get('version') for zone in include_zones + exclude_zones), union, frame_size)
+        entry = self.entries.get(camera_id)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        masks = self._build(include_zones, exclude_zones, rects, union)
+        self.entries[camera_id] = (key, masks)
+        self.builds += 1
+        return masks
+
+    def _build(self, include_zones, exclude_zones, rects, union):
+        """Rasterize include and exclude zones into uint8 masks over the union rectangle"""
+        import cv2
+        import numpy as np
+        polygons = [zone for zone in include_zones if zone.get('points') and zone['name'] in rects]
+        if not polygons and not exclude_zones:
+            return {'combined': None, 'zones': {}, 'areas': {}}
+
+        ux, uy, uw, uh = union
+        combined = np.zeros((uh, uw), dtype=np.uint8)
+        zone_masks = {}
+        for zone in include_zones:
+            if zone['name'] not in rects:
+                continue
+            _fill_zone(combined, zone, union, 255)
+            if zone.get('points'):
+                x, y, w, h = rects[zone['name']]
+                zone_mask = np.zeros((uh, uw), dtype=np.uint8)
+                _fill_zone(zone_mask, zone, union, 255)
+                zone_masks[zone['name']] = zone_mask[y - uy:y - uy + h, x - ux:x - ux + w].copy()
+
+        for zone in exclude_zones:
+            _fill_zone(combined, zone, union, 0)
+
+        # Exclusions also apply inside polygon masks
+        for name, zone_mask in zone_masks.items():
+            x, y, w, h = rects[name]
+            cv2.bitwise_and(zone_mask, combined[y - uy:y - uy + h, x - ux:x - ux + w], dst=zone_mask)
+
+        areas = {name: cv2.countNonZero(zone_mask) for name, zone_mask in zone_masks.items()}
+        return {'combined': combined, 'zones': zone_masks, 'areas': areas}
+
+    def evict(self, camera_id):
+        """Drop the cached masks of a camera"""
+        self.entries.pop(camera_id, None)
@@ -14,7 +14,7 @@ if %errorlevel% neq 0 (
 echo.
 echo Checking backend dependencies...
 cd backend
-python -c "import flask, flask_socketio, cv2, numpy, tensorflow" 2>nul
+python -c "import flask, flask_socketio, cv2, numpy" 2>nul
 if %errorlevel% neq 0 (
     echo Installing backend dependencies...
     pip install -r requirements.txt
@@ -26,7 +26,7 @@ def check_dependencies():
     """Check if required packages can be imported"""
     required_packages = [
         'flask', 'flask_socketio', 'opencv-python', 
-        'tensorflow', 'torch', 'numpy', 'pillow',
+        'numpy', 'pillow',
         'firebase-admin', 'python-dotenv'
     ]
     